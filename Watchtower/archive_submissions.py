@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+AlohaAI Watchtower — Submission Archiver
+Moves processed submissions out of the hot table into the archive database.
+The backend also does this on a timer (ARCHIVE_INTERVAL_MINUTES); use this to
+run it by hand or from cron.
+
+Usage:
+  python archive_submissions.py run   --older-than 6
+  python archive_submissions.py stats
+  python archive_submissions.py convert-vacuum
+"""
+
+import sys
+import argparse
+
+# Make sure we can import from the backend package
+sys.path.insert(0, "/var/www/HVERI-AlohaAI-Watchtower/watchtower")
+
+from backend.db import DatabaseManager, ARCHIVE_AFTER_HOURS
+
+db = DatabaseManager()
+
+
+def cmd_run(args):
+    moved = db.archive_processed(older_than_hours=args.older_than)
+    print(f"\n✅ Archived {moved:,} processed submission(s) older than {args.older_than:g}h.")
+    print(f"   Archive: {db.archive_path}\n")
+
+
+def cmd_stats(args):
+    counts = db.get_counts()
+    hot = counts["total"] - counts["archived"]
+    print(f"\n   Hot table : {hot:,} ({counts['pending']:,} pending)")
+    print(f"   Archived  : {counts['archived']:,}")
+    print(f"   Archive DB: {db.archive_path}\n")
+
+
+def cmd_convert_vacuum(args):
+    confirm = input("Rewrite the database to enable incremental vacuum? Stop the service first. [yes/N]: ")
+    if confirm.strip().lower() != "yes":
+        print("Cancelled.")
+        return
+    db.convert_to_incremental_vacuum()
+    print("✅ Database converted — archival will now return freed space to disk.\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive processed AlohaAI Watchtower submissions.")
+    sub = parser.add_subparsers(dest="command")
+
+    # run
+    p_run = sub.add_parser("run", help="Archive processed submissions older than N hours")
+    p_run.add_argument("--older-than", type=float, default=ARCHIVE_AFTER_HOURS,
+                       help=f"age in hours (default {ARCHIVE_AFTER_HOURS:g})")
+
+    # stats
+    sub.add_parser("stats", help="Show hot vs archived row counts")
+
+    # convert-vacuum
+    sub.add_parser("convert-vacuum", help="One-off: enable incremental vacuum on an older database")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        cmd_run(args)
+    elif args.command == "stats":
+        cmd_stats(args)
+    elif args.command == "convert-vacuum":
+        cmd_convert_vacuum(args)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1706 @@
+"""
+AlohaAI Emergency Watchtower - Storage
+SQLite storage for citizen submissions, reports and event context: the
+connection pool, DatabaseManager and its async facade, the group-commit
+writer and the Claude response cache.
+"""
+
+import os
+import re
+import json
+import uuid
+import zlib
+import hashlib
+import mmap
+import heapq
+import struct
+import time
+import base64
+import queue
+import asyncio
+import sqlite3
+import functools
+import inspect
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional, List, Dict, Callable, Tuple, Iterable, Iterator
+from dotenv import load_dotenv
+
+try:
+    import fcntl  # POSIX only; the server runs on Debian
+except ImportError:
+    fcntl = None
+
+try:
+    import numpy as np  # vectorised spam scoring; a pure-Python path is used without it
+except ImportError:
+    np = None
+
+from backend.migrations import ARCHIVE_ADDED_COLUMNS, MIGRATIONS, SUBMISSION_COLUMNS, fts_statements
+from backend.local_filters import GAZETTEER_INDEX, MOD_VERDICTS, SPAM_SEED, SpamClassifier, SpamFilter
+
+load_dotenv()
+
+
+# ── Database path ─────────────────────────────────────────────────────────────
+DB_PATH = Path(__file__).parent.parent / "watchtower.db"
+
+# ── Report batches ────────────────────────────────────────────────────────────
+# A report run claims up to GENERATE_BATCH_MAX pending submissions under a lease.
+# Rows whose lease is older than GENERATE_LEASE_SECONDS (a crashed run) can be
+# claimed again by the next run.
+GENERATE_BATCH_MAX     = int(os.getenv("GENERATE_BATCH_MAX", "2000"))
+GENERATE_LEASE_SECONDS = int(os.getenv("GENERATE_LEASE_SECONDS", "600"))
+
+# ── Admin record cache ────────────────────────────────────────────────────────
+# Authenticated requests read admin records from an in-process cache. Any admin
+# change bumps a host-wide epoch (see SharedCounter) that every uvicorn worker
+# and manage_admins.py share, so stale entries are dropped on the next request.
+ADMIN_CACHE_TTL = float(os.getenv("ADMIN_CACHE_TTL", "300"))
+
+# ── Archive (cold storage for processed submissions) ─────────────────────────
+# Point ARCHIVE_PATH at a new file per event (e.g. watchtower_archive_2026_puna.db)
+# to keep each event's history separate. Defaults to <db name>_archive.db.
+ARCHIVE_PATH          = os.getenv("ARCHIVE_PATH", "")
+ARCHIVE_AFTER_HOURS   = float(os.getenv("ARCHIVE_AFTER_HOURS", "6"))
+ARCHIVE_INTERVAL_MINS = float(os.getenv("ARCHIVE_INTERVAL_MINUTES", "30"))
+
+# ── Connection tuning (overridable via .env) ──────────────────────────────────
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_SYNCHRONOUS     = os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()
+DB_MMAP_SIZE       = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_CACHE_SIZE_KB   = int(os.getenv("DB_CACHE_SIZE_KB", str(64 * 1024)))
+
+SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+# ── Connection Pool ───────────────────────────────────────────────────────────
+
+class ConnectionPool:
+    """
+    One long-lived SQLite connection per thread, opened lazily.
+
+    Every connection runs in WAL mode so citizen inserts never block admin
+    reads. Connections are re-opened after a fork (uvicorn --workers) since
+    an SQLite handle must not be shared across processes.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        busy_timeout_ms: int = DB_BUSY_TIMEOUT_MS,
+        synchronous: str = DB_SYNCHRONOUS,
+        mmap_size: int = DB_MMAP_SIZE,
+        cache_size_kb: int = DB_CACHE_SIZE_KB,
+        attach: Optional[Dict[str, Path]] = None,
+    ):
+        synchronous = synchronous.upper()
+        if synchronous not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"synchronous must be one of {', '.join(SYNCHRONOUS_LEVELS)}")
+
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+        self.attach = attach or {}
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._pid = os.getpid()
+
+    def open(self) -> sqlite3.Connection:
+        """
+        Open a new tuned connection outside the per-thread pool. Used for
+        long-running reads (exports) that must not tie up a pooled handle;
+        the caller is responsible for closing it.
+        """
+        conn = sqlite3.connect(
+            str(self.db_path),
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,  # closed from close_all() on another thread
+        )
+        conn.row_factory = sqlite3.Row  # rows accessible by column name
+        # Must precede anything that writes the file header; no-op on existing
+        # databases (see DatabaseManager.convert_to_incremental_vacuum)
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kb)}")  # negative = KiB
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA foreign_keys = ON")
+        for alias, path in self.attach.items():
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (str(path),))
+            conn.execute(f"PRAGMA {alias}.journal_mode = WAL")
+            conn.execute(f"PRAGMA {alias}.synchronous = {self.synchronous}")
+        return conn
+
+    def get(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        if os.getpid() != self._pid:
+            # Forked worker: drop the parent's handles without closing them
+            self._local = threading.local()
+            self._lock = threading.Lock()
+            self._connections = []
+            self._pid = os.getpid()
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self.open()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close_all(self):
+        """Close every connection opened by this pool (shutdown / tests)."""
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections = []
+        self._local = threading.local()
+
+
+# ── Full-text search ──────────────────────────────────────────────────────────
+
+def fts_query(text: str) -> Optional[str]:
+    """
+    Turn free text typed into the admin filter bar into a safe FTS5 query:
+    every word must match, and the last one is a prefix so results update
+    as the user types. Returns None if there is nothing searchable.
+    """
+    terms = re.findall(r"\w+", text)
+    if not terms:
+        return None
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+# ── Shared Counter ────────────────────────────────────────────────────────────
+
+class SharedCounter:
+    """
+    A 64-bit counter in a small memory-mapped file, visible to every process
+    on the host that opens the same path. Reading it is a plain memory load;
+    bump() serialises writers with an flock.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o660)
+        try:
+            if os.fstat(fd).st_size < 8:
+                os.ftruncate(fd, 8)
+            self._mm = mmap.mmap(fd, 8)
+        finally:
+            os.close(fd)
+        self._lock = threading.Lock()
+
+    def value(self) -> int:
+        return struct.unpack_from("<Q", self._mm, 0)[0]
+
+    def bump(self) -> int:
+        with self._lock:
+            with open(self.path, "rb+") as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                value = self.value() + 1
+                struct.pack_into("<Q", self._mm, 0, value)
+        return value
+# ── Pagination cursors ────────────────────────────────────────────────────────
+
+def encode_cursor(timestamp: str, row_id: int) -> str:
+    """Opaque keyset cursor for the (timestamp, id) of the last row on a page."""
+    raw = json.dumps([timestamp, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Inverse of encode_cursor(). Raises ValueError on a malformed cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(timestamp), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+# ── Database Manager ──────────────────────────────────────────────────────────
+
+class DatabaseManager:
+    """Handles all SQLite operations for submissions and event context."""
+
+    def __init__(self, db_path: Path = DB_PATH, archive_path: Optional[Path] = None, **pool_options):
+        self.db_path = db_path
+        self.archive_path = Path(
+            archive_path or ARCHIVE_PATH or db_path.with_name(f"{db_path.stem}_archive.db")
+        )
+        self.pool = ConnectionPool(db_path, attach={"archive": self.archive_path}, **pool_options)
+        self.auth_epoch = SharedCounter(db_path.with_name(f"{db_path.stem}.auth-epoch"))
+        self._admin_cache: Dict[int, Tuple[int, float, Dict]] = {}  # id -> (epoch, expires, record)
+        self.spam_epoch = SharedCounter(db_path.with_name(f"{db_path.stem}.spam-epoch"))
+        self._spam_filter: Optional[Tuple[int, SpamFilter]] = None  # (epoch, filter)
+        self._init_db()
+        self._init_archive()
+        if self._connect().execute("SELECT 1 FROM bulk_load").fetchone():
+            # A bulk import was interrupted before it could rebuild
+            self.rebuild_derived()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Return the calling thread's pooled connection. Use as a context
+        manager (`with self._connect() as conn:`) to scope a transaction —
+        it commits or rolls back but leaves the connection open for reuse.
+        """
+        return self.pool.get()
+
+    def close(self):
+        self.pool.close_all()
+        if "llm_cache" in self.__dict__:
+            self.llm_cache.close()
+
+    @functools.cached_property
+    def llm_cache(self) -> "ResponseCache":
+        """Claude response cache stored beside this database (see ResponseCache)."""
+        path = LLM_CACHE_PATH or self.db_path.with_name(f"{self.db_path.stem}_llm_cache.db")
+        return ResponseCache(Path(path))
+
+    def _init_db(self):
+        """Bring the schema up to date by applying any pending migrations."""
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version    INTEGER PRIMARY KEY,
+                name       TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+        """)
+        conn.commit()
+
+        for version, name, statements in MIGRATIONS:
+            # BEGIN IMMEDIATE serialises concurrent uvicorn workers starting up;
+            # the version is re-checked under the write lock.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                applied = conn.execute(
+                    "SELECT 1 FROM schema_migrations WHERE version = ?", (version,)
+                ).fetchone()
+                if not applied:
+                    for statement in statements:
+                        conn.execute(statement)
+                    conn.execute(
+                        "INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+                        (version, name, datetime.now(timezone.utc).isoformat()),
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def _init_archive(self):
+        """
+        Create the cold-storage table in the attached archive database, and
+        add any ARCHIVE_ADDED_COLUMNS it lacks: the archive file may be new
+        (one per event) or older than the migrations that added them.
+        """
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS archive.submissions (
+                    id            INTEGER PRIMARY KEY,
+                    ref_code      TEXT    NOT NULL,
+                    incident_type TEXT    NOT NULL,
+                    district      TEXT    NOT NULL,
+                    location      TEXT,
+                    description   TEXT    NOT NULL,
+                    severity      TEXT    NOT NULL,
+                    evacuation    TEXT,
+                    reporter_name TEXT,
+                    timestamp     TEXT    NOT NULL,
+                    processed     INTEGER NOT NULL,
+                    mod_status    TEXT    NOT NULL,
+                    archived_at   TEXT    NOT NULL
+                )
+            """)
+            existing = {row[1] for row in conn.execute("PRAGMA archive.table_info(submissions)")}
+            for name, kind in ARCHIVE_ADDED_COLUMNS:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE archive.submissions ADD COLUMN {name} {kind}")
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS archive.idx_archive_timestamp
+                ON submissions (timestamp, id)
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS archive.idx_archive_district_ts
+                ON submissions (district, timestamp, id)
+            """)
+            has_fts = conn.execute(
+                "SELECT 1 FROM archive.sqlite_master WHERE name = 'submissions_fts'"
+            ).fetchone()
+            if not has_fts:
+                for statement in fts_statements("archive"):
+                    conn.execute(statement)
+            conn.commit()
+
+    def schema_version(self) -> int:
+        """Return the highest applied migration version (0 for a fresh DB)."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+        return row[0] or 0
+
+    # ── Admin accounts ────────────────────────────────────────────────────────
+
+    def get_admin_by_login(self, login: str) -> Optional[Dict]:
+        """Fetch admin by email or username."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM admins WHERE email = ? OR username = ?",
+                (login, login),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_admin_by_id(self, admin_id: int) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM admins WHERE id = ?", (admin_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_cached_admin(self, admin_id: int) -> Optional[Dict]:
+        """
+        Return the admin record from the in-process cache without touching
+        SQLite, or None on a miss (unknown id, expired, or invalidated by an
+        admin change in any process). Follow a miss with get_admin_by_id_cached().
+        """
+        entry = self._admin_cache.get(admin_id)
+        if entry is None:
+            return None
+        epoch, expires, record = entry
+        if epoch != self.auth_epoch.value() or expires < time.monotonic():
+            self._admin_cache.pop(admin_id, None)
+            return None
+        return dict(record)
+
+    def get_admin_by_id_cached(self, admin_id: int, ttl: float = ADMIN_CACHE_TTL) -> Optional[Dict]:
+        """get_admin_by_id() through the admin cache (fills it on a miss)."""
+        admin = self.get_cached_admin(admin_id)
+        if admin is not None:
+            return admin
+        epoch = self.auth_epoch.value()  # read before the query so a racing change wins
+        admin = self.get_admin_by_id(admin_id)
+        if admin is not None:
+            self._admin_cache[admin_id] = (epoch, time.monotonic() + ttl, dict(admin))
+        return admin
+
+    def _invalidate_admins(self):
+        """Drop cached admin records here and in every other process."""
+        self.auth_epoch.bump()
+        self._admin_cache.clear()
+
+    def create_admin(self, username: str, email: str, password_hash: str) -> int:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """INSERT INTO admins (username, email, password_hash, created_at)
+                   VALUES (?, ?, ?, ?)""",
+                (username, email, password_hash, datetime.now(timezone.utc).isoformat()),
+            )
+            conn.commit()
+        return cursor.lastrowid
+
+    def update_password(self, admin_id: int, password_hash: str, must_change: int = 0):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE admins SET password_hash = ?, must_change_password = ? WHERE id = ?",
+                (password_hash, must_change, admin_id),
+            )
+            conn.commit()
+        self._invalidate_admins()
+
+    def update_last_login(self, admin_id: int):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE admins SET last_login = ? WHERE id = ?",
+                (datetime.now(timezone.utc).isoformat(), admin_id),
+            )
+            conn.commit()
+
+    def list_admins(self) -> List[Dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, username, email, must_change_password, created_at, last_login FROM admins"
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def delete_admin(self, admin_id: int) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM admins WHERE id = ?", (admin_id,))
+            conn.commit()
+        self._invalidate_admins()
+        return cursor.rowcount > 0
+
+    # ── Submissions ───────────────────────────────────────────────────────────
+
+    INSERT_SUBMISSION_SQL = """
+        INSERT INTO submissions
+            (ref_code, incident_type, district, location, description,
+             severity, evacuation, reporter_name, timestamp,
+             district_match, reported_district, mod_status, spam_score, spam_reason)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    def _submission_params(self, items: List[Dict]) -> List[Tuple]:
+        # The chosen district is checked against the place names in the text
+        # and replaced if they clearly point elsewhere (see GazetteerIndex),
+        # and spam or test submissions are flagged (see SpamFilter). The
+        # filter scores the whole batch in one call, as rescreen() does, and
+        # the gazetteer scans each distinct location once per batch.
+        verdicts = self.spam_filter.verdicts(items)
+        locations: Dict[str, Dict[str, bool]] = {}
+        params = []
+        for data, (mod_status, spam_score, spam_reason) in zip(items, verdicts):
+            district, match = GAZETTEER_INDEX.resolve(
+                data["district"], data.get("location"), data.get("description"), locations,
+            )
+            params.append((
+                data["ref_code"],
+                data["incident_type"],
+                district,
+                data.get("location") or None,
+                data["description"],
+                data.get("severity") or "low",
+                data.get("evacuation") or None,
+                data.get("reporter_name") or None,
+                data.get("timestamp") or datetime.now(timezone.utc).isoformat(),
+                match,
+                data["district"] if district != data["district"] else None,
+                mod_status,
+                spam_score,
+                spam_reason,
+            ))
+        return params
+
+    def insert_submission(self, data: Dict) -> int:
+        """Insert a new citizen submission. Returns the new row id."""
+        with self._connect() as conn:
+            cursor = conn.execute(self.INSERT_SUBMISSION_SQL, self._submission_params([data])[0])
+            conn.commit()
+            return cursor.lastrowid
+
+    def insert_submissions(self, items: List[Dict]) -> List[int]:
+        """
+        Insert several submissions in a single transaction (one commit, one
+        fsync). Returns the new row ids in input order. If any row fails the
+        whole batch is rolled back.
+        """
+        params = self._submission_params(items)
+        with self._connect() as conn:
+            ids = [conn.execute(self.INSERT_SUBMISSION_SQL, p).lastrowid for p in params]
+            conn.commit()
+        return ids
+
+    def bulk_import(
+        self,
+        records: Iterable[Dict],
+        processed: bool = False,
+        batch_size: int = 50_000,
+        progress_callback: Optional[Callable[[int], None]] = None,
+    ) -> int:
+        """
+        Load mapped submission dicts (see map_import_record) with executemany,
+        committing every `batch_size` rows. The counter and search triggers are
+        suspended for the duration (bulk_load guard) and both are rebuilt once
+        at the end, so dashboard counts and search catch up when the load
+        finishes rather than row by row. Returns the number of rows.
+        """
+        sql = """
+            INSERT INTO submissions
+                (ref_code, incident_type, district, location, description,
+                 severity, evacuation, reporter_name, timestamp,
+                 district_match, reported_district, mod_status, spam_score, spam_reason, processed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        flag = 1 if processed else 0
+        conn = self._connect()
+        total = 0
+        batch: List[Dict] = []
+
+        def flush():
+            params = [(*p, flag) for p in self._submission_params(batch)]
+            with conn:
+                conn.executemany(sql, params)
+            if progress_callback:
+                progress_callback(total)
+
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO bulk_load (id, started_at) VALUES (1, ?)",
+                (datetime.now(timezone.utc).isoformat(),),
+            )
+        try:
+            for record in records:
+                batch.append(record)
+                total += 1
+                if len(batch) >= batch_size:
+                    flush()
+                    batch = []
+            if batch:
+                flush()
+        finally:
+            self.rebuild_derived()
+        return total
+
+    def rebuild_derived(self):
+        """
+        Recompute submission_counts and the search index from the submissions
+        table and lift the bulk_load guard, in one transaction. Idempotent;
+        also run at startup in case a bulk import died with the guard set.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM submission_counts")
+            conn.execute("""
+                INSERT INTO submission_counts (district, severity, processed, mod_status, n)
+                SELECT district, severity, processed, mod_status, COUNT(*)
+                FROM submissions
+                GROUP BY district, severity, processed, mod_status
+            """)
+            conn.execute("INSERT INTO submissions_fts (submissions_fts) VALUES ('rebuild')")
+            conn.execute("DELETE FROM bulk_load")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def get_pending(self) -> List[Dict]:
+        """Return all unprocessed submissions (processed = 0)."""
+        with self._connect() as conn:
+            rows = conn.execute("""
+                SELECT * FROM submissions
+                WHERE processed = 0
+                ORDER BY timestamp ASC
+            """).fetchall()
+        return [dict(r) for r in rows]
+
+    def mark_processed(self, ids: List[int]):
+        """
+        Mark a list of submission IDs as processed (processed = 1). Rows the
+        spam filter flagged are skipped; they wait for a coordinator's review.
+        """
+        if not ids:
+            return
+        placeholders = ",".join("?" * len(ids))
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE submissions SET processed = 1 "
+                f"WHERE id IN ({placeholders}) AND mod_status NOT IN ('flagged', 'spam')",
+                ids,
+            )
+            conn.commit()
+
+    # ── Moderation (spam filter) ──────────────────────────────────────────────
+
+    @property
+    def spam_filter(self) -> SpamFilter:
+        """
+        The current SpamFilter. Reloaded from spam_model when any process
+        retrains (spam_epoch); trained from SPAM_SEED until a model is saved.
+        """
+        epoch = self.spam_epoch.value()
+        if self._spam_filter is None or self._spam_filter[0] != epoch:
+            row = self._connect().execute("SELECT model FROM spam_model WHERE id = 1").fetchone()
+            classifier = SpamClassifier.from_json(row["model"]) if row else SpamClassifier.train(SPAM_SEED)
+            self._spam_filter = (epoch, SpamFilter(classifier))
+        return self._spam_filter[1]
+
+    def rescreen(self, submissions: List[Dict]) -> List[Dict]:
+        """
+        Score submissions again with the current filter (it may have been
+        retrained since they arrived) and store any changes. Rows with a
+        coordinator verdict keep it. Returns the submissions with their
+        current mod_status, spam_score and spam_reason.
+        """
+        open_rows = [sub for sub in submissions if sub.get("mod_status") not in MOD_VERDICTS]
+        verdicts = iter(self.spam_filter.verdicts(open_rows))
+        results, updates = [], []
+        for sub in submissions:
+            if sub.get("mod_status") not in MOD_VERDICTS:
+                status, score, reason = next(verdicts)
+                if (status, score, reason) != (sub.get("mod_status"), sub.get("spam_score"), sub.get("spam_reason")):
+                    sub = {**sub, "mod_status": status, "spam_score": score, "spam_reason": reason}
+                    updates.append((status, score, reason, sub["id"]))
+            results.append(sub)
+        if updates:
+            with self._connect() as conn:
+                conn.executemany(
+                    "UPDATE submissions SET mod_status = ?, spam_score = ?, spam_reason = ? "
+                    "WHERE id = ? AND mod_status NOT IN ('spam', 'approved')",
+                    updates,
+                )
+        return results
+
+    def moderate_submission(self, submission_id: int, spam: bool) -> Optional[Dict]:
+        """
+        Record a coordinator's verdict on a submission and retrain the filter
+        with it. A report marked spam is closed (processed); a flagged report
+        marked genuine goes back to pending so the next report includes it.
+        Returns the updated row, or None if no live submission has that id.
+        """
+        status = "spam" if spam else "approved"
+        now = datetime.now(timezone.utc).isoformat()
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                UPDATE submissions
+                SET mod_status = ?,
+                    processed  = CASE WHEN ? = 'spam' THEN 1
+                                      WHEN mod_status IN ('flagged', 'spam') THEN 0
+                                      ELSE processed END,
+                    batch_id   = CASE WHEN ? = 'approved' AND mod_status IN ('flagged', 'spam')
+                                      THEN NULL ELSE batch_id END
+                WHERE id = ?
+                RETURNING *
+                """,
+                (status, status, status, submission_id),
+            ).fetchall()
+            if not rows:
+                return None
+            row = rows[0]
+            conn.execute(
+                """
+                INSERT INTO spam_labels (submission_id, incident_type, text, label, labelled_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (submission_id) DO UPDATE SET label = excluded.label,
+                                                          labelled_at = excluded.labelled_at
+                """,
+                (submission_id, row["incident_type"],
+                 f"{row['location'] or ''} {row['description']}", int(spam), now),
+            )
+        self.retrain_spam_filter()
+        return dict(row)
+
+    def retrain_spam_filter(self) -> Dict:
+        """
+        Train the classifier on SPAM_SEED plus every coordinator label, save
+        it and have every process reload it. Takes milliseconds for
+        thousands of labels.
+        """
+        with self._connect() as conn:
+            labels = conn.execute("SELECT incident_type, text, label FROM spam_labels").fetchall()
+        examples = SPAM_SEED + [(r["incident_type"], r["text"], r["label"]) for r in labels]
+        classifier = SpamClassifier.train(examples)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO spam_model (id, trained_at, examples, model) VALUES (1, ?, ?, ?)",
+                (datetime.now(timezone.utc).isoformat(), len(examples), classifier.to_json()),
+            )
+        self.spam_epoch.bump()
+        return self.spam_filter_stats()
+
+    def spam_filter_stats(self) -> Dict:
+        """Filter settings, training set size and live submissions per mod_status."""
+        with self._connect() as conn:
+            model = conn.execute("SELECT trained_at, examples FROM spam_model WHERE id = 1").fetchone()
+            labels = conn.execute(
+                "SELECT COALESCE(SUM(label), 0) AS spam, COUNT(*) - COALESCE(SUM(label), 0) AS genuine "
+                "FROM spam_labels"
+            ).fetchone()
+            statuses = conn.execute(
+                "SELECT mod_status, SUM(n) AS n FROM submission_counts GROUP BY mod_status HAVING SUM(n) > 0"
+            ).fetchall()
+        return {
+            "threshold": self.spam_filter.threshold,
+            "numpy": np is not None,
+            "trained_at": model["trained_at"] if model else None,
+            "examples": model["examples"] if model else len(SPAM_SEED),
+            "labels": {"spam": labels["spam"], "genuine": labels["genuine"]},
+            "mod_status": {r["mod_status"]: r["n"] for r in statuses},
+        }
+
+    # ── Report batch leases ───────────────────────────────────────────────────
+
+    def claim_pending(
+        self,
+        limit: int = GENERATE_BATCH_MAX,
+        lease_seconds: int = GENERATE_LEASE_SECONDS,
+    ) -> Tuple[Optional[str], List[Dict]]:
+        """
+        Atomically claim up to `limit` pending submissions for one report run.
+        Skips rows held by another run unless that run's lease has expired,
+        and rows flagged as spam that are waiting for review. Returns
+        (batch_id, rows oldest-first), or (None, []) if nothing is free.
+        """
+        now = datetime.now(timezone.utc)
+        expired = (now - timedelta(seconds=lease_seconds)).isoformat()
+        batch_id = uuid.uuid4().hex
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("""
+                UPDATE submissions SET batch_id = ?, claimed_at = ?
+                WHERE id IN (
+                    SELECT id FROM submissions
+                    WHERE processed = 0 AND (batch_id IS NULL OR claimed_at < ?)
+                      AND mod_status NOT IN ('flagged', 'spam')
+                    ORDER BY timestamp ASC, id ASC
+                    LIMIT ?
+                )
+            """, (batch_id, now.isoformat(), expired, limit))
+            rows = conn.execute("""
+                SELECT * FROM submissions
+                WHERE batch_id = ?
+                ORDER BY timestamp ASC, id ASC
+            """, (batch_id,)).fetchall()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        if not rows:
+            return None, []
+        return batch_id, [dict(r) for r in rows]
+
+    def renew_lease(self, batch_id: str):
+        """Extend a running batch's lease so long generations are not reclaimed."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE submissions SET claimed_at = ? WHERE batch_id = ? AND processed = 0",
+                (datetime.now(timezone.utc).isoformat(), batch_id),
+            )
+            conn.commit()
+
+    def complete_batch(self, batch_id: str) -> int:
+        """
+        Mark a batch's submissions processed. Rows another run re-claimed after
+        this lease expired are left alone, and rows flagged as spam during the
+        run are released unprocessed to wait for review. Returns the number
+        of rows marked.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE submissions SET processed = 1 "
+                "WHERE batch_id = ? AND processed = 0 AND mod_status NOT IN ('flagged', 'spam')",
+                (batch_id,),
+            )
+            conn.execute(
+                "UPDATE submissions SET batch_id = NULL, claimed_at = NULL "
+                "WHERE batch_id = ? AND processed = 0",
+                (batch_id,),
+            )
+            conn.commit()
+        return cursor.rowcount
+
+    def release_batch(self, batch_id: str):
+        """Return a failed run's submissions to the pending pool immediately."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE submissions SET batch_id = NULL, claimed_at = NULL "
+                "WHERE batch_id = ? AND processed = 0",
+                (batch_id,),
+            )
+            conn.commit()
+
+    def get_all(self) -> List[Dict]:
+        """Return all submissions, newest first (for the admin submissions tab)."""
+        with self._connect() as conn:
+            rows = conn.execute("""
+                SELECT * FROM submissions
+                ORDER BY timestamp DESC
+            """).fetchall()
+        return [dict(r) for r in rows]
+
+    def get_page(
+        self,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        district: Optional[str] = None,
+        severity: Optional[str] = None,
+        processed: Optional[int] = None,
+        mod_status: Optional[str] = None,
+        include_archive: bool = False,
+    ) -> Dict:
+        """
+        Return one page of submissions, newest first, using keyset pagination
+        on (timestamp, id). Pass the returned `next_cursor` back to fetch the
+        following page; it is None on the last page.
+
+        With include_archive, archived (processed) rows are merged in; each
+        side is range-scanned on its own index and only `limit` rows are merged.
+        """
+        clauses: List[str] = []
+        params: List = []
+        if district:
+            clauses.append("district = ?")
+            params.append(district)
+        if severity:
+            clauses.append("severity = ?")
+            params.append(severity)
+        if processed is not None:
+            clauses.append("processed = ?")
+            params.append(int(processed))
+        if mod_status:
+            clauses.append("mod_status = ?")
+            params.append(mod_status)
+        if cursor:
+            clauses.append("(timestamp, id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        # Archived rows are always processed, so a pending-only view skips the archive
+        use_archive = include_archive and processed != 0
+        columns = ", ".join(SUBMISSION_COLUMNS)
+        with self._connect() as conn:
+            if use_archive:
+                rows = conn.execute(f"""
+                    SELECT * FROM (
+                        SELECT * FROM (SELECT {columns} FROM main.submissions {where}
+                                       ORDER BY timestamp DESC, id DESC LIMIT ?)
+                        UNION ALL
+                        SELECT * FROM (SELECT {columns} FROM archive.submissions {where}
+                                       ORDER BY timestamp DESC, id DESC LIMIT ?)
+                    )
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ?
+                """, (*params, limit + 1, *params, limit + 1, limit + 1)).fetchall()
+            else:
+                rows = conn.execute(f"""
+                    SELECT * FROM submissions
+                    {where}
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ?
+                """, (*params, limit + 1)).fetchall()
+
+        page = [dict(r) for r in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = page[-1]
+            next_cursor = encode_cursor(last["timestamp"], last["id"])
+        return {"submissions": page, "next_cursor": next_cursor}
+
+    def search(
+        self,
+        text: str,
+        limit: int = 25,
+        offset: int = 0,
+        district: Optional[str] = None,
+        severity: Optional[str] = None,
+        include_archive: bool = False,
+    ) -> Dict:
+        """
+        Ranked full-text search over description, location and reporter name.
+        Matches in the location field weigh most. Each result carries a
+        `highlight` copy of the description with matches wrapped in \x02/\x03.
+        Returns {"submissions", "next_offset"} (next_offset is None at the end).
+        """
+        query = fts_query(text)
+        if not query:
+            return {"submissions": [], "next_offset": None}
+
+        filters = ""
+        filter_params: List = []
+        if district:
+            filters += " AND s.district = ?"
+            filter_params.append(district)
+        if severity:
+            filters += " AND s.severity = ?"
+            filter_params.append(severity)
+
+        def select(schema: str) -> str:
+            return f"""
+                SELECT s.*,
+                       highlight(f.submissions_fts, 0, char(2), char(3)) AS highlight,
+                       bm25(f.submissions_fts, 1.0, 2.0, 0.5)            AS rank
+                FROM {schema}.submissions_fts AS f
+                JOIN {schema}.submissions AS s ON s.id = f.rowid
+                WHERE f.submissions_fts MATCH ?{filters}
+            """
+
+        params: List = [query, *filter_params]
+        columns = ", ".join(SUBMISSION_COLUMNS)
+        with self._connect() as conn:
+            if include_archive:
+                sql = f"""
+                    SELECT {columns}, highlight, rank FROM ({select("main")})
+                    UNION ALL
+                    SELECT {columns}, highlight, rank FROM ({select("archive")})
+                    ORDER BY rank LIMIT ? OFFSET ?
+                """
+                params = params * 2
+            else:
+                sql = f"{select('main')} ORDER BY rank LIMIT ? OFFSET ?"
+            rows = conn.execute(sql, (*params, limit + 1, offset)).fetchall()
+
+        results = [dict(r) for r in rows[:limit]]
+        for r in results:
+            r.pop("rank", None)
+        next_offset = offset + limit if len(rows) > limit else None
+        return {"submissions": results, "next_offset": next_offset}
+
+    def iter_submissions(
+        self,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        district: Optional[str] = None,
+        batch_size: int = 1000,
+        include_archive: bool = False,
+        severity: Optional[str] = None,
+        processed: Optional[int] = None,
+        mod_status: Optional[str] = None,
+        text: Optional[str] = None,
+    ) -> Iterator[Dict]:
+        """
+        Stream submissions oldest-first without loading them all into memory.
+
+        Runs on its own connection so a slow consumer (an HTTP download) holds
+        one consistent WAL snapshot without blocking writers or pooled handles.
+        `since` is inclusive and `until` exclusive (ISO timestamps). The other
+        filters match get_page(), and `text` matches search() (unranked). With
+        include_archive, hot and archived rows are merged in timestamp order.
+        """
+        clauses: List[str] = []
+        params: List = []
+        if district:
+            clauses.append("district = ?")
+            params.append(district)
+        if severity:
+            clauses.append("severity = ?")
+            params.append(severity)
+        if processed is not None:
+            clauses.append("processed = ?")
+            params.append(int(processed))
+        if mod_status:
+            clauses.append("mod_status = ?")
+            params.append(mod_status)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        query = fts_query(text) if text else None
+        if text and not query:
+            return
+        columns = ", ".join(SUBMISSION_COLUMNS)
+
+        def stream(conn: sqlite3.Connection, schema: str) -> Iterator[Dict]:
+            where, where_params = list(clauses), list(params)
+            if query:
+                where.append(f"id IN (SELECT rowid FROM {schema}.submissions_fts WHERE submissions_fts MATCH ?)")
+                where_params.append(query)
+            cursor = conn.execute(f"""
+                SELECT {columns} FROM {schema}.submissions
+                {f"WHERE {' AND '.join(where)}" if where else ""}
+                ORDER BY timestamp ASC, id ASC
+            """, where_params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for r in rows:
+                    yield dict(r)
+
+        conn = self.pool.open()
+        try:
+            # Archived rows are always processed, so a pending-only export skips the archive
+            if include_archive and processed != 0:
+                conn.execute("BEGIN")  # one snapshot across both tables
+                yield from heapq.merge(
+                    stream(conn, "main"),
+                    stream(conn, "archive"),
+                    key=lambda r: (r["timestamp"], r["id"]),
+                )
+            else:
+                yield from stream(conn, "main")
+        finally:
+            conn.close()
+
+    def delete_submission(self, submission_id: int) -> bool:
+        """Hard-delete a submission (hot or archived). Returns True if a row was deleted."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM main.submissions WHERE id = ?", (submission_id,)
+            )
+            deleted = cursor.rowcount > 0
+            if not deleted:
+                row = conn.execute(
+                    "SELECT district, severity, mod_status FROM archive.submissions WHERE id = ?",
+                    (submission_id,),
+                ).fetchone()
+                if row:
+                    conn.execute("DELETE FROM archive.submissions WHERE id = ?", (submission_id,))
+                    conn.execute(
+                        """UPDATE archive_counts SET n = n - 1
+                           WHERE district = ? AND severity = ? AND mod_status = ?""",
+                        (row["district"], row["severity"], row["mod_status"]),
+                    )
+                    deleted = True
+            conn.commit()
+        return deleted
+
+    def get_counts(self) -> Dict:
+        """
+        Return pending and total submission counts (from the trigger-maintained
+        submission_counts plus archive_counts). Total includes archived rows;
+        pending leaves out flagged rows, counted as `flagged` (awaiting review).
+        """
+        with self._connect() as conn:
+            row = conn.execute("""
+                SELECT COALESCE((SELECT SUM(n) FROM submission_counts
+                                 WHERE processed = 0 AND mod_status NOT IN ('flagged', 'spam')), 0) AS pending,
+                       COALESCE((SELECT SUM(n) FROM submission_counts
+                                 WHERE processed = 0 AND mod_status IN ('flagged', 'spam')), 0)     AS flagged,
+                       COALESCE((SELECT SUM(n) FROM submission_counts), 0)
+                     + COALESCE((SELECT SUM(n) FROM archive_counts), 0)                     AS total,
+                       COALESCE((SELECT SUM(n) FROM archive_counts), 0)                     AS archived
+            """).fetchone()
+        return {
+            "pending": row["pending"], "flagged": row["flagged"],
+            "total": row["total"], "archived": row["archived"],
+        }
+
+    def get_district_counts(self) -> Dict[str, Dict]:
+        """
+        Per-district breakdown for the dashboard:
+        {district: {"pending", "total", "severity": {level: pending count}}}.
+        Totals include archived submissions; flagged rows are not pending.
+        """
+        with self._connect() as conn:
+            rows = conn.execute("""
+                SELECT district, severity,
+                       processed = 0 AND mod_status NOT IN ('flagged', 'spam') AS pending, SUM(n) AS n
+                FROM submission_counts
+                GROUP BY district, severity, pending
+                HAVING SUM(n) > 0
+                UNION ALL
+                SELECT district, severity, 0, SUM(n)
+                FROM archive_counts
+                GROUP BY district, severity
+                HAVING SUM(n) > 0
+            """).fetchall()
+
+        districts: Dict[str, Dict] = {}
+        for r in rows:
+            d = districts.setdefault(r["district"], {"pending": 0, "total": 0, "severity": {}})
+            d["total"] += r["n"]
+            if r["pending"]:
+                d["pending"] += r["n"]
+                d["severity"][r["severity"]] = d["severity"].get(r["severity"], 0) + r["n"]
+        return districts
+
+    # ── Archival ──────────────────────────────────────────────────────────────
+
+    def archive_processed(self, older_than_hours: float = ARCHIVE_AFTER_HOURS, batch_size: int = 2000) -> int:
+        """
+        Move processed submissions older than `older_than_hours` into the
+        attached archive database, then release the freed pages with an
+        incremental vacuum. Returns the number of rows archived.
+
+        Each batch is copied (archive commit) and then removed from the hot
+        table (main commit). WAL commits are atomic per file, not across files,
+        so a crash between the two leaves rows in both — the copy first deletes
+        any ids the archive already holds, so the next run simply finishes the
+        move. (INSERT OR REPLACE would drop the old copy without firing the
+        FTS delete trigger and leave stale entries in the archive search index.)
+        """
+        cutoff = (datetime.now(timezone.utc) - timedelta(hours=older_than_hours)).isoformat()
+        columns = ", ".join(SUBMISSION_COLUMNS)
+        conn = self._connect()
+        moved = 0
+
+        while True:
+            ids = [r[0] for r in conn.execute("""
+                SELECT id FROM main.submissions
+                WHERE processed = 1 AND timestamp < ?
+                ORDER BY timestamp, id
+                LIMIT ?
+            """, (cutoff, batch_size)).fetchall()]
+            if not ids:
+                break
+            placeholders = ",".join("?" * len(ids))
+
+            with conn:
+                conn.execute(f"DELETE FROM archive.submissions WHERE id IN ({placeholders})", ids)
+                conn.execute(f"""
+                    INSERT INTO archive.submissions ({columns}, archived_at)
+                    SELECT {columns}, ? FROM main.submissions WHERE id IN ({placeholders})
+                """, (datetime.now(timezone.utc).isoformat(), *ids))
+
+            with conn:
+                conn.execute(f"""
+                    INSERT INTO archive_counts (district, severity, mod_status, n)
+                    SELECT district, severity, mod_status, COUNT(*)
+                    FROM main.submissions WHERE id IN ({placeholders})
+                    GROUP BY district, severity, mod_status
+                    ON CONFLICT (district, severity, mod_status) DO UPDATE SET n = n + excluded.n
+                """, ids)
+                conn.execute(f"DELETE FROM main.submissions WHERE id IN ({placeholders})", ids)
+
+            moved += len(ids)
+
+        if moved:
+            conn.execute("PRAGMA main.incremental_vacuum").fetchall()
+        return moved
+
+    def convert_to_incremental_vacuum(self):
+        """
+        One-off: switch a database created before archival support to
+        auto_vacuum=INCREMENTAL. Rewrites the whole file — run it offline.
+        """
+        conn = self._connect()
+        conn.commit()
+        conn.execute("PRAGMA main.auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM main")
+
+    # ── Reports ───────────────────────────────────────────────────────────────
+
+    REPORT_CODEC = "zlib"
+
+    def save_report(
+        self,
+        content: str,
+        submission_ids: List[int],
+        batch_id: Optional[str] = None,
+        timings: Optional[Dict[str, float]] = None,
+        usage: Optional[Dict[str, int]] = None,
+    ) -> int:
+        """Store a generated report (zlib-compressed markdown). Returns its id."""
+        raw = content.encode("utf-8")
+        usage = usage or {}
+        with self._connect() as conn:
+            cursor = conn.execute("""
+                INSERT INTO reports
+                    (created_at, batch_id, submission_ids, submission_count, codec,
+                     content, content_length, timings, input_tokens, output_tokens,
+                     cache_read_tokens, cache_write_tokens)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                datetime.now(timezone.utc).isoformat(),
+                batch_id,
+                json.dumps(submission_ids),
+                len(submission_ids),
+                self.REPORT_CODEC,
+                zlib.compress(raw, 9),
+                len(raw),
+                json.dumps(timings or {}),
+                usage.get("input_tokens", 0),
+                usage.get("output_tokens", 0),
+                usage.get("cache_read_input_tokens", 0),
+                usage.get("cache_creation_input_tokens", 0),
+            ))
+            conn.commit()
+        return cursor.lastrowid
+
+    @staticmethod
+    def _report_dict(row: sqlite3.Row, with_content: bool) -> Dict:
+        report = {
+            "id": row["id"],
+            "created_at": row["created_at"],
+            "batch_id": row["batch_id"],
+            "submission_count": row["submission_count"],
+            "content_length": row["content_length"],
+            "timings": json.loads(row["timings"] or "{}"),
+            "input_tokens": row["input_tokens"],
+            "output_tokens": row["output_tokens"],
+            "cache_read_tokens": row["cache_read_tokens"],
+            "cache_write_tokens": row["cache_write_tokens"],
+        }
+        if with_content:
+            if row["codec"] != "zlib":
+                raise ValueError(f"Unsupported report codec '{row['codec']}'")
+            report["content"] = zlib.decompress(row["content"]).decode("utf-8")
+            report["submission_ids"] = json.loads(row["submission_ids"])
+        return report
+
+    def get_report(self, report_id: int) -> Optional[Dict]:
+        """Return one stored report with its decompressed markdown, or None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM reports WHERE id = ?", (report_id,)).fetchone()
+        return self._report_dict(row, with_content=True) if row else None
+
+    def get_latest_report(self) -> Optional[Dict]:
+        """Return the most recently generated report, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM reports ORDER BY created_at DESC, id DESC LIMIT 1"
+            ).fetchone()
+        return self._report_dict(row, with_content=True) if row else None
+
+    def list_reports(self, limit: int = 20, before_id: Optional[int] = None) -> List[Dict]:
+        """Report metadata (no content), newest first. Page with `before_id`."""
+        with self._connect() as conn:
+            rows = conn.execute(f"""
+                SELECT id, created_at, batch_id, submission_count, content_length,
+                       timings, input_tokens, output_tokens, cache_read_tokens, cache_write_tokens
+                FROM reports
+                {"WHERE id < ?" if before_id else ""}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            """, (*([before_id] if before_id else []), limit)).fetchall()
+        return [self._report_dict(r, with_content=False) for r in rows]
+
+    # ── Report runs (checkpoints) ──────────────────────────────────────────────
+
+    RUN_FIELDS = ("status", "stage", "error", "combined_text", "report", "report_id", "context_summary")
+
+    def create_run(self, run_id: str, submission_ids: List[int]):
+        now = datetime.now(timezone.utc).isoformat()
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO report_runs (id, created_at, updated_at, submission_ids)
+                VALUES (?, ?, ?, ?)
+            """, (run_id, now, now, json.dumps(submission_ids)))
+            conn.commit()
+
+    def update_run(self, run_id: str, **fields):
+        """Set any of RUN_FIELDS on a run and bump its updated_at."""
+        unknown = set(fields) - set(self.RUN_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown report run field(s): {', '.join(sorted(unknown))}")
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE report_runs SET {assignments}, updated_at = ? WHERE id = ?",
+                (*fields.values(), datetime.now(timezone.utc).isoformat(), run_id),
+            )
+            conn.commit()
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM report_runs WHERE id = ?", (run_id,)).fetchone()
+            if not row:
+                return None
+            chunks = conn.execute(
+                "SELECT COUNT(*) FROM report_run_chunks WHERE run_id = ?", (run_id,)
+            ).fetchone()[0]
+        run = dict(row)
+        run["submission_ids"] = json.loads(run["submission_ids"])
+        run["chunks_done"] = chunks
+        return run
+
+    def list_runs(self, limit: int = 20, status: Optional[str] = None) -> List[Dict]:
+        """Recent runs without their stored text, newest first."""
+        with self._connect() as conn:
+            rows = conn.execute(f"""
+                SELECT id, created_at, updated_at, status, stage, error,
+                       json_array_length(submission_ids) AS submission_count, report_id
+                FROM report_runs
+                {"WHERE status = ?" if status else ""}
+                ORDER BY updated_at DESC
+                LIMIT ?
+            """, (*([status] if status else []), limit)).fetchall()
+        return [dict(r) for r in rows]
+
+    def save_run_chunk(self, run_id: str, prompt_hash: str, output: str):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO report_run_chunks (run_id, prompt_hash, output) VALUES (?, ?, ?)",
+                (run_id, prompt_hash, output),
+            )
+            conn.commit()
+
+    def get_run_chunks(self, run_id: str) -> Dict[str, str]:
+        """Checkpointed stage-1 outputs of a run, by prompt hash."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT prompt_hash, output FROM report_run_chunks WHERE run_id = ?", (run_id,)
+            ).fetchall()
+        return {r["prompt_hash"]: r["output"] for r in rows}
+
+    def claim_run(
+        self,
+        run_id: str,
+        lease_seconds: int = GENERATE_LEASE_SECONDS,
+    ) -> Optional[List[Dict]]:
+        """
+        Re-claim a failed run's submissions under its own id so it can be
+        resumed. Rows another run has since taken (and still holds) or
+        processed are left out. Returns the claimed rows oldest-first, or
+        None if the run does not exist or is already complete.
+
+        A run that failed after storing its report (stage 'stored') has only
+        its context summary left to write. Its rows were marked processed
+        with the report, so they are returned as they are, archived or not,
+        without being claimed again.
+        """
+        run = self.get_run(run_id)
+        if not run or run["status"] == "complete":
+            return None
+
+        now = datetime.now(timezone.utc)
+        expired = (now - timedelta(seconds=lease_seconds)).isoformat()
+        ids = json.dumps(run["submission_ids"])
+        columns = ", ".join(SUBMISSION_COLUMNS)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if run["stage"] == "stored":
+                rows = conn.execute(f"""
+                    SELECT {columns} FROM main.submissions WHERE id IN (SELECT value FROM json_each(?))
+                    UNION ALL
+                    SELECT {columns} FROM archive.submissions WHERE id IN (SELECT value FROM json_each(?))
+                    ORDER BY timestamp ASC, id ASC
+                """, (ids, ids)).fetchall()
+            else:
+                conn.execute("""
+                    UPDATE submissions SET batch_id = ?, claimed_at = ?
+                    WHERE id IN (SELECT value FROM json_each(?)) AND processed = 0
+                      AND (batch_id IS NULL OR batch_id = ? OR claimed_at < ?)
+                """, (run_id, now.isoformat(), ids, run_id, expired))
+                rows = conn.execute("""
+                    SELECT * FROM submissions
+                    WHERE batch_id = ?
+                    ORDER BY timestamp ASC, id ASC
+                """, (run_id,)).fetchall()
+            conn.execute(
+                "UPDATE report_runs SET status = 'running', error = NULL, updated_at = ? WHERE id = ?",
+                (now.isoformat(), run_id),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return [dict(r) for r in rows]
+
+    def summaries_in_flight(self, within: float, exclude: Optional[str] = None) -> int:
+        """
+        Runs (other than `exclude`) that stored their report in the last
+        `within` seconds and are still writing its context summary.
+        """
+        since = (datetime.now(timezone.utc) - timedelta(seconds=within)).isoformat()
+        with self._connect() as conn:
+            return conn.execute("""
+                SELECT COUNT(*) FROM report_runs
+                WHERE status = 'running' AND stage = 'stored' AND updated_at >= ? AND id IS NOT ?
+            """, (since, exclude)).fetchone()[0]
+
+    # ── Event Context ─────────────────────────────────────────────────────────
+
+    def get_latest_context(self) -> Optional[str]:
+        """Return the most recent event context summary, or None."""
+        with self._connect() as conn:
+            row = conn.execute("""
+                SELECT summary FROM event_context
+                ORDER BY id DESC LIMIT 1
+            """).fetchone()
+        return row["summary"] if row else None
+
+    def save_context(self, summary: str):
+        """Append a new event context summary."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO event_context (summary, created_at) VALUES (?, ?)",
+                (summary, datetime.now(timezone.utc).isoformat()),
+            )
+            conn.commit()
+
+
+# ── Async Data Access ─────────────────────────────────────────────────────────
+
+DB_THREADS = int(os.getenv("DB_THREADS", "4"))
+
+
+class AsyncDatabaseManager:
+    """
+    Awaitable facade over DatabaseManager for async FastAPI handlers.
+
+    Every public DatabaseManager method is available under the same name as a
+    coroutine (`await adb.get_counts()`). Calls run on a dedicated DB thread
+    pool — each worker thread keeps its own pooled connection — so a slow
+    query blocks only its own caller, never the event loop. Properties,
+    which may query the database or open a file to compute their value,
+    are awaitables resolved on the pool too (`await adb.spam_filter`).
+    """
+
+    def __init__(self, db: DatabaseManager, max_workers: int = DB_THREADS):
+        self.db = db
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Run any blocking callable on the DB thread pool and await its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            return getattr(self.db, name)
+        # Looked up on the class without running descriptors, so nothing blocks the loop here
+        if isinstance(inspect.getattr_static(type(self.db), name, None), (property, functools.cached_property)):
+            return self.run(getattr, self.db, name)
+        attr = getattr(self.db, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def method(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+        return method
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+# ── Group-Commit Writer ───────────────────────────────────────────────────────
+
+SUBMIT_BATCH_WINDOW_MS = float(os.getenv("SUBMIT_BATCH_WINDOW_MS", "2"))
+SUBMIT_BATCH_MAX       = int(os.getenv("SUBMIT_BATCH_MAX", "256"))
+
+
+class SubmissionWriter:
+    """
+    Single background thread that coalesces citizen submissions into
+    group commits.
+
+    submit() queues a row and returns a Future. The writer waits up to
+    `window_ms` after the first queued row for more to arrive, inserts the
+    batch in one transaction, and only then resolves each Future with its
+    row id — so a caller that waits on its Future has the same durability
+    guarantee as a direct insert_submission().
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        db: DatabaseManager,
+        window_ms: float = SUBMIT_BATCH_WINDOW_MS,
+        max_batch: int = SUBMIT_BATCH_MAX,
+    ):
+        self.db = db
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+        # Simple counters for the benchmark / health output
+        self.batches = 0
+        self.rows = 0
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="submission-writer", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, data: Dict) -> Future:
+        """Queue a submission. The Future resolves to its row id after commit."""
+        if self._closed:
+            raise RuntimeError("SubmissionWriter is closed")
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((data, future))
+        return future
+
+    def insert(self, data: Dict, timeout: Optional[float] = None) -> int:
+        """Blocking convenience wrapper: submit() and wait for the row id."""
+        return self.submit(data).result(timeout=timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Flush anything queued and stop the writer thread."""
+        self._closed = True
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+
+            batch = [item]
+            stopping = False
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    nxt = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is self._STOP:
+                    stopping = True
+                    break
+                batch.append(nxt)
+
+            self._commit(batch)
+            if stopping:
+                return
+
+    def _commit(self, batch: List[Tuple[Dict, Future]]):
+        try:
+            ids = self.db.insert_submissions([data for data, _ in batch])
+        except Exception:
+            # One bad row must not fail its neighbours — retry individually
+            for data, future in batch:
+                try:
+                    future.set_result(self.db.insert_submission(data))
+                except Exception as e:
+                    future.set_exception(e)
+        else:
+            for (_, future), row_id in zip(batch, ids):
+                future.set_result(row_id)
+        self.batches += 1
+        self.rows += len(batch)
+
+
+# ── LLM Response Cache ────────────────────────────────────────────────────────
+# Claude responses keyed by a hash of the full request, in their own SQLite
+# file next to the main database. A retried or replayed report run gets every
+# stage that already succeeded back for free. LLM_CACHE=off bypasses it.
+LLM_CACHE_ENABLED       = os.getenv("LLM_CACHE", "on").lower() not in ("0", "off", "false", "no")
+LLM_CACHE_PATH          = os.getenv("LLM_CACHE_PATH", "")
+LLM_CACHE_MAX_MB        = float(os.getenv("LLM_CACHE_MAX_MB", "256"))
+LLM_CACHE_MAX_AGE_HOURS = float(os.getenv("LLM_CACHE_MAX_AGE_HOURS", "72"))
+
+
+class ResponseCache:
+    """
+    Content-addressed store of Claude responses.
+
+    Entries older than `max_age_hours` are dropped, then least-recently-used
+    entries until the stored (compressed) size is under `max_bytes`. Eviction
+    runs every EVICT_EVERY writes rather than on each one. Hit/miss counters
+    are per process; per-entry hit counts and the tokens each hit saved are
+    kept in the table.
+    """
+
+    EVICT_EVERY = 50
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int = int(LLM_CACHE_MAX_MB * 1024 * 1024),
+        max_age_hours: float = LLM_CACHE_MAX_AGE_HOURS,
+        **pool_options,
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.max_age_hours = max_age_hours
+        self.pool = ConnectionPool(self.path, **pool_options)
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        with self.pool.get() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key          TEXT    PRIMARY KEY,          -- sha256 of the request
+                    model        TEXT    NOT NULL,
+                    created_at   REAL    NOT NULL,             -- unix time
+                    last_used_at REAL    NOT NULL,
+                    hits         INTEGER NOT NULL DEFAULT 0,
+                    tokens       INTEGER NOT NULL DEFAULT 0,   -- input + output of the original call
+                    size         INTEGER NOT NULL,             -- bytes of `response`
+                    response     BLOB    NOT NULL              -- zlib-compressed text
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_created ON responses (created_at)")
+            conn.commit()
+
+    @staticmethod
+    def key(model: str, prompt: str, max_tokens: int, system: Optional[str] = None) -> str:
+        raw = json.dumps([model, system, prompt, max_tokens], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for `key`, or None (counted as a miss)."""
+        now = time.time()
+        conn = self.pool.get()
+        row = conn.execute(
+            "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or now - row["created_at"] > self.max_age_hours * 3600:
+            with self._lock:
+                self.misses += 1
+            return None
+        with conn:
+            conn.execute(
+                "UPDATE responses SET hits = hits + 1, last_used_at = ? WHERE key = ?", (now, key)
+            )
+        with self._lock:
+            self.hits += 1
+        return zlib.decompress(row["response"]).decode("utf-8")
+
+    def put(self, key: str, model: str, response: str, tokens: int = 0):
+        blob = zlib.compress(response.encode("utf-8"), 6)
+        now = time.time()
+        with self.pool.get() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO responses
+                    (key, model, created_at, last_used_at, hits, tokens, size, response)
+                VALUES (?, ?, ?, ?, 0, ?, ?, ?)
+            """, (key, model, now, now, tokens, len(blob), blob))
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then LRU entries until under max_bytes. Returns rows removed."""
+        conn = self.pool.get()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            removed = conn.execute(
+                "DELETE FROM responses WHERE created_at < ?",
+                (time.time() - self.max_age_hours * 3600,),
+            ).rowcount
+            excess = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0] - self.max_bytes
+            if excess > 0:
+                # Oldest-used first, up to the running total that covers the excess
+                removed += conn.execute("""
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key, size, SUM(size) OVER (ORDER BY last_used_at, key) AS freed
+                            FROM responses
+                        ) WHERE freed - size < ?
+                    )
+                """, (excess,)).rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if removed:
+            conn.execute("PRAGMA incremental_vacuum").fetchall()
+        return removed
+
+    def stats(self) -> Dict:
+        row = self.pool.get().execute("""
+            SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS bytes,
+                   COALESCE(SUM(hits), 0) AS hits, COALESCE(SUM(hits * tokens), 0) AS tokens_saved
+            FROM responses
+        """).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": row["entries"],
+            "bytes": row["bytes"],
+            "max_bytes": self.max_bytes,
+            "lifetime_hits": row["hits"],
+            "tokens_saved": row["tokens_saved"],
+            "process_hits": self.hits,
+            "process_misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+    def clear(self):
+        with self.pool.get() as conn:
+            conn.execute("DELETE FROM responses")
+        self.pool.get().execute("PRAGMA incremental_vacuum").fetchall()
+
+    def close(self):
+        self.pool.close_all()
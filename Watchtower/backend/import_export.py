@@ -0,0 +1,231 @@
+"""
+AlohaAI Emergency Watchtower - Import / Export
+Streaming readers for bulk submission imports and serialisers for exports.
+"""
+
+import io
+import csv
+import json
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import IO, Optional, List, Dict, Iterable, Iterator
+
+from backend.migrations import SUBMISSION_COLUMNS
+
+
+# ── Bulk Import ───────────────────────────────────────────────────────────────
+
+HAWAII_TZ = timezone(timedelta(hours=-10))  # HST, no daylight saving
+
+# Short district names used by the early prototype run outputs
+DISTRICT_ALIASES = {
+    "hilo": "South Hilo",
+    "kona": "North Kona",
+    "kohala": "North Kohala",
+    "kau": "Ka'u",
+}
+
+
+def iter_json_records(fp: IO[str], read_size: int = 1 << 20) -> Iterator[Dict]:
+    """
+    Stream JSON objects from a text file without loading it whole. Accepts a
+    top-level array of objects (Graph API comment dumps), newline-delimited
+    JSON (our own NDJSON export) or a single object (prototype run output).
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    in_array = None
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        chunk = fp.read(read_size)
+        if not chunk:
+            eof = True
+            return False
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    while True:
+        # Skip whitespace and separators between objects
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) or not fill():
+                break
+        if pos >= len(buf):
+            return
+
+        if in_array is None:
+            in_array = buf[pos] == "["
+            if in_array:
+                pos += 1
+                continue
+        if buf[pos] == "]" and in_array:
+            return
+
+        while True:
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+                break
+            except json.JSONDecodeError:
+                if not fill():
+                    raise
+        pos = end
+        if isinstance(obj, dict):
+            yield obj
+
+
+def normalise_timestamp(value: Optional[str]) -> str:
+    """ISO-8601 UTC, the format the backend writes. Naive times are taken as HST."""
+    if not value:
+        return datetime.now(timezone.utc).isoformat()
+    text = str(value).strip().replace("Z", "+00:00")
+    for parse in (
+        datetime.fromisoformat,
+        lambda t: datetime.strptime(t, "%Y-%m-%dT%H:%M:%S%z"),
+    ):
+        try:
+            dt = parse(text)
+            break
+        except ValueError:
+            continue
+    else:
+        raise ValueError(f"Unrecognised timestamp '{value}'")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=HAWAII_TZ)
+    return dt.astimezone(timezone.utc).isoformat()
+
+
+def import_ref_code(timestamp: str, text: str) -> str:
+    """Deterministic ref code for imported rows, so replays are recognisable."""
+    digest = hashlib.sha1(f"{timestamp}|{text}".encode("utf-8")).hexdigest()[:6].upper()
+    return f"IM-{digest}"
+
+
+def map_import_record(record: Dict) -> List[Dict]:
+    """
+    Map one record from an archived dump onto the submissions schema.
+
+    - Submission rows (our own exports) pass through unchanged.
+    - Graph API comments ({timestamp|created_time, comment|message}) become
+      'other' reports with district 'Unknown' — the location is in the text.
+    - Prototype run outputs ({by_district: {...}}) become one row per district.
+
+    Returns an empty list for records that carry no usable text.
+    """
+    if "incident_type" in record and "description" in record:
+        ts = normalise_timestamp(record.get("timestamp"))
+        return [{
+            **record,
+            "timestamp": ts,
+            "ref_code": record.get("ref_code") or import_ref_code(ts, record["description"]),
+            "district": record.get("district") or "Unknown",
+        }]
+
+    text = record.get("comment") or record.get("message")
+    if text:
+        ts = normalise_timestamp(record.get("timestamp") or record.get("created_time"))
+        author = record.get("from")
+        return [{
+            "ref_code": import_ref_code(ts, text),
+            "incident_type": "other",
+            "district": "Unknown",
+            "description": text,
+            "reporter_name": author.get("name") if isinstance(author, dict) else None,
+            "timestamp": ts,
+        }]
+
+    if isinstance(record.get("by_district"), dict):
+        ts = normalise_timestamp(record.get("timestamp"))
+        rows = []
+        for name, summary in record["by_district"].items():
+            if not summary:
+                continue
+            district = DISTRICT_ALIASES.get(name.lower().replace("'", ""), name)
+            rows.append({
+                "ref_code": import_ref_code(ts, f"{name}|{summary}"),
+                "incident_type": "other",
+                "district": district,
+                "description": summary,
+                "timestamp": ts,
+            })
+        return rows
+
+    return []
+
+
+def iter_import_file(fp: IO[str], skipped: Optional[List[int]] = None) -> Iterator[Dict]:
+    """iter_json_records() + map_import_record(). Unusable records are counted in `skipped`."""
+    for record in iter_json_records(fp):
+        try:
+            rows = map_import_record(record)
+        except (ValueError, KeyError, TypeError):
+            rows = []
+        if not rows and skipped is not None:
+            skipped[0] += 1
+        yield from rows
+
+
+# ── Export ────────────────────────────────────────────────────────────────────
+
+EXPORT_FORMATS = {
+    "csv":     ("text/csv", "csv"),
+    "ndjson":  ("application/x-ndjson", "ndjson"),
+    "geojson": ("application/geo+json", "geojson"),
+}
+
+EXPORT_COLUMNS = SUBMISSION_COLUMNS
+
+
+def export_submissions(rows: Iterable[Dict], fmt: str, flush_every: int = 500) -> Iterator[str]:
+    """
+    Serialise submission rows incrementally as CSV, NDJSON or GeoJSON.
+    Yields text chunks of roughly `flush_every` rows so memory stays flat.
+
+    Submissions carry no coordinates, so GeoJSON features have a null
+    geometry and the district / location text in their properties.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'")
+
+    buf = io.StringIO()
+    writer = csv.writer(buf) if fmt == "csv" else None
+
+    if fmt == "csv":
+        writer.writerow(EXPORT_COLUMNS)
+    elif fmt == "geojson":
+        buf.write('{"type":"FeatureCollection","features":[\n')
+
+    first = True
+    for n, row in enumerate(rows, start=1):
+        if fmt == "csv":
+            writer.writerow([row.get(c) for c in EXPORT_COLUMNS])
+        elif fmt == "ndjson":
+            buf.write(json.dumps({c: row.get(c) for c in EXPORT_COLUMNS}, ensure_ascii=False))
+            buf.write("\n")
+        else:
+            feature = {
+                "type": "Feature",
+                "id": row.get("id"),
+                "geometry": None,
+                "properties": {c: row.get(c) for c in EXPORT_COLUMNS if c != "id"},
+            }
+            if not first:
+                buf.write(",\n")
+            buf.write(json.dumps(feature, ensure_ascii=False))
+        first = False
+
+        if n % flush_every == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+
+    if fmt == "geojson":
+        buf.write("\n]}\n")
+    if buf.tell():
+        yield buf.getvalue()
@@ -0,0 +1,718 @@
+"""
+AlohaAI Emergency Watchtower - Local Filters
+Checks that run without Claude: the district gazetteer, the spam filter and
+near-duplicate clustering of submissions.
+"""
+
+import os
+import atexit
+import re
+import json
+import math
+import zlib
+import operator
+import itertools
+import threading
+import multiprocessing
+import unicodedata
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, List, Dict, Tuple, Iterable, Iterator
+from dotenv import load_dotenv
+
+try:
+    import numpy as np  # vectorised spam scoring; a pure-Python path is used without it
+except ImportError:
+    np = None
+
+load_dotenv()
+
+
+# ── Gazetteer ─────────────────────────────────────────────────────────────────
+# Place names per district. The same list is given to Claude in the map-stage
+# prompt (GAZETTEER_PROMPT) and compiled into GAZETTEER_INDEX, which checks the
+# district a citizen picked against the place names in their report.
+GAZETTEER: Dict[str, Tuple[str, ...]] = {
+    "North Kohala": (
+        "Halaula", "Hawi", "Kapaau", "Puakea Ranch", "Mahukona", "Kaholena", "Kohala Ranch",
+        "Upolu", "Halawa", "Makapala", "Niulii", "Pulolu",
+    ),
+    "South Kohala": ("Kawaihae", "Hapuna", "Puako", "Waikoloa", "Waimea", "Waikii", "Puukapu"),
+    "Hamakua": (
+        "Waipio", "Kukuihaele", "Ahualoa", "Honokaa", "Paauhau", "Kalopa", "Paauilo",
+        "Kukuaiau", "Niupea",
+    ),
+    "North Hilo": (
+        "Ookala", "Waipunalei", "Laupahoehoe", "Papaaloa", "Kapehu", "Pohakupuka", "Ninole",
+        "Umauma",
+    ),
+    "South Hilo": (
+        "Hakalau", "Honomu", "Pepeekeo", "Onomea", "Papaikou", "Paukaa", "Puueo", "Wainaku",
+        "Keaukaha", "Panaewa", "Kaiwiki", "Piihonua", "Kaumana", "Sunrise Ridge", "Waiakea Uka",
+    ),
+    "Puna": (
+        "Kurtistown", "Hawaiian Paradise Park", "HPP", "Hawaiian Acres", "Orchidland",
+        "Hawaiian Beaches", "Ainaloa", "Nanawale Estates", "Kapoho", "Pohoiki", "Leilani Estates",
+        "Opihikao", "Kehena", "Kaimu", "Mountain View", "Glenwood", "Fern Acres", "Volcano",
+        "Kalapana",
+    ),
+    "Ka'u": (
+        "Wood Valley", "Pahala", "Punaluu", "Naalehu", "Waiohinu", "Ka Lae", "Kamaoa",
+        "Ocean View", "Manuka",
+    ),
+    "South Kona": (
+        "Honomalino", "Milolii", "Papa Bay", "Kona", "Hookena", "Kealia", "Honaunau", "Keei",
+        "Napoopoo", "Captain Cook", "Kealakekua",
+    ),
+    "North Kona": (
+        "Honalo", "Keauhou", "Alii Heights", "Hualalai", "Kailua-Kona", "Kealakehe", "Kaloko",
+        "Makalawena", "Holulaloa", "Kaupulehu", "Kukio", "Puulani Ranch", "Makalei Estates",
+    ),
+}
+
+GAZETTEER_PROMPT = "\n".join(
+    f'<district name="{district}">{", ".join(places)}</district>'
+    for district, places in GAZETTEER.items()
+)
+
+# Extra names for the index only (the prompt stays byte-stable for caching):
+# the main towns, and regional names that cover more than one district
+GAZETTEER_EXTRA: Dict[str, Tuple[str, ...]] = {
+    "Hilo": ("South Hilo",),
+    "Pahoa": ("Puna",),
+    "Keaau": ("Puna",),
+    "Kailua": ("North Kona",),
+    "Kona": ("North Kona", "South Kona"),
+    "Kohala": ("North Kohala", "South Kohala"),
+}
+
+# Names that are also everyday words; they only count in the location field
+GAZETTEER_LOCATION_ONLY = {"volcano", "ocean view", "mountain view"}
+
+_OKINA = str.maketrans("", "", "ʻ'’‘`")
+# One bytes.translate pass over ASCII text: letters and digits lower-cased,
+# apostrophes dropped (the delete argument), everything else a space
+_ASCII_FOLD = bytes(ord(c.lower()) if c.isalnum() else 32 for c in map(chr, range(128))) + b" " * 128
+
+
+def fold_place_name(text: str) -> str:
+    """
+    Normalise text for place-name matching: ʻokina and apostrophes dropped,
+    diacritics stripped, lower case, punctuation collapsed to single spaces.
+    "Kaʻū", "Ka'u" and "KAU" all fold to "kau".
+    """
+    if not text.isascii():
+        text = text.translate(_OKINA)
+        text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return " ".join(text.encode("ascii").translate(_ASCII_FOLD, b"'`").decode("ascii").split())
+
+
+def _deletions(key: str) -> Iterator[str]:
+    for i in range(len(key)):
+        yield key[:i] + key[i + 1:]
+
+
+class GazetteerIndex:
+    """
+    In-process place-name index over GAZETTEER. Names are keyed by their folded
+    form with spaces removed, so "Kailua Kona", "kailua-kona" and "KailuaKona"
+    are one name; locate() scans every run of up to `max_words` words.
+
+    The short location field is also matched fuzzily: one typo (a dropped,
+    extra, swapped or wrong letter) in names of five letters or more, via a
+    precomputed single-deletion table. Descriptions are matched exactly, which
+    keeps the per-row cost low enough for bulk imports.
+    """
+
+    LOCATION_WEIGHT = 3.0
+    FUZZY_WEIGHT = 2.0
+    DESCRIPTION_WEIGHT = 1.0
+    FUZZY_MIN_LENGTH = 5
+    CORRECT_MIN_SCORE = 2.0
+
+    def __init__(self, gazetteer: Dict[str, Iterable[str]], extra: Optional[Dict[str, Iterable[str]]] = None):
+        self.districts = list(gazetteer)
+        self.names: Dict[str, frozenset] = {}
+        self.location_only = {n.replace(" ", "") for n in GAZETTEER_LOCATION_ONLY}
+        self.max_words = 1
+
+        entries: List[Tuple[str, str]] = []
+        for district, places in gazetteer.items():
+            entries.append((district, district))
+            entries.extend((place, district) for place in places)
+        for place, districts in (extra or {}).items():
+            entries.extend((place, district) for district in districts)
+
+        names: Dict[str, set] = {}
+        for place, district in entries:
+            folded = fold_place_name(place)
+            self.max_words = max(self.max_words, folded.count(" ") + 1)
+            names.setdefault(folded.replace(" ", ""), set()).add(district)
+        self.names = {key: frozenset(districts) for key, districts in names.items()}
+        # every prefix of every name: a word that is not one cannot start a match
+        self.prefixes = {key[:i] for key in self.names for i in range(1, len(key) + 1)}
+
+        # deletion → names it was made from (first letter kept), and the
+        # (first letter, length) of anything within one edit of a name
+        self.deletes: Dict[str, set] = {}
+        self.fuzzy_shapes = set()
+        for key in self.names:
+            if len(key) >= self.FUZZY_MIN_LENGTH:
+                self.fuzzy_shapes.update((key[0], len(key) + delta) for delta in (-1, 0, 1))
+                for d in _deletions(key):
+                    if d[:1] == key[:1]:
+                        self.deletes.setdefault(d, set()).add(key)
+
+    def fuzzy_lookup(self, key: str) -> Optional[str]:
+        """The single indexed name within one edit of `key`, if exactly one is."""
+        if (key[:1], len(key)) not in self.fuzzy_shapes:
+            return None
+        found = set(self.deletes.get(key, ()))                     # letter dropped
+        for d in _deletions(key):
+            if d in self.names and len(d) >= self.FUZZY_MIN_LENGTH:  # letter added
+                found.add(d)
+            found.update(self.deletes.get(d, ()))                  # wrong / swapped letter
+        found = {name for name in found if name[:1] == key[:1]}
+        return found.pop() if len(found) == 1 else None
+
+    def scan(self, text: str, fuzzy: bool = False, location: bool = False) -> Dict[str, Tuple[str, bool]]:
+        """{name: (district key, fuzzy?)} for each gazetteer name found in `text`."""
+        words = fold_place_name(text).split()
+        found: Dict[str, bool] = {}
+        if not fuzzy and self.prefixes.isdisjoint(words):
+            return found  # most descriptions name no place at all
+        i = 0
+        while i < len(words):
+            if not fuzzy and words[i] not in self.prefixes:
+                i += 1
+                continue
+            for n in range(min(self.max_words, len(words) - i), 0, -1):
+                key = "".join(words[i:i + n])
+                is_fuzzy = False
+                if key not in self.names:
+                    key, is_fuzzy = (self.fuzzy_lookup(key) if fuzzy else None), True
+                if key and (location or key not in self.location_only):
+                    found.setdefault(key, is_fuzzy)
+                    i += n
+                    break
+            else:
+                i += 1
+        return found
+
+    def locate(
+        self,
+        location: Optional[str],
+        description: Optional[str],
+        memo: Optional[Dict[str, Dict[str, bool]]] = None,
+    ) -> Dict[str, float]:
+        """
+        Score each district by the place names in a submission. A name counts
+        once per field; one shared by several districts splits its weight.
+        Pass the same `memo` dict for a whole batch: location fields repeat
+        heavily, so each distinct one is then scanned (fuzzily) once.
+        """
+        scores: Dict[str, float] = {}
+
+        def add(hits: Dict[str, bool], weight: float):
+            for key, is_fuzzy in hits.items():
+                districts = self.names[key]
+                w = (self.FUZZY_WEIGHT if is_fuzzy else weight) / len(districts)
+                for district in districts:
+                    scores[district] = scores.get(district, 0.0) + w
+
+        if location:
+            hits = memo.get(location) if memo is not None else None
+            if hits is None:
+                hits = self.scan(location, fuzzy=True, location=True)
+                if memo is not None:
+                    memo[location] = hits
+            add(hits, self.LOCATION_WEIGHT)
+        if description:
+            add(self.scan(description), self.DESCRIPTION_WEIGHT)
+        return scores
+
+    def resolve(
+        self,
+        district: str,
+        location: Optional[str],
+        description: Optional[str],
+        memo: Optional[Dict[str, Dict[str, bool]]] = None,
+    ) -> Tuple[str, str]:
+        """
+        Check a submission's chosen district against its text (`memo` as for
+        locate()). Returns (district, match) where match is one of
+        DISTRICT_MATCHES:
+
+          confirmed  the text points at the chosen district (or ties with it)
+          corrected  the text points clearly at one other district, which is
+                     returned; needs a location hit or two or more mentions
+          ambiguous  the text names places elsewhere but not decisively
+          unmatched  no known place names; the choice is kept as is
+        """
+        scores = self.locate(location, description, memo)
+        if not scores:
+            return district, "unmatched"
+        best = max(scores.values())
+        if scores.get(district, 0.0) >= best:
+            return district, "confirmed"
+        leaders = [d for d, s in scores.items() if s == best]
+        if len(leaders) == 1 and district not in scores and best >= self.CORRECT_MIN_SCORE:
+            return leaders[0], "corrected"
+        return district, "ambiguous"
+
+
+DISTRICT_MATCHES = ("confirmed", "corrected", "ambiguous", "unmatched")
+
+# Built once per process at import
+GAZETTEER_INDEX = GazetteerIndex(GAZETTEER, GAZETTEER_EXTRA)
+
+
+# ── Spam Filter ───────────────────────────────────────────────────────────────
+# Test submissions and off-topic posts are caught locally instead of paying for
+# Claude to drop them. Keyword rules flag the obvious cases; a naive Bayes
+# classifier over hashed words scores the rest, and reports it rates at
+# SPAM_THRESHOLD or above are flagged. Flagged rows (mod_status 'flagged')
+# stay out of prompts until a coordinator marks them "not spam".
+SPAM_THRESHOLD = float(os.getenv("SPAM_THRESHOLD", "0.9"))
+SPAM_FEATURES  = 1 << 18   # hashed feature space; index 0 is the bias
+
+# mod_status values: 'pending' (default), 'flagged' by the filter, and a
+# coordinator's verdict, 'spam' or 'approved'. Verdicts are never re-scored.
+# Flagged rows are never claimed by a report run or marked processed: they wait
+# for a coordinator, whose 'spam' verdict marks them processed and 'approved'
+# returns them to the pending pool.
+SPAM_STATUSES = ("flagged", "spam")
+MOD_VERDICTS = ("spam", "approved")
+
+# Matched against the lower-cased text: re.I would fold case at every position
+# of every search, which roughly doubles their cost on bulk imports
+SPAM_RULES: List[Tuple[str, "re.Pattern[str]"]] = [
+    ("test submission", re.compile(
+        r"^\W*(?:test(?:ing)?|asdf\w*|qwerty|hello|hi|ignore(?: this)?|sample|dummy|lorem ipsum)"
+        r"(?:\W+(?:test(?:ing)?|\d+))*\W*$")),
+    ("link or promotion", re.compile(
+        r"https?://|www\.|\b(?:follow|subscribe to|dm) (?:me|us|my)\b"
+        r"|\b(?:promo code|discount|giveaway|crypto|bitcoin|onlyfans)\b")),
+    ("keyboard mash", re.compile(r"([^\W\d_])\1{5,}|^[^aeiou\s\d]{8,}$")),
+]
+
+# Starting examples so the classifier works before coordinators label anything;
+# their labels (spam_labels) are added to these on every retrain
+SPAM_SEED: List[Tuple[str, str, int]] = [
+    # (incident type, text, 1 = spam). Genuine examples span every incident type
+    # and the everyday words real reports use (store, water, house, families,
+    # shelter) so those are not mistaken for chatter.
+    ("lava", "Lava crossing the road near Leilani Estates, smoke everywhere", 0),
+    ("lava", "New fissure opened on Pohoiki Road, fountaining and loud roaring", 0),
+    ("lava", "Flow front moving toward the subdivision, maybe 200 yards from the last house", 0),
+    ("lava", "Glow visible from our lanai tonight, looks closer than yesterday", 0),
+    ("lava", "Cracks steaming in the road on Leilani Ave, ground is hot", 0),
+    ("lava", "Lava reached the ocean at Kapoho, big laze plume blowing toward shore", 0),
+    ("fire", "Brush fire spreading toward homes near Waikoloa", 0),
+    ("fire", "Lots of smoke from the gulch behind our street, can see flames", 0),
+    ("fire", "House on fire on Kaloli Drive, fire trucks not here yet", 0),
+    ("fire", "Grass fire along the highway near mile marker 12, wind pushing it east", 0),
+    ("fire", "Smoke is thick in the neighborhood, ash landing on cars", 0),
+    ("flooding", "Flooding on Kamehameha Ave, water over the road", 0),
+    ("flooding", "Stream overflowed and our yard is under water, rising fast", 0),
+    ("flooding", "Bridge on Wainaku Street washed out, cars cannot cross", 0),
+    ("flooding", "Heavy rain all night, mud coming down the hill into houses", 0),
+    ("flooding", "Water in the store parking lot is knee deep, people stuck inside", 0),
+    ("road", "Road closed at highway 130 due to fallen trees", 0),
+    ("road", "Big crack across the road on Chain of Craters, not safe to drive", 0),
+    ("road", "Police roadblock at the Pahoa junction, only residents let through", 0),
+    ("road", "Landslide blocking both lanes on the Hamakua coast highway", 0),
+    ("road", "Traffic backed up for miles on Highway 11, evacuees trying to leave", 0),
+    ("power", "No power in Hawaiian Acres since 3am, lines down", 0),
+    ("power", "Power pole snapped and wires are on the ground by the school", 0),
+    ("power", "Whole block lost electricity, neighbor on oxygen needs power", 0),
+    ("power", "Transformer exploded, sparks and the lights went out", 0),
+    ("power", "Outage across Orchidland, generators running out of gas", 0),
+    ("tsunami", "Sirens going off in Hilo bay, people evacuating to higher ground", 0),
+    ("tsunami", "Ocean pulled way back at the harbor, boats sitting on the bottom", 0),
+    ("tsunami", "Waves surging into the park at Keaukaha, water over the seawall", 0),
+    ("accident", "Car accident on Saddle Road, two vehicles, injuries", 0),
+    ("accident", "Truck rolled over near the bridge, driver trapped", 0),
+    ("accident", "Gas leak smell near the station, people moving away", 0),
+    ("accident", "Elderly man fell and cannot get up, no cell service to call", 0),
+    ("other", "Ash falling in Pahala, air quality very bad, kupuna need help", 0),
+    ("other", "Strong sulfur smell and vog in Ocean View, hard to breathe", 0),
+    ("other", "Earthquake shook the house, cracks in the wall and driveway", 0),
+    ("other", "Water main broke, no water in Kaumana since morning", 0),
+    ("other", "Family stranded, road blocked by lava, need evacuation help", 0),
+    ("other", "Evacuation shelter at the community center is full, families being turned away", 0),
+    ("other", "The store is out of bottled water and ice, people lining up", 0),
+    ("other", "Our catchment tank is covered in ash, is the water safe to drink", 0),
+    ("other", "Neighbors left their dogs behind, animals need rescue on our street", 0),
+    ("other", "Shelter needs cots, blankets and baby formula", 0),
+    ("other", "No cell service or internet since the quake, cannot reach family", 0),
+    ("other", "Gas station ran out of fuel, long line of cars", 0),
+    ("other", "Kupuna living alone on Orchid Street has not been checked on", 0),
+    ("other", "Lots of dead fish washing up on the shore, water looks brown", 0),
+    ("other", "Is the school still being used as a shelter, where should we go", 0),
+    ("other", "Can anyone help us move our kupuna out before the road closes", 0),
+    ("other", "Does anyone have a generator we can borrow for a medical device", 0),
+    ("other", "We can take in a family with kids, we have room and food", 0),
+    ("other", "Is there a doctor or nurse at the shelter, someone is sick", 0),
+    ("other", "Beautiful sunset in Kona tonight!", 1),
+    ("other", "Anyone know a good poke place in Hilo?", 1),
+    ("other", "Happy birthday to my sister, love you", 1),
+    ("other", "Great surf at Hapuna today, come down", 1),
+    ("other", "Selling a used surfboard, message me", 1),
+    ("other", "Nice weather for the beach this weekend", 1),
+    ("other", "Check out my new photos from the farmers market", 1),
+    ("other", "lol this app is cool", 1),
+    ("other", "Just testing the form, please ignore", 1),
+    ("other", "Can someone recommend a good mechanic", 1),
+    ("other", "Mahalo for the great food at the festival", 1),
+    ("other", "Anyone selling tickets for the concert on Saturday", 1),
+    ("other", "Who wants to go hiking this weekend, hit me up", 1),
+    ("other", "Looking for a roommate in Kailua, rent is cheap", 1),
+    ("other", "This is a test of the reporting system", 1),
+    ("other", "Testing testing one two three", 1),
+    ("other", "My cat is so cute today haha", 1),
+    ("other", "Best coffee farm tour on the island, book now", 1),
+    ("other", "Vote for my band in the contest please", 1),
+    ("other", "Lost my sunglasses at the beach park, reward", 1),
+    ("other", "Going to the game tonight, go team", 1),
+    ("other", "What a lovely rainbow over the bay this morning", 1),
+    ("other", "Does anyone have a recipe for kalua pig", 1),
+    ("other", "ok", 1),
+    ("other", "nothing to report just saying hi", 1),
+    ("other", "Your app is slow and the map is ugly", 1),
+    ("fire", "jk nothing is on fire lol", 1),
+    ("lava", "Just checking if this thing works", 1),
+    ("road", "Free puppies to a good home, call me", 1),
+]
+
+
+def spam_features(incident_type: Optional[str], text: str, memo: Optional[Dict[str, int]] = None) -> List[int]:
+    """
+    Hashed feature ids: bias, incident type, words and word pairs. Pass the
+    same `memo` dict for a whole batch so each distinct token is hashed once.
+    """
+    words = fold_place_name(text or "").split()
+    tokens = [f"type:{incident_type or ''}", *words, *(f"{a} {b}" for a, b in zip(words, words[1:]))]
+    if memo is None:
+        return [0, *(zlib.crc32(t.encode()) % (SPAM_FEATURES - 1) + 1 for t in tokens)]
+    features = [0]
+    for t in tokens:
+        f = memo.get(t)
+        if f is None:
+            f = memo[t] = zlib.crc32(t.encode()) % (SPAM_FEATURES - 1) + 1
+        features.append(f)
+    return features
+
+
+class SpamClassifier:
+    """
+    Multinomial naive Bayes over hashed unigrams and bigrams, kept as one
+    log-odds weight per feature (index 0 holds the class prior). Features
+    never seen in training weigh 0: a word the model does not know is no
+    evidence either way, so a report is only flagged on words that were
+    seen in spam. With NumPy the weights are a dense vector and a batch is
+    scored in one gather and reduceat; without it the same sum runs in Python.
+    """
+
+    def __init__(self, weights: Dict[int, float]):
+        self.weights = weights
+        self.vector = None
+        if np is not None:
+            self.vector = np.zeros(SPAM_FEATURES, dtype=np.float32)
+            if weights:
+                self.vector[np.fromiter(weights.keys(), dtype=np.int64)] = np.fromiter(weights.values(), dtype=np.float32)
+            self.vector[0] = weights.get(0, 0.0)
+
+    @classmethod
+    def train(cls, examples: Iterable[Tuple[str, str, int]], alpha: float = 1.0) -> "SpamClassifier":
+        """Fit on (incident type, text, label) examples with add-`alpha` smoothing."""
+        counts: Tuple[Dict[int, int], Dict[int, int]] = ({}, {})
+        docs = [0, 0]
+        for incident_type, text, label in examples:
+            docs[label] += 1
+            for f in spam_features(incident_type, text)[1:]:
+                counts[label][f] = counts[label].get(f, 0) + 1
+        vocab = set(counts[0]) | set(counts[1])
+        totals = [sum(c.values()) + alpha * len(vocab) for c in counts]
+
+        weights = {
+            f: math.log((counts[1].get(f, 0) + alpha) / totals[1])
+             - math.log((counts[0].get(f, 0) + alpha) / totals[0])
+            for f in vocab
+        }
+        weights[0] = math.log((docs[1] + 1) / (docs[0] + 1))
+        return cls(weights)
+
+    def to_json(self) -> str:
+        return json.dumps({"weights": self.weights}, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, raw: str) -> "SpamClassifier":
+        return cls({int(f): w for f, w in json.loads(raw)["weights"].items()})
+
+    def probabilities(self, docs: List[List[int]]) -> List[float]:
+        """P(spam) for each feature list from spam_features()."""
+        if not docs:
+            return []
+        if self.vector is not None:
+            ids = np.fromiter(itertools.chain.from_iterable(docs), dtype=np.int64)
+            starts = np.cumsum([0] + [len(d) for d in docs[:-1]])
+            log_odds = np.add.reduceat(self.vector[ids], starts).astype(np.float64)
+            return (1.0 / (1.0 + np.exp(-np.clip(log_odds, -50, 50)))).tolist()
+        get = self.weights.get
+        return [
+            1.0 / (1.0 + math.exp(-max(-50.0, min(50.0, sum(get(f, 0.0) for f in d)))))
+            for d in docs
+        ]
+
+
+class SpamFilter:
+    """
+    Keyword rules, then the classifier. verdicts() gives each submission a
+    (mod_status, spam_score, spam_reason). High-severity and evacuation
+    reports are only ever flagged by a rule, never by the classifier alone.
+    """
+
+    def __init__(self, classifier: SpamClassifier, threshold: float = SPAM_THRESHOLD):
+        self.classifier = classifier
+        self.threshold = threshold
+
+    @staticmethod
+    def rule(sub: Dict) -> Optional[str]:
+        text = (sub.get("description") or "").strip().lower()
+        for name, pattern in SPAM_RULES:
+            if pattern.search(text):
+                return name
+        return None
+
+    def verdicts(self, submissions: List[Dict]) -> List[Tuple[str, float, Optional[str]]]:
+        """Score a batch; the classifier runs once over every row no rule caught."""
+        rules = [self.rule(sub) for sub in submissions]
+        unruled = [i for i, r in enumerate(rules) if r is None]
+        memo: Dict[str, int] = {}
+        scores = dict(zip(unruled, self.classifier.probabilities([
+            spam_features(submissions[i].get("incident_type"),
+                          f"{submissions[i].get('location') or ''} {submissions[i].get('description') or ''}",
+                          memo)
+            for i in unruled
+        ])))
+
+        results = []
+        for i, sub in enumerate(submissions):
+            if rules[i]:
+                results.append(("flagged", 1.0, f"rule: {rules[i]}"))
+                continue
+            score = round(scores[i], 4)
+            protected = sub.get("severity") == "high" or sub.get("evacuation")
+            if score >= self.threshold and not protected:
+                results.append(("flagged", score, "classifier"))
+            else:
+                results.append(("pending", score, None))
+        return results
+
+
+# ── Near-duplicate Clustering ─────────────────────────────────────────────────
+# During an event many people send the same report ("No power in Hawaiian
+# Acres"). Before prompting, each (district, incident type) bucket is
+# clustered with MinHash + LSH and every cluster goes to Claude once, with a
+# report count and the member ref codes. DEDUP_THRESHOLD is the estimated
+# Jaccard similarity of character shingles at which two reports are merged
+# (0 = send every report as is).
+DEDUP_THRESHOLD    = float(os.getenv("DEDUP_THRESHOLD", "0.7"))
+DEDUP_WORKERS      = max(1, int(os.getenv("DEDUP_WORKERS", str(os.cpu_count() or 1))))
+DEDUP_NUM_PERM     = 64       # signature length
+DEDUP_SHINGLE      = 5        # characters per shingle
+DEDUP_PARALLEL_MIN = 20_000   # fewer rows than this are clustered in-process
+DEDUP_BUCKET_CAP   = 32       # newest leaders kept per LSH band bucket
+DEDUP_MAX_CHECKS   = 4        # leaders compared per report, most shared bands first
+
+SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2}
+
+_HASH_BITS = 32
+_HASH_MUL = 0x9E3779B1  # Fibonacci hashing spreads crc32 over the top bits
+
+
+def minhash_signature(text: str, num_perm: int = DEDUP_NUM_PERM, k: int = DEDUP_SHINGLE) -> Tuple[int, ...]:
+    """
+    MinHash signature of the character k-shingles of `text`, by one-permutation
+    hashing: each shingle is hashed once, the top bits pick one of `num_perm`
+    bins and the bin keeps its minimum. Empty bins borrow from the next full
+    bin to the right (rotation densification), so short texts still compare.
+    About 30x cheaper than `num_perm` independent hashes in pure Python.
+    `num_perm` must be a power of two.
+    """
+    data = text.encode("utf-8")
+    shift = _HASH_BITS - (num_perm.bit_length() - 1)
+    low = (1 << shift) - 1
+    empty = 1 << shift
+    sig = [empty] * num_perm
+    crc32 = zlib.crc32
+    for i in range(max(1, len(data) - k + 1)):
+        h = (crc32(data[i:i + k]) * _HASH_MUL) & 0xFFFFFFFF
+        b, v = h >> shift, h & low
+        if v < sig[b]:
+            sig[b] = v
+    if empty in sig:
+        # Walk right to left twice round so every bin sees its next full bin
+        nearest, dist = None, 0
+        for b in range(2 * num_perm - 1, -1, -1):
+            v = sig[b % num_perm]
+            dist += 1
+            if v < empty:
+                nearest, dist = v, 0
+            elif b < num_perm and nearest is not None:
+                sig[b] = nearest + dist * empty  # tagged with the distance borrowed
+    return tuple(sig)
+
+
+def lsh_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    (bands, rows) for LSH on `num_perm`-long signatures: the split whose
+    S-curve midpoint (1/bands)^(1/rows) is highest without exceeding
+    `threshold`, so true matches are rarely missed and candidates are checked.
+    """
+    options = [(num_perm // r, r) for r in range(1, num_perm + 1) if num_perm % r == 0]
+    below = [(b, r) for b, r in options if (1 / b) ** (1 / r) <= threshold]
+    return max(below, key=lambda br: (1 / br[0]) ** (1 / br[1])) if below else options[0]
+
+
+def cluster_texts(texts: List[str], threshold: float, num_perm: int = DEDUP_NUM_PERM) -> List[List[int]]:
+    """
+    Leader clustering of one bucket of texts; returns clusters as lists of
+    indexes into `texts`, in order of their first member. Each text joins the
+    most similar existing leader among its LSH candidates, else leads a new
+    cluster; comparing only with leaders stops clusters chaining through a
+    run of slightly different reports. Identical texts skip hashing, and each
+    band bucket keeps only its DEDUP_BUCKET_CAP newest leaders and only the
+    DEDUP_MAX_CHECKS leaders sharing most bands are compared, which keeps the
+    cost per text flat when many reports are alike but not alike enough.
+    Module-level so it can run in the process pool.
+    """
+    bands, rows = lsh_bands(threshold, num_perm)
+    clusters: List[List[int]] = []
+    leaders: List[Tuple[int, ...]] = []
+    index: Dict[Tuple, deque] = {}   # (band, band values) → recent leader ids
+    exact: Dict[str, int] = {}
+
+    for i, text in enumerate(texts):
+        best = exact.get(text)
+        if best is None:
+            sig = minhash_signature(text, num_perm)
+            keys = [(band, sig[band * rows:(band + 1) * rows]) for band in range(bands)]
+            hits = Counter(c for key in keys for c in index.get(key, ()))
+            best_sim = threshold
+            for c, _ in hits.most_common(DEDUP_MAX_CHECKS):
+                sim = sum(map(operator.eq, sig, leaders[c])) / num_perm
+                if sim >= best_sim:
+                    best, best_sim = c, sim
+            if best is None:
+                best = len(clusters)
+                clusters.append([])
+                leaders.append(sig)
+                for key in keys:
+                    index.setdefault(key, deque(maxlen=DEDUP_BUCKET_CAP)).append(best)
+            exact[text] = best
+        clusters[best].append(i)
+    return clusters
+
+
+_dedup_pools: Dict[int, ProcessPoolExecutor] = {}
+_dedup_pools_lock = threading.Lock()
+
+
+def dedup_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool for clustering large batches, started on first use and kept until shutdown_dedup_pools()."""
+    with _dedup_pools_lock:
+        pool = _dedup_pools.get(workers)
+        if pool is None:
+            pool = _dedup_pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+            )
+        return pool
+
+
+def shutdown_dedup_pools():
+    """Stop the clustering worker processes. Called at app shutdown, and at exit for scripts."""
+    with _dedup_pools_lock:
+        pools = list(_dedup_pools.values())
+        _dedup_pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+atexit.register(shutdown_dedup_pools)
+
+
+class DuplicateClusterer:
+    """
+    Groups near-identical submissions and collapses each group into one
+    record. Submissions are bucketed by (district, incident type) and each
+    bucket is clustered on its location + description with cluster_texts().
+    Batches of DEDUP_PARALLEL_MIN rows or more spread the buckets over
+    `workers` processes, largest first.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEDUP_THRESHOLD,
+        workers: int = DEDUP_WORKERS,
+        num_perm: int = DEDUP_NUM_PERM,
+    ):
+        self.threshold = threshold
+        self.workers = max(1, workers)
+        self.num_perm = num_perm
+
+    @staticmethod
+    def text(sub: Dict) -> str:
+        return fold_place_name(f"{sub.get('location') or ''} {sub.get('description') or ''}")
+
+    def cluster(self, submissions: List[Dict]) -> List[List[Dict]]:
+        """Clusters of near-duplicate submissions, in order of their first member."""
+        if self.threshold <= 0 or len(submissions) < 2:
+            return [[sub] for sub in submissions]
+
+        buckets: Dict[Tuple, List[int]] = {}
+        for i, sub in enumerate(submissions):
+            buckets.setdefault((sub.get("district"), sub.get("incident_type")), []).append(i)
+        members = sorted(buckets.values(), key=len, reverse=True)
+        texts = [[self.text(submissions[i]) for i in bucket] for bucket in members]
+
+        if self.workers > 1 and len(submissions) >= DEDUP_PARALLEL_MIN and len(members) > 1:
+            pool = dedup_pool(self.workers)
+            results = pool.map(cluster_texts, texts, itertools.repeat(self.threshold),
+                               itertools.repeat(self.num_perm))
+        else:
+            results = (cluster_texts(t, self.threshold, self.num_perm) for t in texts)
+
+        clusters = [
+            [submissions[bucket[j]] for j in group]
+            for bucket, groups in zip(members, results)
+            for group in groups
+        ]
+        position = {id(sub): i for i, sub in enumerate(submissions)}
+        clusters.sort(key=lambda c: position[id(c[0])])
+        return clusters
+
+    @staticmethod
+    def representative(members: List[Dict]) -> Dict:
+        """
+        One record for a cluster: the most detailed description, the highest
+        severity and any evacuation notice among the members, the first and
+        last submission times, `report_count` and the members' `member_refs`.
+        """
+        if len(members) == 1:
+            return members[0]
+        rep = dict(max(members, key=lambda s: len(s.get("description") or "")))
+        rep["severity"] = max((m.get("severity") or "low" for m in members),
+                              key=lambda s: SEVERITY_RANK.get(s, 0))
+        rep["evacuation"] = rep.get("evacuation") or next(
+            (m["evacuation"] for m in members if m.get("evacuation")), None)
+        times = sorted(m.get("timestamp") or "" for m in members)
+        rep["timestamp"], rep["last_timestamp"] = times[0], times[-1]
+        rep["report_count"] = len(members)
+        rep["member_refs"] = [m.get("ref_code", "—") for m in members]
+        return rep
+
+    def collapse(self, submissions: List[Dict]) -> List[Dict]:
+        """The submissions with each cluster of near-duplicates replaced by one record."""
+        return [self.representative(members) for members in self.cluster(submissions)]
@@ -4,12 +4,16 @@ Serves the frontend and provides API endpoints for citizen submissions
 and AI-powered emergency report generation.
 """
 
+import io
 import os
 import json
+import tempfile
 import asyncio
+import logging
 import requests as http_requests
 from pathlib import Path
 from datetime import datetime
+from contextlib import aclosing, asynccontextmanager
 from typing import AsyncGenerator, Optional
 
 from fastapi import FastAPI, HTTPException, Request, Response
@@ -27,12 +31,63 @@ from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 
-from backend.watchtower import EmergencyReportGenerator, DatabaseManager
+from backend.db import (
+    DatabaseManager, AsyncDatabaseManager, SubmissionWriter, ARCHIVE_INTERVAL_MINS, LLM_CACHE_ENABLED,
+)
+from backend.import_export import EXPORT_FORMATS, export_submissions, iter_import_file
+from backend.local_filters import shutdown_dedup_pools
+from backend.reports import AsyncEmergencyReportGenerator
+from backend.scheduler import close_claude_schedulers
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="AlohaAI Emergency Watchtower", version="2.0.0")
+# Shared DB instance (thread-safe via per-thread pooled connections in DatabaseManager)
+db = DatabaseManager()
+
+# Handlers await this instead of calling `db` directly, so SQLite work runs on
+# a small DB thread pool and never stalls the event loop (or in-flight SSE streams)
+adb = AsyncDatabaseManager(db)
+
+# Citizen inserts are group-committed by a single background writer
+submission_writer = SubmissionWriter(db)
+
+# Only reports credential problems on /api/health; each generation builds its
+# own generator, since a generator carries per-run state
+credentials_check = AsyncEmergencyReportGenerator(adb)
+
+
+log = logging.getLogger("watchtower")
+
+
+async def archive_loop():
+    """Periodically move old processed submissions to the archive database."""
+    while True:
+        await asyncio.sleep(ARCHIVE_INTERVAL_MINS * 60)
+        try:
+            moved = await adb.archive_processed()
+            if moved:
+                log.info("Archived %d processed submission(s)", moved)
+        except Exception:
+            log.exception("Archival run failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    archive_task = asyncio.create_task(archive_loop()) if ARCHIVE_INTERVAL_MINS > 0 else None
+    yield
+    if archive_task:
+        archive_task.cancel()
+    # Context summaries outlive the request that started them; let them land
+    await AsyncEmergencyReportGenerator.drain_context_tasks()
+    submission_writer.close()
+    shutdown_dedup_pools()
+    close_claude_schedulers()
+    adb.close()
+    db.close()
+
+
+app = FastAPI(title="AlohaAI Emergency Watchtower", version="2.0.0", lifespan=lifespan)
 
 # Rate limiter
 limiter = Limiter(key_func=get_remote_address, default_limits=[])
@@ -57,9 +112,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Shared DB instance (thread-safe via per-call connections in DatabaseManager)
-db = DatabaseManager()
-
 # ── Auth setup ────────────────────────────────────────────────────────────────
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY  = os.getenv("SECRET_KEY", "change-me-in-env")
@@ -86,18 +138,23 @@ def read_session(token: str) -> Optional[int]:
         return None
 
 
-def get_current_admin(request: Request) -> Optional[dict]:
+async def get_current_admin(request: Request) -> Optional[dict]:
     token = request.cookies.get("session")
     if not token:
         return None
     admin_id = read_session(token)
     if not admin_id:
         return None
-    return db.get_admin_by_id(admin_id)
+    # Fast path: a dict lookup; the cache is invalidated across workers on
+    # password changes and deletions
+    admin = db.get_cached_admin(admin_id)
+    if admin is not None:
+        return admin
+    return await adb.get_admin_by_id_cached(admin_id)
 
 
-def require_admin(request: Request) -> dict:
-    admin = get_current_admin(request)
+async def require_admin(request: Request) -> dict:
+    admin = await get_current_admin(request)
     if not admin:
         raise HTTPException(status_code=401, detail="Not authenticated")
     return admin
@@ -134,14 +191,14 @@ async def serve_user_form():
 @app.get("/admin/login")
 async def serve_login(request: Request):
     # Already logged in — go straight to admin
-    if get_current_admin(request):
+    if await get_current_admin(request):
         return RedirectResponse("/admin", status_code=302)
     return FileResponse(str(FRONTEND_DIR / "login.html"))
 
 
 @app.get("/admin/change-password")
 async def serve_change_password(request: Request):
-    admin = get_current_admin(request)
+    admin = await get_current_admin(request)
     if not admin:
         return RedirectResponse("/admin/login", status_code=302)
     return FileResponse(str(FRONTEND_DIR / "change_password.html"))
@@ -149,7 +206,7 @@ async def serve_change_password(request: Request):
 
 @app.get("/admin")
 async def serve_admin(request: Request):
-    admin = get_current_admin(request)
+    admin = await get_current_admin(request)
     if not admin:
         return RedirectResponse("/admin/login", status_code=302)
     if admin["must_change_password"]:
@@ -184,6 +241,9 @@ class SubmitRequest(BaseModel):
 class SaveRequest(BaseModel):
     content: str
 
+class ModerationRequest(BaseModel):
+    spam: bool       # True = spam / test, False = genuine report
+
 
 # ── SSE Helper ────────────────────────────────────────────────────────────────
 
@@ -195,11 +255,11 @@ def sse_event(data: dict) -> str:
 @app.post("/api/auth/login")
 @limiter.limit("5/minute")
 async def login(request: Request, req: LoginRequest):
-    admin = db.get_admin_by_login(req.login.strip())
+    admin = await adb.get_admin_by_login(req.login.strip())
     if not admin or not verify_password(req.password, admin["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials.")
 
-    db.update_last_login(admin["id"])
+    await adb.update_last_login(admin["id"])
     token = make_session(admin["id"])
 
     response = JSONResponse({
@@ -225,7 +285,7 @@ async def logout(response: Response):
 
 @app.post("/api/auth/change-password")
 async def change_password(req: ChangePasswordRequest, request: Request):
-    admin = get_current_admin(request)
+    admin = await get_current_admin(request)
     if not admin:
         raise HTTPException(status_code=401, detail="Not authenticated.")
 
@@ -238,13 +298,13 @@ async def change_password(req: ChangePasswordRequest, request: Request):
     if len(req.new_password) < 10:
         raise HTTPException(status_code=400, detail="Password must be at least 10 characters.")
 
-    db.update_password(admin["id"], hash_password(req.new_password), must_change=0)
+    await adb.update_password(admin["id"], hash_password(req.new_password), must_change=0)
     return JSONResponse({"ok": True})
 
 
 @app.get("/api/auth/me")
 async def me(request: Request):
-    admin = get_current_admin(request)
+    admin = await get_current_admin(request)
     if not admin:
         raise HTTPException(status_code=401, detail="Not authenticated.")
     return JSONResponse({
@@ -279,59 +339,227 @@ async def submit_report(request: Request, req: SubmitRequest):
         chars = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
         data["ref_code"] = "HI-" + "".join(random.choices(chars, k=6))
 
-    db.insert_submission(data)
+    # Resolves once the batch containing this row has committed
+    await asyncio.wrap_future(submission_writer.submit(data))
     return JSONResponse({"ref_code": data["ref_code"]})
 
 
 # ── Submissions List ──────────────────────────────────────────────────────────
 
+SUBMISSIONS_PAGE_MAX = 200
+
+
 @app.get("/api/submissions")
-async def get_submissions(request: Request):
-    """Return all submissions (newest first) for the admin Submissions tab."""
-    require_admin(request)
-    submissions = db.get_all()
-    return JSONResponse({"submissions": submissions})
+async def get_submissions(
+    request: Request,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    district: Optional[str] = None,
+    severity: Optional[str] = None,
+    processed: Optional[int] = None,
+    mod_status: Optional[str] = None,
+    include_archive: bool = False,
+):
+    """
+    Return one page of submissions (newest first) for the admin Submissions tab.
+    Filters are applied in SQL; pass `next_cursor` back as `cursor` for the next page.
+    Set include_archive to merge in archived (processed) submissions.
+    """
+    await require_admin(request)
+    limit = max(1, min(limit, SUBMISSIONS_PAGE_MAX))
+    try:
+        page = await adb.get_page(
+            limit=limit,
+            cursor=cursor,
+            district=district or None,
+            severity=severity or None,
+            processed=processed,
+            mod_status=mod_status or None,
+            include_archive=include_archive,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(page)
 
 
 @app.get("/api/submissions/counts")
 async def get_counts(request: Request):
-    """Return pending and total submission counts for the admin status bar."""
-    require_admin(request)
-    return JSONResponse(db.get_counts())
+    """Return pending/total counts and a per-district breakdown for the admin status bar."""
+    await require_admin(request)
+    counts = await adb.get_counts()
+    counts["districts"] = await adb.get_district_counts()
+    return JSONResponse(counts)
+
+
+SEARCH_PAGE_MAX = 100
+
+
+@app.get("/api/submissions/search")
+async def search_submissions(
+    request: Request,
+    q: str = "",
+    limit: int = 25,
+    offset: int = 0,
+    district: Optional[str] = None,
+    severity: Optional[str] = None,
+    include_archive: bool = False,
+):
+    """
+    Ranked full-text search over description, location and reporter name for
+    the admin filter bar. Pass `next_offset` back as `offset` for more results.
+    """
+    await require_admin(request)
+    limit = max(1, min(limit, SEARCH_PAGE_MAX))
+    results = await adb.search(
+        q,
+        limit=limit,
+        offset=max(0, offset),
+        district=district or None,
+        severity=severity or None,
+        include_archive=include_archive,
+    )
+    return JSONResponse(results)
+
+
+@app.get("/api/submissions/export")
+async def export_submissions_endpoint(
+    request: Request,
+    format: str = "csv",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    district: Optional[str] = None,
+    severity: Optional[str] = None,
+    processed: Optional[int] = None,
+    mod_status: Optional[str] = None,
+    q: Optional[str] = None,
+    include_archive: bool = True,
+):
+    """
+    Stream submissions as CSV, NDJSON or GeoJSON for after-action reviews.
+    Takes the Submissions tab's filters (and search query `q`), so the admin
+    can download what they are looking at.
+    Rows are read in batches from a server-side cursor and serialised as they
+    go, so memory use does not grow with the size of the export.
+    """
+    await require_admin(request)
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+
+    media_type, ext = EXPORT_FORMATS[format]
+    filename = f"watchtower_submissions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{ext}"
+    rows = db.iter_submissions(
+        since=since or None,
+        until=until or None,
+        district=district or None,
+        severity=severity or None,
+        processed=processed,
+        mod_status=mod_status or None,
+        text=q or None,
+        include_archive=include_archive,
+    )
+
+    # A sync iterator — Starlette pulls it from a worker thread, off the event loop
+    return StreamingResponse(
+        export_submissions(rows, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.post("/api/submissions/import")
+async def import_submissions(request: Request, processed: bool = False):
+    """
+    Bulk-load an archived dump (JSON array, NDJSON or prototype run output)
+    sent as the raw request body. The body is spooled to a temp file and
+    stream-parsed on the DB thread pool. See import_submissions.py for the CLI.
+    """
+    await require_admin(request)
+
+    with tempfile.TemporaryFile() as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+
+        def run_import():
+            skipped = [0]
+            # Closing the wrapper closes the spool too; closing it again below is a no-op
+            with io.TextIOWrapper(spool, encoding="utf-8") as fp:
+                imported = db.bulk_import(iter_import_file(fp, skipped), processed=processed)
+            return imported, skipped[0]
+
+        try:
+            imported, skipped = await adb.run(run_import)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise HTTPException(status_code=400, detail=f"Could not parse import file: {e}")
+
+    return JSONResponse({"imported": imported, "skipped": skipped})
 
 
 @app.delete("/api/submissions/{submission_id}")
 async def delete_submission(submission_id: int, request: Request):
     """Hard-delete a submission (admin moderation action)."""
-    require_admin(request)
-    deleted = db.delete_submission(submission_id)
+    await require_admin(request)
+    deleted = await adb.delete_submission(submission_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Submission not found.")
     return JSONResponse({"deleted": True})
 
 
+@app.post("/api/submissions/{submission_id}/moderation")
+async def moderate_submission(submission_id: int, req: ModerationRequest, request: Request):
+    """
+    Record a coordinator's spam verdict on a submission (the spam-filter
+    audit). The filter is retrained with it. A report marked spam is closed;
+    a flagged report marked genuine returns to pending so the next report
+    includes it.
+    """
+    await require_admin(request)
+    row = await adb.moderate_submission(submission_id, req.spam)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Submission not found.")
+    return JSONResponse(row)
+
+
+@app.get("/api/spam-filter")
+async def spam_filter_stats(request: Request):
+    """Spam-filter threshold, training set size and submissions per moderation status."""
+    await require_admin(request)
+    return JSONResponse(await adb.spam_filter_stats())
+
+
 # ── Report Generation (SSE streaming) ────────────────────────────────────────
 
 @app.post("/api/generate")
-async def generate_report(request: Request):
-    require_admin(request)
+async def generate_report(request: Request, fresh: bool = False, resume: Optional[str] = None):
+    await require_admin(request)
     """
     Reads all unprocessed (pending) submissions, sends them to Claude,
     and streams progress + the final report back via Server-Sent Events.
 
     After a successful generation the processed submissions are marked
-    in the DB and a context summary is saved for the next cycle.
+    in the DB; the context summary for the next cycle is written in the
+    background after the report event is sent.
+    Stages that already succeeded for identical input (a retried run) are
+    answered from the response cache; `?fresh=true` bypasses it.
+
+    Each run is checkpointed per stage under its run id. `?resume=<run_id>`
+    re-claims a failed or interrupted run's submissions and continues after
+    its last completed stage; a run that stored its report but failed writing
+    the context summary only writes the summary again.
 
     Event types:
-      log    { type, message, level }   level: info | processing | success | error
-      status { type, status, pending, total }
-      report { type, content }
-      done   { type }
-      error  { type, message }
+      run          { type, run_id, resumed_from }   id to pass as ?resume= if the run fails
+      log          { type, message, level }   level: info | processing | success | error
+      status       { type, status, pending, total }
+      report_delta { type, content }          final report text, streamed as it is written
+      report       { type, content, report_id, pending, total }   the complete report
+      skipped      { type, message }          no report: every submission was flagged as spam
+      done         { type }
+      error        { type, message, run_id? }   run_id when the run can be resumed
     """
 
     async def stream() -> AsyncGenerator[str, None]:
-        generator = EmergencyReportGenerator()
+        generator = AsyncEmergencyReportGenerator(adb, use_cache=LLM_CACHE_ENABLED and not fresh)
 
         # ── Validate credentials ──────────────────────────────────────────
         if not generator.is_valid():
@@ -340,14 +568,37 @@ async def generate_report(request: Request):
             yield sse_event({"type": "error", "message": "Missing API credentials. Check server .env file."})
             return
 
-        # ── Check for pending submissions ─────────────────────────────────
-        pending = db.get_pending()
+        # ── Resume a failed run from its checkpoints ──────────────────────
+        run = None
+        if resume:
+            run = await adb.get_run(resume)
+            pending = await adb.claim_run(resume) if run else None
+            if not pending:
+                message = (
+                    "Report run not found." if not run
+                    else "That report run already completed." if run["status"] == "complete"
+                    else "That run's submissions have since been taken by another report run."
+                )
+                yield sse_event({"type": "error", "message": message})
+                return
+            batch_id = resume
+
+        # ── Claim a batch of pending submissions ──────────────────────────
+        # Rows are leased to this run so a concurrent generation (another
+        # admin or uvicorn worker) picks up a disjoint batch instead.
+        else:
+            batch_id, pending = await adb.claim_pending()
         if not pending:
-            yield sse_event({"type": "log", "message": "No pending submissions to process.", "level": "info"})
-            yield sse_event({"type": "error", "message": "No pending submissions — nothing to generate a report from."})
+            counts = await adb.get_counts()
+            if counts["pending"]:
+                yield sse_event({"type": "log", "message": "All pending submissions are already being processed by another report run.", "level": "info"})
+                yield sse_event({"type": "error", "message": "Another report run is already processing the pending submissions."})
+            else:
+                yield sse_event({"type": "log", "message": "No pending submissions to process.", "level": "info"})
+                yield sse_event({"type": "error", "message": "No pending submissions — nothing to generate a report from."})
             return
 
-        counts = db.get_counts()
+        counts = await adb.get_counts()
         yield sse_event({
             "type": "status",
             "status": "Starting…",
@@ -356,96 +607,73 @@ async def generate_report(request: Request):
         })
         yield sse_event({
             "type": "log",
-            "message": f"Found {len(pending)} pending submission(s). Starting analysis…",
+            "message": (
+                f"Resuming report run over {len(pending)} submission(s)…" if run
+                else f"Found {len(pending)} pending submission(s). Starting analysis…"
+            ),
             "level": "info",
         })
 
-        # ── Progress queue for thread → async bridge ──────────────────────
-        queue: asyncio.Queue = asyncio.Queue()
-        loop = asyncio.get_event_loop()
-
-        def progress(msg: str, level: str = "processing"):
-            loop.call_soon_threadsafe(queue.put_nowait, ("log", msg, level))
-
-        # ── Run blocking Claude work in thread pool ───────────────────────
-        async def run_analysis():
-            import concurrent.futures
-            executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
-
-            def blocking_work():
-                try:
-                    report = generator.generate_report(pending, lambda m: progress(m))
-
-                    if not report:
-                        loop.call_soon_threadsafe(
-                            queue.put_nowait, ("error", "AI report generation failed.", None)
-                        )
-                        return
-
-                    progress("Report generated successfully", "success")
+        # ── Run the async Claude pipeline, streaming its progress ─────────
+        # No worker thread: Claude calls are awaited on the event loop and DB
+        # work goes through the shared adb pool.
+        report = None
+        try:
+            async with aclosing(generator.generate_events(pending, batch_id=batch_id, run=run)) as events:
+                async for event in events:
+                    if event["type"] == "skipped":
+                        report = event  # batch already completed; nothing to release
+                        updated = await adb.get_counts()
+                        yield sse_event({"type": "log", "message": event["message"], "level": "info"})
+                        yield sse_event({
+                            "type": "status",
+                            "status": "Complete",
+                            "pending": updated["pending"],
+                            "total": updated["total"],
+                        })
+                        continue
+                    if event["type"] != "report":
+                        yield sse_event(event)
+                        continue
+
+                    report = event
+                    yield sse_event({"type": "log", "message": "Report generated successfully", "level": "success"})
 
                     # Fetch updated counts (pending should now be 0 for this batch)
-                    updated = db.get_counts()
-                    loop.call_soon_threadsafe(
-                        queue.put_nowait, ("report", report, updated)
-                    )
-
-                except Exception as e:
-                    loop.call_soon_threadsafe(
-                        queue.put_nowait, ("error", str(e), None)
-                    )
-                finally:
-                    loop.call_soon_threadsafe(
-                        queue.put_nowait, ("done", None, None)
-                    )
-
-            return loop.run_in_executor(executor, blocking_work)
-
-        analysis_future = await run_analysis()
-
-        # ── Drain queue and stream events ─────────────────────────────────
-        while True:
-            try:
-                item = await asyncio.wait_for(queue.get(), timeout=180.0)
-            except asyncio.TimeoutError:
-                yield sse_event({"type": "error", "message": "Request timed out."})
-                break
-
-            kind, data, extra = item
-
-            if kind == "log":
-                level = extra if extra else "processing"
-                yield sse_event({"type": "log", "message": data, "level": level})
-
-            elif kind == "report":
-                # extra is the updated counts dict
-                updated_counts = extra or {}
-                yield sse_event({
-                    "type": "report",
-                    "content": data,
-                    "pending": updated_counts.get("pending", 0),
-                    "total": updated_counts.get("total", 0),
-                })
-                yield sse_event({
-                    "type": "status",
-                    "status": "Complete",
-                    "pending": updated_counts.get("pending", 0),
-                    "total": updated_counts.get("total", 0),
-                })
-
-            elif kind == "error":
-                yield sse_event({"type": "error", "message": data})
-                break
-
-            elif kind == "done":
-                yield sse_event({"type": "done"})
-                break
-
-        # Clean up executor future
-        try:
-            await asyncio.wait_for(analysis_future, timeout=5.0)
-        except Exception:
-            pass
+                    updated = await adb.get_counts()
+                    yield sse_event({
+                        "type": "report",
+                        "content": report["content"],
+                        "report_id": report["report_id"],
+                        "pending": updated["pending"],
+                        "total": updated["total"],
+                    })
+                    yield sse_event({
+                        "type": "status",
+                        "status": "Complete",
+                        "pending": updated["pending"],
+                        "total": updated["total"],
+                    })
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client went away mid-run: hand the rows straight back rather
+            # than leaving them leased until GENERATE_LEASE_SECONDS.
+            await asyncio.shield(adb.release_batch(batch_id))
+            raise
+        except Exception as e:
+            if report is not None:
+                # Failed after the report was stored; the report stands
+                yield sse_event({"type": "log", "message": f"Report saved, but the run did not finish: {e}", "level": "error"})
+            else:
+                await adb.release_batch(batch_id)
+                yield sse_event({"type": "error", "message": str(e), "run_id": batch_id})
+                return
+
+        if report is None:
+            await adb.release_batch(batch_id)
+            yield sse_event({"type": "error", "message": "AI report generation failed.", "run_id": batch_id})
+            return
+
+        yield sse_event({"type": "done"})
 
     return StreamingResponse(
         stream(),
@@ -567,7 +795,7 @@ async def save_report(req: SaveRequest, request: Request):
     Convert the markdown report to a styled PDF, save it on the server,
     and return a download URL so the browser can fetch it immediately.
     """
-    require_admin(request)
+    await require_admin(request)
     REPORTS_DIR.mkdir(exist_ok=True)
 
     file_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -586,11 +814,70 @@ async def save_report(req: SaveRequest, request: Request):
     })
 
 
+# ── Stored Reports ────────────────────────────────────────────────────────────
+
+@app.get("/api/reports")
+async def list_reports(request: Request, limit: int = 20, before_id: Optional[int] = None):
+    """List generated reports (metadata only), newest first. Page with `before_id`."""
+    await require_admin(request)
+    limit = max(1, min(limit, 100))
+    return JSONResponse({"reports": await adb.list_reports(limit=limit, before_id=before_id)})
+
+
+@app.get("/api/reports/latest")
+async def latest_report(request: Request):
+    """Return the most recent report so the dashboard can show it on open."""
+    await require_admin(request)
+    report = await adb.get_latest_report()
+    if not report:
+        raise HTTPException(status_code=404, detail="No reports generated yet.")
+    return JSONResponse(report)
+
+
+@app.get("/api/reports/{report_id}")
+async def get_report(report_id: int, request: Request):
+    """Return one stored report with its markdown content."""
+    await require_admin(request)
+    report = await adb.get_report(report_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found.")
+    return JSONResponse(report)
+
+
+@app.get("/api/runs")
+async def list_runs(request: Request, limit: int = 20, status: Optional[str] = None):
+    """Recent report runs and their last completed stage; failed ones can be resumed."""
+    await require_admin(request)
+    limit = max(1, min(limit, 100))
+    return JSONResponse({"runs": await adb.list_runs(limit=limit, status=status)})
+
+
+# ── LLM Response Cache ────────────────────────────────────────────────────────
+
+@app.get("/api/llm-cache")
+async def llm_cache_stats(request: Request):
+    """Response-cache size and hit metrics (hit_rate is for this worker process)."""
+    await require_admin(request)
+    cache = await adb.llm_cache
+    stats = await adb.run(cache.stats)
+    stats["enabled"] = LLM_CACHE_ENABLED
+    return JSONResponse(stats)
+
+
+@app.delete("/api/llm-cache")
+async def llm_cache_clear(request: Request):
+    """Drop every cached Claude response, e.g. after changing prompts by hand."""
+    await require_admin(request)
+    cache = await adb.llm_cache
+    await adb.run(cache.clear)
+    return JSONResponse({"cleared": True})
+
+
 # ── Download Report ───────────────────────────────────────────────────────────
 
 @app.get("/api/reports/download/{filename}")
 async def download_report(filename: str, request: Request):
-    require_admin(request)
+    await require_admin(request)
     """Serve a saved PDF report as a browser download."""
     # Sanitise — no path traversal
     if "/" in filename or ".." in filename:
@@ -609,12 +896,11 @@ async def download_report(filename: str, request: Request):
 
 @app.get("/api/health")
 async def health():
-    generator = EmergencyReportGenerator()
-    counts = db.get_counts()
+    counts = await adb.get_counts()
     return {
         "status": "ok",
-        "credentials_valid": generator.is_valid(),
-        "missing": generator.validation_errors,
+        "credentials_valid": credentials_check.is_valid(),
+        "missing": credentials_check.validation_errors,
         "pending_submissions": counts["pending"],
         "total_submissions": counts["total"],
     }
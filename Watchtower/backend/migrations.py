@@ -0,0 +1,379 @@
+"""
+AlohaAI Emergency Watchtower - Schema
+Ordered schema migrations, the full-text index DDL they share with the
+archive database, and the submission column lists built from them.
+"""
+
+from typing import List, Tuple
+
+
+# ── Full-text search ──────────────────────────────────────────────────────────
+
+def fts_statements(schema: str) -> List[str]:
+    """
+    DDL for an external-content FTS5 index over a `submissions` table in
+    `schema` (main or the attached archive), kept in sync by triggers.
+    Diacritics are folded (Kaʻū → ka u) and the ʻokina splits tokens the same
+    way an ASCII apostrophe does, so either spelling matches.
+    """
+    return [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {schema}.submissions_fts USING fts5(
+            description, location, reporter_name,
+            content = 'submissions',
+            content_rowid = 'id',
+            tokenize = "unicode61 remove_diacritics 2 separators 'ʻ’‘'"
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {schema}.trg_submissions_fts_insert
+        AFTER INSERT ON submissions
+        BEGIN
+            INSERT INTO submissions_fts (rowid, description, location, reporter_name)
+            VALUES (NEW.id, NEW.description, NEW.location, NEW.reporter_name);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {schema}.trg_submissions_fts_delete
+        AFTER DELETE ON submissions
+        BEGIN
+            INSERT INTO submissions_fts (submissions_fts, rowid, description, location, reporter_name)
+            VALUES ('delete', OLD.id, OLD.description, OLD.location, OLD.reporter_name);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {schema}.trg_submissions_fts_update
+        AFTER UPDATE OF description, location, reporter_name ON submissions
+        BEGIN
+            INSERT INTO submissions_fts (submissions_fts, rowid, description, location, reporter_name)
+            VALUES ('delete', OLD.id, OLD.description, OLD.location, OLD.reporter_name);
+            INSERT INTO submissions_fts (rowid, description, location, reporter_name)
+            VALUES (NEW.id, NEW.description, NEW.location, NEW.reporter_name);
+        END
+        """,
+        # Index any rows that predate the FTS table
+        f"INSERT INTO {schema}.submissions_fts (submissions_fts) VALUES ('rebuild')",
+    ]
+
+
+# ── Schema Migrations ─────────────────────────────────────────────────────────
+# Ordered (version, name, statements). Applied once each at startup and recorded
+# in schema_migrations. Never edit a shipped migration — append a new one.
+
+# Columns later migrations add to submissions, as (name, type). archive.submissions
+# gets them too (see _init_archive), so archived rows keep the live row shape.
+DISTRICT_CHECK_COLUMNS = [("district_match", "TEXT"), ("reported_district", "TEXT")]
+SPAM_COLUMNS = [("spam_score", "REAL"), ("spam_reason", "TEXT")]
+
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "base tables", [
+        """
+        CREATE TABLE IF NOT EXISTS submissions (
+            id            INTEGER PRIMARY KEY AUTOINCREMENT,
+            ref_code      TEXT    NOT NULL,
+            incident_type TEXT    NOT NULL,
+            district      TEXT    NOT NULL,
+            location      TEXT,
+            description   TEXT    NOT NULL,
+            severity      TEXT    NOT NULL DEFAULT 'low',
+            evacuation    TEXT,
+            reporter_name TEXT,
+            timestamp     TEXT    NOT NULL,
+            processed     INTEGER NOT NULL DEFAULT 0,
+            mod_status    TEXT    NOT NULL DEFAULT 'pending'
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS event_context (
+            id         INTEGER PRIMARY KEY AUTOINCREMENT,
+            summary    TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS admins (
+            id                   INTEGER PRIMARY KEY AUTOINCREMENT,
+            username             TEXT    NOT NULL UNIQUE,
+            email                TEXT    NOT NULL UNIQUE,
+            password_hash        TEXT    NOT NULL,
+            must_change_password INTEGER NOT NULL DEFAULT 1,
+            created_at           TEXT    NOT NULL,
+            last_login           TEXT
+        )
+        """,
+    ]),
+    (2, "submission indexes", [
+        # get_pending() / pending count: partial index stays as small as the backlog
+        "CREATE INDEX IF NOT EXISTS idx_submissions_pending "
+        "ON submissions (timestamp, id) WHERE processed = 0",
+        # get_all() newest-first
+        "CREATE INDEX IF NOT EXISTS idx_submissions_timestamp "
+        "ON submissions (timestamp, id)",
+        # admin district / severity filters
+        "CREATE INDEX IF NOT EXISTS idx_submissions_district_severity "
+        "ON submissions (district, severity, timestamp, id)",
+        # reference-code lookup from citizen follow-ups
+        "CREATE INDEX IF NOT EXISTS idx_submissions_ref_code "
+        "ON submissions (ref_code)",
+    ]),
+    (3, "keyset pagination indexes", [
+        # Each admin filter gets an index ending in (timestamp, id) so a filtered
+        # page is a single index range scan in cursor order.
+        "CREATE INDEX IF NOT EXISTS idx_submissions_district_ts "
+        "ON submissions (district, timestamp, id)",
+        "CREATE INDEX IF NOT EXISTS idx_submissions_severity_ts "
+        "ON submissions (severity, timestamp, id)",
+        "CREATE INDEX IF NOT EXISTS idx_submissions_processed_ts "
+        "ON submissions (processed, timestamp, id)",
+        "CREATE INDEX IF NOT EXISTS idx_submissions_mod_status_ts "
+        "ON submissions (mod_status, timestamp, id)",
+    ]),
+    (4, "trigger-maintained submission counters", [
+        # One row per (district, severity, processed, mod_status) bucket — a few
+        # dozen rows at most, so summing it is constant-time regardless of table size.
+        """
+        CREATE TABLE IF NOT EXISTS submission_counts (
+            district   TEXT    NOT NULL,
+            severity   TEXT    NOT NULL,
+            processed  INTEGER NOT NULL,
+            mod_status TEXT    NOT NULL,
+            n          INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (district, severity, processed, mod_status)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_submission_counts_insert
+        AFTER INSERT ON submissions
+        BEGIN
+            INSERT INTO submission_counts (district, severity, processed, mod_status, n)
+            VALUES (NEW.district, NEW.severity, NEW.processed, NEW.mod_status, 1)
+            ON CONFLICT (district, severity, processed, mod_status) DO UPDATE SET n = n + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_submission_counts_delete
+        AFTER DELETE ON submissions
+        BEGIN
+            UPDATE submission_counts SET n = n - 1
+            WHERE district = OLD.district AND severity = OLD.severity
+              AND processed = OLD.processed AND mod_status = OLD.mod_status;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_submission_counts_update
+        AFTER UPDATE OF district, severity, processed, mod_status ON submissions
+        WHEN OLD.district IS NOT NEW.district OR OLD.severity IS NOT NEW.severity
+          OR OLD.processed IS NOT NEW.processed OR OLD.mod_status IS NOT NEW.mod_status
+        BEGIN
+            UPDATE submission_counts SET n = n - 1
+            WHERE district = OLD.district AND severity = OLD.severity
+              AND processed = OLD.processed AND mod_status = OLD.mod_status;
+            INSERT INTO submission_counts (district, severity, processed, mod_status, n)
+            VALUES (NEW.district, NEW.severity, NEW.processed, NEW.mod_status, 1)
+            ON CONFLICT (district, severity, processed, mod_status) DO UPDATE SET n = n + 1;
+        END
+        """,
+        # Backfill from existing rows (runs under the migration's write lock)
+        "DELETE FROM submission_counts",
+        """
+        INSERT INTO submission_counts (district, severity, processed, mod_status, n)
+        SELECT district, severity, processed, mod_status, COUNT(*)
+        FROM submissions
+        GROUP BY district, severity, processed, mod_status
+        """,
+    ]),
+    (5, "archived submission counters", [
+        # Maintained by archive_processed() in the same transaction that removes
+        # rows from the hot table, so totals stay stable across archival.
+        """
+        CREATE TABLE IF NOT EXISTS archive_counts (
+            district   TEXT    NOT NULL,
+            severity   TEXT    NOT NULL,
+            mod_status TEXT    NOT NULL,
+            n          INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (district, severity, mod_status)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (6, "full-text search", fts_statements("main")),
+    (7, "report batch leases", [
+        "ALTER TABLE submissions ADD COLUMN batch_id TEXT",
+        "ALTER TABLE submissions ADD COLUMN claimed_at TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_submissions_batch "
+        "ON submissions (batch_id) WHERE batch_id IS NOT NULL",
+    ]),
+    (8, "stored reports", [
+        """
+        CREATE TABLE IF NOT EXISTS reports (
+            id               INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at       TEXT    NOT NULL,
+            batch_id         TEXT,
+            submission_ids   TEXT    NOT NULL,             -- JSON array
+            submission_count INTEGER NOT NULL,
+            codec            TEXT    NOT NULL,             -- compression of content
+            content          BLOB    NOT NULL,             -- compressed markdown
+            content_length   INTEGER NOT NULL,             -- uncompressed bytes
+            timings          TEXT,                         -- JSON {stage: seconds}
+            input_tokens     INTEGER NOT NULL DEFAULT 0,
+            output_tokens    INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_reports_created_at ON reports (created_at, id)",
+    ]),
+    (9, "bulk load guard", [
+        # While a row exists here the counter and FTS triggers stand down and
+        # bulk_import() rebuilds both in one pass when it finishes, which is
+        # several times faster than maintaining them row by row.
+        """
+        CREATE TABLE IF NOT EXISTS bulk_load (
+            id         INTEGER PRIMARY KEY CHECK (id = 1),
+            started_at TEXT NOT NULL
+        )
+        """,
+        "DROP TRIGGER IF EXISTS trg_submissions_fts_insert",
+        """
+        CREATE TRIGGER trg_submissions_fts_insert
+        AFTER INSERT ON submissions
+        WHEN NOT EXISTS (SELECT 1 FROM bulk_load)
+        BEGIN
+            INSERT INTO submissions_fts (rowid, description, location, reporter_name)
+            VALUES (NEW.id, NEW.description, NEW.location, NEW.reporter_name);
+        END
+        """,
+        "DROP TRIGGER IF EXISTS trg_submissions_fts_delete",
+        """
+        CREATE TRIGGER trg_submissions_fts_delete
+        AFTER DELETE ON submissions
+        WHEN NOT EXISTS (SELECT 1 FROM bulk_load)
+        BEGIN
+            INSERT INTO submissions_fts (submissions_fts, rowid, description, location, reporter_name)
+            VALUES ('delete', OLD.id, OLD.description, OLD.location, OLD.reporter_name);
+        END
+        """,
+        "DROP TRIGGER IF EXISTS trg_submissions_fts_update",
+        """
+        CREATE TRIGGER trg_submissions_fts_update
+        AFTER UPDATE OF description, location, reporter_name ON submissions
+        WHEN NOT EXISTS (SELECT 1 FROM bulk_load)
+        BEGIN
+            INSERT INTO submissions_fts (submissions_fts, rowid, description, location, reporter_name)
+            VALUES ('delete', OLD.id, OLD.description, OLD.location, OLD.reporter_name);
+            INSERT INTO submissions_fts (rowid, description, location, reporter_name)
+            VALUES (NEW.id, NEW.description, NEW.location, NEW.reporter_name);
+        END
+        """,
+        "DROP TRIGGER IF EXISTS trg_submission_counts_insert",
+        """
+        CREATE TRIGGER trg_submission_counts_insert
+        AFTER INSERT ON submissions
+        WHEN NOT EXISTS (SELECT 1 FROM bulk_load)
+        BEGIN
+            INSERT INTO submission_counts (district, severity, processed, mod_status, n)
+            VALUES (NEW.district, NEW.severity, NEW.processed, NEW.mod_status, 1)
+            ON CONFLICT (district, severity, processed, mod_status) DO UPDATE SET n = n + 1;
+        END
+        """,
+        "DROP TRIGGER IF EXISTS trg_submission_counts_delete",
+        """
+        CREATE TRIGGER trg_submission_counts_delete
+        AFTER DELETE ON submissions
+        WHEN NOT EXISTS (SELECT 1 FROM bulk_load)
+        BEGIN
+            UPDATE submission_counts SET n = n - 1
+            WHERE district = OLD.district AND severity = OLD.severity
+              AND processed = OLD.processed AND mod_status = OLD.mod_status;
+        END
+        """,
+        "DROP TRIGGER IF EXISTS trg_submission_counts_update",
+        """
+        CREATE TRIGGER trg_submission_counts_update
+        AFTER UPDATE OF district, severity, processed, mod_status ON submissions
+        WHEN NOT EXISTS (SELECT 1 FROM bulk_load)
+         AND (OLD.district IS NOT NEW.district OR OLD.severity IS NOT NEW.severity
+          OR OLD.processed IS NOT NEW.processed OR OLD.mod_status IS NOT NEW.mod_status)
+        BEGIN
+            UPDATE submission_counts SET n = n - 1
+            WHERE district = OLD.district AND severity = OLD.severity
+              AND processed = OLD.processed AND mod_status = OLD.mod_status;
+            INSERT INTO submission_counts (district, severity, processed, mod_status, n)
+            VALUES (NEW.district, NEW.severity, NEW.processed, NEW.mod_status, 1)
+            ON CONFLICT (district, severity, processed, mod_status) DO UPDATE SET n = n + 1;
+        END
+        """,
+    ]),
+    (10, "report prompt-cache usage", [
+        "ALTER TABLE reports ADD COLUMN cache_read_tokens INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE reports ADD COLUMN cache_write_tokens INTEGER NOT NULL DEFAULT 0",
+    ]),
+    (11, "resumable report runs", [
+        # One row per generation run (id = the run's batch_id) recording the
+        # last completed stage; see RUN_STAGES.
+        """
+        CREATE TABLE IF NOT EXISTS report_runs (
+            id              TEXT    PRIMARY KEY,
+            created_at      TEXT    NOT NULL,
+            updated_at      TEXT    NOT NULL,
+            status          TEXT    NOT NULL DEFAULT 'running',  -- running | failed | complete
+            stage           TEXT    NOT NULL DEFAULT 'claimed',
+            error           TEXT,
+            submission_ids  TEXT    NOT NULL,                    -- JSON array
+            combined_text   TEXT,                                -- stage-1 output
+            report          TEXT,
+            report_id       INTEGER,
+            context_summary TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_report_runs_status ON report_runs (status, updated_at)",
+        # Stage-1 output per chunk, keyed by a hash of the chunk's prompt so a
+        # resumed run reuses it only for identical input
+        """
+        CREATE TABLE IF NOT EXISTS report_run_chunks (
+            run_id      TEXT    NOT NULL REFERENCES report_runs (id) ON DELETE CASCADE,
+            prompt_hash TEXT    NOT NULL,
+            output      TEXT    NOT NULL,
+            PRIMARY KEY (run_id, prompt_hash)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (12, "district check", [
+        # Set at insert by GAZETTEER_INDEX.resolve(): one of DISTRICT_MATCHES,
+        # and the district the citizen picked when it was corrected
+        *(f"ALTER TABLE submissions ADD COLUMN {name} {kind}" for name, kind in DISTRICT_CHECK_COLUMNS),
+    ]),
+    (13, "spam filter", [
+        # Set by SpamFilter.verdicts() at insert and again before generation
+        *(f"ALTER TABLE submissions ADD COLUMN {name} {kind}" for name, kind in SPAM_COLUMNS),
+        # Coordinator verdicts, kept with their text so archived or deleted
+        # rows still train the classifier
+        """
+        CREATE TABLE IF NOT EXISTS spam_labels (
+            submission_id INTEGER PRIMARY KEY,
+            incident_type TEXT    NOT NULL,
+            text          TEXT    NOT NULL,
+            label         INTEGER NOT NULL,             -- 1 = spam, 0 = genuine
+            labelled_at   TEXT    NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS spam_model (
+            id         INTEGER PRIMARY KEY CHECK (id = 1),
+            trained_at TEXT    NOT NULL,
+            examples   INTEGER NOT NULL,
+            model      TEXT    NOT NULL                 -- SpamClassifier.to_json()
+        )
+        """,
+    ]),
+]
+
+# Checkpoints of a report run, in order. A run's `stage` is the last one it
+# completed; resuming skips everything up to and including it.
+RUN_STAGES = ("claimed", "mapped", "reported", "stored", "complete")
+
+# Added to archive.submissions after its base definition, in migration order
+ARCHIVE_ADDED_COLUMNS = DISTRICT_CHECK_COLUMNS + SPAM_COLUMNS
+
+SUBMISSION_COLUMNS = [
+    "id", "ref_code", "incident_type", "district", "location", "description",
+    "severity", "evacuation", "reporter_name", "timestamp", "processed", "mod_status",
+    *(name for name, _ in ARCHIVE_ADDED_COLUMNS),
+]
@@ -0,0 +1,1172 @@
+"""
+AlohaAI Emergency Watchtower - Report Generation
+The Claude map / combine pipeline that turns pending submissions into an
+emergency report, in blocking and async (SSE) forms.
+"""
+
+import os
+import hashlib
+import itertools
+import time
+import asyncio
+import logging
+import functools
+import threading
+import anthropic
+from contextlib import AsyncExitStack
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Optional, List, Dict, Set, Callable, Tuple, Iterable, Iterator, AsyncIterator
+from dotenv import load_dotenv
+
+from backend.db import AsyncDatabaseManager, DatabaseManager, LLM_CACHE_ENABLED, ResponseCache
+from backend.local_filters import DEDUP_THRESHOLD, GAZETTEER_PROMPT, SPAM_STATUSES, DuplicateClusterer
+from backend.migrations import RUN_STAGES
+from backend.scheduler import SCHEDULE_FIELDS, Admission, claude_scheduler
+
+load_dotenv()
+
+log = logging.getLogger("watchtower")
+
+# Stage-1 (map) Claude calls run concurrently, at most MAP_CONCURRENCY at once.
+# Keep it within the account's rate limit; 1 restores one-call-at-a-time.
+MAP_CONCURRENCY = max(1, int(os.getenv("MAP_CONCURRENCY", "4")))
+
+# The event-context summary of a report is written in the background after the
+# report is returned. The next run waits up to CONTEXT_WAIT_SECONDS for one
+# still in flight before its final stage, then goes on with the last saved one.
+CONTEXT_WAIT_SECONDS = float(os.getenv("CONTEXT_WAIT_SECONDS", "120"))
+
+
+# ── Report Generator ──────────────────────────────────────────────────────────
+
+CLAUDE_MODEL = "claude-sonnet-4-5-20250929"
+
+# Map-stage chunks are packed to MAP_CHUNK_TOKENS of submission text (estimated
+# at CHARS_PER_TOKEN). Each call's output restates its input grouped by
+# district, so keep this comfortably under the 4096-token map output limit.
+MAP_CHUNK_TOKENS = int(os.getenv("MAP_CHUNK_TOKENS", "4000"))
+CHARS_PER_TOKEN  = 3.5
+
+# When every submission in a batch had its district confirmed (or corrected)
+# by the gazetteer at insert, stage 1 is built locally instead of by Claude.
+# MAP_SKIP_VERIFIED=off always runs the Claude map stage.
+MAP_SKIP_VERIFIED = os.getenv("MAP_SKIP_VERIFIED", "on").lower() not in ("0", "off", "false", "no")
+
+# Token counters kept per run; the cache fields are prompt-cache writes and hits
+USAGE_FIELDS = (
+    "input_tokens", "output_tokens",
+    "cache_creation_input_tokens", "cache_read_input_tokens",
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate for budgeting prompts; no tokenizer round trip."""
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def district_header(district: str) -> str:
+    return f"\n=== {district} ===\n"
+
+
+@functools.lru_cache(maxsize=None)
+def context_executor() -> ThreadPoolExecutor:
+    """One thread that writes context summaries after generate_report() returns, in order."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="context-summary")
+
+
+class EmergencyReportGenerator:
+    """Generates emergency reports from citizen submissions using Claude AI."""
+
+    # The last context summary submitted to context_executor() in this process
+    context_future: Optional[Future] = None
+
+    def __init__(
+        self,
+        db: Optional[DatabaseManager] = None,
+        map_concurrency: int = MAP_CONCURRENCY,
+        use_cache: bool = LLM_CACHE_ENABLED,
+        dedup_threshold: float = DEDUP_THRESHOLD,
+    ):
+        self.claude_api_key = os.getenv("ANTHROPIC_API_KEY")
+        self.claude_client = (
+            self._make_client(self.claude_api_key)
+            if self.claude_api_key
+            else None
+        )
+        self.db = db or DatabaseManager()
+        self.map_concurrency = max(1, map_concurrency)
+        self.cache: Optional[ResponseCache] = self.db.llm_cache if use_cache else None
+        self.clusterer = DuplicateClusterer(dedup_threshold)
+        self.scheduler = claude_scheduler(self.db.db_path.with_name(f"{self.db.db_path.stem}.claude-limits"))
+
+        # Token usage and stage timings for the current generate_report() run.
+        # call_claude() runs on several threads during the map stage.
+        self.usage: Dict[str, int] = dict.fromkeys(USAGE_FIELDS, 0)
+        self.calls = 0          # Claude calls made or answered from self.cache
+        self.cached_calls = 0   # of which answered from self.cache
+        self.scheduling: Dict[str, float] = dict.fromkeys(SCHEDULE_FIELDS, 0)
+        self._usage_lock = threading.Lock()
+        self.timings: Dict[str, float] = {}
+        self.last_report_id: Optional[int] = None
+
+        self.validation_errors: List[str] = []
+        if not self.claude_api_key:
+            self.validation_errors.append("ANTHROPIC_API_KEY not found in .env")
+
+    def is_valid(self) -> bool:
+        return len(self.validation_errors) == 0
+
+    def _make_client(self, api_key: str):
+        return anthropic.Anthropic(api_key=api_key, max_retries=0)  # retries go through self.scheduler
+
+    # ── Claude API ────────────────────────────────────────────────────────────
+
+    def call_claude(self, prompt: str, max_tokens: int = 4096, system: Optional[str] = None) -> Optional[str]:
+        """Make a single call to Claude API, or answer it from the response cache."""
+        key = self.cache_key(prompt, max_tokens, system)
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.record_cached_call()
+                return cached
+        params = self.request_params(prompt, max_tokens, system)
+        try:
+            admission, message = self.scheduled(
+                estimate_tokens((system or "") + prompt), lambda: self.claude_client.messages.create(**params),
+            )
+            self.scheduler.release(admission, message=message)
+            self.record_usage(getattr(message, "usage", None))
+            text = message.content[0].text
+        except Exception as e:
+            raise Exception(f"Claude API error: {str(e)}")
+        if key and self.cacheable(message, text):
+            self.cache.put(key, CLAUDE_MODEL, text, self.message_tokens(message))
+        return text
+
+    def scheduled(self, tokens: int, request: Callable):
+        """
+        Send `request()` once self.scheduler admits it, retrying failures the
+        scheduler deems transient after its backoff. Returns the admission
+        (release it once the response is complete) and the result.
+        """
+        for attempt in itertools.count():
+            admission = self.scheduler.acquire(tokens)
+            self.record_admission(admission)
+            try:
+                return admission, request()
+            except Exception as e:
+                self.scheduler.release(admission, error=e)
+                delay = self.scheduler.retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                self.record_retry()
+                time.sleep(delay)
+            except BaseException:
+                self.scheduler.release(admission)
+                raise
+
+    # ── Response cache ────────────────────────────────────────────────────────
+
+    def cache_key(self, prompt: str, max_tokens: int, system: Optional[str] = None) -> Optional[str]:
+        """Response-cache key for a request, or None when the cache is bypassed."""
+        return ResponseCache.key(CLAUDE_MODEL, prompt, max_tokens, system) if self.cache else None
+
+    @staticmethod
+    def cacheable(message, text: Optional[str]) -> bool:
+        """Only complete answers are worth replaying; a truncated one is retried for real."""
+        return bool(text) and getattr(message, "stop_reason", None) != "max_tokens"
+
+    @staticmethod
+    def message_tokens(message) -> int:
+        usage = getattr(message, "usage", None)
+        return sum(getattr(usage, field, None) or 0 for field in USAGE_FIELDS) if usage else 0
+
+    def record_cached_call(self):
+        with self._usage_lock:
+            self.calls += 1
+            self.cached_calls += 1
+
+    def response_cache_summary(self) -> str:
+        """One-line response-cache accounting for the progress log."""
+        if not self.cache:
+            return "Response cache bypassed for this run"
+        return f"Response cache: {self.cached_calls} of {self.calls} Claude call(s) answered from cache"
+
+    # ── Scheduling ────────────────────────────────────────────────────────────
+
+    def record_admission(self, admission: Admission):
+        with self._usage_lock:
+            if admission.waited:
+                self.scheduling["peak_queue"] = max(self.scheduling["peak_queue"], admission.depth)
+                self.scheduling["queued"] += 1
+                self.scheduling["queue_wait"] += admission.waited
+                self.scheduling["max_wait"] = max(self.scheduling["max_wait"], admission.waited)
+
+    def record_retry(self):
+        with self._usage_lock:
+            self.scheduling["retries"] += 1
+
+    def queue_note(self) -> str:
+        """Suffix for a progress message while calls are queued by the scheduler."""
+        queued = self.scheduler.queued
+        return f" ({queued} Claude call(s) queued for rate limits)" if queued else ""
+
+    def scheduler_summary(self) -> str:
+        """One-line scheduler accounting (queueing, retries, concurrency) for the progress log."""
+        s = self.scheduling
+        queued = (
+            f"{s['queued']} queued for rate limits (waited {s['queue_wait']:.1f}s in all, "
+            f"{s['max_wait']:.1f}s at most; queue depth up to {s['peak_queue']})"
+            if s["queued"] else "none queued"
+        )
+        return (
+            f"Scheduler: {queued}, {s['retries']} retried; "
+            f"concurrency limit {int(self.scheduler.limit)} of {self.scheduler.max_concurrency}"
+        )
+
+    def spam_summary(self, flagged: int) -> str:
+        """One-line spam-filter accounting for the progress log."""
+        return f"Left out {flagged:,} submission(s) flagged as spam or tests (see Submissions → Flagged)"
+
+    def dedup_summary(self, submitted: int, records: int) -> str:
+        """One-line near-duplicate accounting for the progress log."""
+        return (
+            f"Collapsed {submitted:,} submissions into {records:,} records "
+            f"({submitted - records:,} near-duplicates, threshold {self.clusterer.threshold:g})"
+        )
+
+    def request_params(self, prompt: str, max_tokens: int, system: Optional[str] = None) -> Dict:
+        """
+        messages.create() arguments. A `system` prompt is sent as one block
+        with a cache breakpoint, so repeated calls within the cache lifetime
+        (chunks of a run, and the next report cycle) read it from the prompt
+        cache instead of reprocessing it.
+        """
+        params = {
+            "model": CLAUDE_MODEL,
+            "max_tokens": max_tokens,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+        if system:
+            params["system"] = [
+                {"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}
+            ]
+        return params
+
+    def record_usage(self, usage) -> None:
+        """Add one response's token usage (including prompt-cache reads/writes) to self.usage."""
+        with self._usage_lock:
+            self.calls += 1
+            if not usage:
+                return
+            for field in USAGE_FIELDS:
+                self.usage[field] += getattr(usage, field, None) or 0
+
+    def cache_summary(self) -> str:
+        """One-line prompt-cache accounting for the progress log."""
+        read = self.usage["cache_read_input_tokens"]
+        written = self.usage["cache_creation_input_tokens"]
+        uncached = self.usage["input_tokens"]
+        total = read + written + uncached
+        hit = f"{read / total:.0%}" if total else "n/a"
+        return (
+            f"Prompt cache: {read:,} input tokens read from cache, {written:,} written, "
+            f"{uncached:,} uncached ({hit} hit)"
+        )
+
+    # ── Submission Formatting ─────────────────────────────────────────────────
+
+    def format_submission(self, sub: Dict, max_description: Optional[int] = None) -> str:
+        """
+        One submission as a prompt block (REF … Submitted, then a blank line).
+        A collapsed cluster (DuplicateClusterer) also lists its report count
+        and member refs. `max_description` trims an oversized description so
+        the record still fits in a single chunk.
+        """
+        description = sub.get("description", "—")
+        if max_description is not None and len(description) > max_description:
+            description = description[:max_description].rstrip() + " …[truncated]"
+
+        lines = [
+            f"  REF: {sub.get('ref_code', '—')}",
+            f"  Type: {sub.get('incident_type', '—')}",
+            f"  Severity: {sub.get('severity', '—')}",
+            f"  Location: {sub.get('location') or 'Not specified'}",
+            f"  Description: {description}",
+        ]
+        evac = sub.get("evacuation")
+        if evac:
+            lines.append(f"  Evacuation: {evac}")
+        count = sub.get("report_count", 1)
+        if count > 1:
+            refs = sub["member_refs"]
+            more = f", … +{len(refs) - 10} more" if len(refs) > 10 else ""
+            lines.append(f"  Reports: {count} near-identical ({', '.join(refs[:10])}{more})")
+            lines.append(f"  Submitted: {sub.get('timestamp', '—')} to {sub.get('last_timestamp', '—')}")
+        else:
+            lines.append(f"  Submitted: {sub.get('timestamp', '—')}")
+        lines.append("")
+        return "\n".join(lines) + "\n"
+
+    def iter_districts(self, submissions: List[Dict]) -> Iterator[Tuple[str, List[Dict]]]:
+        """Yield (district, submissions) in district order."""
+        by_district: Dict[str, List[Dict]] = {}
+        for sub in submissions:
+            d = sub.get("district", "Unknown")
+            by_district.setdefault(d, []).append(sub)
+        yield from sorted(by_district.items())
+
+    def format_submissions(self, submissions: List[Dict]) -> str:
+        """
+        Convert a list of submission dicts into a structured text block
+        for the Claude prompt. Groups by district for readability.
+        """
+        return "".join(
+            district_header(district) + "".join(self.format_submission(sub) for sub in subs)
+            for district, subs in self.iter_districts(submissions)
+        )
+
+    # ── Chunking ──────────────────────────────────────────────────────────────
+
+    def chunk_submissions(
+        self,
+        submissions: List[Dict],
+        max_tokens: int = MAP_CHUNK_TOKENS,
+    ) -> Iterator[str]:
+        """
+        Lazily pack formatted submissions into as few chunks of at most
+        `max_tokens` (estimated) as possible for the map stage.
+
+        A submission block is never split across chunks; a single record too
+        large for the budget has its description trimmed. Districts are placed
+        largest first into the first chunk with room for them whole
+        (first-fit decreasing); one that fits nowhere whole tops up the
+        emptiest chunk and carries the rest into a new one, so it spans at
+        most two. A district bigger than one chunk is cut into full chunks,
+        yielded straight away so map calls can start before packing finishes.
+        Each chunk repeats the header of every district it contains.
+        """
+        open_chunks: List[Tuple[int, List[str]]] = []   # (tokens used, parts)
+
+        districts = []
+        for district, subs in self.iter_districts(submissions):
+            header = district_header(district)
+            header_tokens = estimate_tokens(header)
+            room = max_tokens - header_tokens
+            blocks = []
+            for sub in subs:
+                block = self.format_submission(sub)
+                cost = estimate_tokens(block)
+                if cost > room:
+                    overflow = int((cost - room) * CHARS_PER_TOKEN) + 32
+                    block = self.format_submission(
+                        sub, max_description=max(0, len(sub.get("description") or "") - overflow)
+                    )
+                    cost = estimate_tokens(block)
+                blocks.append((block, cost))
+            total = header_tokens + sum(cost for _, cost in blocks)
+            districts.append((total, header, header_tokens, blocks))
+        districts.sort(key=lambda d: d[0], reverse=True)
+
+        for total, header, header_tokens, blocks in districts:
+            # Full chunks of an oversized district go out immediately
+            tail: List[Tuple[str, int]] = []
+            used = header_tokens
+            for block, cost in blocks:
+                if used + cost > max_tokens:
+                    yield header + "".join(b for b, _ in tail)
+                    tail, used = [], header_tokens
+                tail.append((block, cost))
+                used += cost
+
+            for i, (chunk_used, chunk_parts) in enumerate(open_chunks):
+                if chunk_used + used <= max_tokens:
+                    open_chunks[i] = (chunk_used + used, chunk_parts + [header] + [b for b, _ in tail])
+                    break
+            else:
+                # No room for it whole: top up the emptiest open chunk with
+                # the district's first records and start a new chunk with
+                # the rest, so a district spans at most two chunks.
+                if open_chunks:
+                    i = min(range(len(open_chunks)), key=lambda n: open_chunks[n][0])
+                    chunk_used, chunk_parts = open_chunks[i]
+                    moved = 0
+                    if chunk_used + header_tokens + tail[0][1] <= max_tokens:
+                        chunk_used += header_tokens
+                        chunk_parts = chunk_parts + [header]
+                        while moved < len(tail) - 1 and chunk_used + tail[moved][1] <= max_tokens:
+                            chunk_parts.append(tail[moved][0])
+                            chunk_used += tail[moved][1]
+                            used -= tail[moved][1]
+                            moved += 1
+                    if moved:
+                        open_chunks[i] = (chunk_used, chunk_parts)
+                        tail = tail[moved:]
+                open_chunks.append((used, [header] + [b for b, _ in tail]))
+
+        for _, parts in open_chunks:
+            yield "".join(parts)
+
+    # ── Local Stage 1 ─────────────────────────────────────────────────────────
+
+    def districts_verified(self, submissions: List[Dict]) -> bool:
+        """True if the gazetteer confirmed or corrected every submission's district."""
+        return MAP_SKIP_VERIFIED and all(
+            sub.get("district_match") in ("confirmed", "corrected") for sub in submissions
+        )
+
+    def organise_locally(self, submissions: List[Dict]) -> str:
+        """
+        Stage-1 output without a Claude call, for batches that are already
+        bucketed by district: the submissions grouped by district, then an
+        URGENT ITEMS section listing high-severity and evacuation reports.
+        """
+        urgent = [
+            f"- {sub.get('ref_code', '—')} ({sub.get('district', 'Unknown')}): "
+            f"{sub.get('incident_type', '—')}, {sub.get('location') or 'location not specified'}"
+            + (f", evacuation: {sub['evacuation']}" if sub.get("evacuation") else "")
+            + (f" ({sub['report_count']} reports)" if sub.get("report_count", 1) > 1 else "")
+            for sub in submissions
+            if sub.get("severity") == "high" or sub.get("evacuation")
+        ]
+        return (
+            self.format_submissions(submissions)
+            + "\n=== URGENT ITEMS ===\n"
+            + ("\n".join(urgent) if urgent else "None (no high-severity or evacuation reports).")
+            + "\n"
+        )
+
+    # ── Map Stage ─────────────────────────────────────────────────────────────
+
+    def map_chunks(
+        self,
+        prompts: Iterable[str],
+        progress_callback: Optional[Callable[[str], None]] = None,
+        batch_id: Optional[str] = None,
+        system: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Run the stage-1 prompts with up to `self.map_concurrency` Claude calls
+        in flight. `prompts` may be a lazy iterator: calls start while later
+        chunks are still being built. Results come back in prompt order
+        regardless of which call finishes first; empty results are dropped.
+        The first failure cancels the calls that have not started yet and is
+        re-raised.
+        """
+        if batch_id:
+            self.db.renew_lease(batch_id)
+
+        with ThreadPoolExecutor(max_workers=self.map_concurrency, thread_name_prefix="map") as pool:
+            futures = {
+                pool.submit(self.call_claude, prompt, system=system): i
+                for i, prompt in enumerate(prompts)
+            }
+            total = len(futures)
+            results: List[Optional[str]] = [None] * total
+            if progress_callback:
+                progress_callback(
+                    f"Processing {total} chunk(s) of submissions, "
+                    f"{min(total, self.map_concurrency)} at a time…"
+                )
+            done = 0
+            try:
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+                    done += 1
+                    if batch_id:
+                        self.db.renew_lease(batch_id)
+                    if progress_callback and total > 1:
+                        progress_callback(f"Analysed chunk {done} of {total}…{self.queue_note()}")
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        return [r for r in results if r]
+
+    # ── Prompts ───────────────────────────────────────────────────────────────
+    # Each stage's fixed instructions go in the system prompt, marked for
+    # prompt caching, and only the submissions go in the user turn. Keep the
+    # system texts byte-for-byte stable: any change starts a new cache entry.
+
+    MAP_SYSTEM = f"""
+<task>Organise citizen emergency submissions by geographic district</task>
+
+<context>
+<topic>Natural Disaster / Emergency Events</topic>
+<source>Structured citizen reports submitted via AlohaAI Watchtower web form</source>
+</context>
+
+<districts>
+{GAZETTEER_PROMPT}
+</districts>
+
+<instructions>
+1. List each submission in the user's <input_data> under its correct district.
+2. Flag any item as URGENT if it describes:
+   - Direct threat to human life or safety
+   - Blocked evacuation routes
+   - Loss of essential services (power, water, roads) at scale
+   - Active and ongoing emergency requiring immediate response
+3. Exclude anything that appears to be a test submission or spam.
+</instructions>
+
+<output_format>
+Plain text, grouped by district. Append an URGENT ITEMS section at the end listing the most critical items across all districts.
+</output_format>
+"""
+
+    COMBINE_SYSTEM = (
+        "You are summarising citizen-submitted emergency reports for administrators "
+        "and first responders during a natural disaster on Hawaii Island.\n\n"
+        "Your goal is to produce a clear, scannable real-time summary that lets readers "
+        "instantly see what is happening by district and identify the highest-priority "
+        "items that need immediate attention.\n\n"
+        "Write for a mixed audience — civil defense coordinators, emergency responders, "
+        "and community administrators. Assume they are busy and need to act fast.\n\n"
+        "The user will give you what was already reported in previous cycles and the "
+        "new submissions for this cycle. Use the previous cycles only for situational "
+        "awareness. Do not repeat them in the new report unless conditions in those "
+        "areas have changed or worsened.\n\n"
+        "**Format:**\n"
+        "- Open with 1-2 sentences: what is happening, how many new reports, when\n"
+        "- If any high-severity or evacuation reports exist, list them first under **\u26a0 Priority Items**\n"
+        "- Then list affected districts as headers, with bullet points per incident "
+        "(type, location if known, brief description)\n"
+        "- Skip districts with no new reports entirely\n"
+        "- End with a one-line count: e.g. *12 reports processed — 3 high severity, 2 evacuation notices*\n\n"
+        "Keep the language plain and direct. No bureaucratic phrasing. No filler. "
+        "If something is urgent, say so clearly."
+    )
+
+    def map_prompt(self, chunk: str) -> str:
+        """Stage 1 user turn: one chunk of submissions (instructions are MAP_SYSTEM)."""
+        return f"<input_data>\n{chunk}\n</input_data>"
+
+    def combine_prompt(self, combined_text: str, prior_context: Optional[str]) -> str:
+        """Stage 2 user turn: prior event context and the stage-1 output (instructions are COMBINE_SYSTEM)."""
+        prior_context_block = prior_context if prior_context else "No previous reports this event."
+        return (
+            "**What has already been reported (previous cycles):**\n"
+            f"{prior_context_block}\n\n"
+            "**New submissions this cycle:**\n"
+            f"{combined_text}"
+        )
+
+    def context_prompt(self, report: str) -> str:
+        """Prompt that condenses a finished report into context for the next cycle."""
+        context_prompt = f"""
+Summarise the following emergency report into a compact paragraph (3-5 sentences max)
+suitable for use as prior context in the next report cycle. Focus on: which districts
+were affected, what types of incidents occurred, and any ongoing situations that
+coordinators should remain aware of.
+
+Report:
+{report}
+"""
+        return context_prompt
+
+    # ── Report Generation ─────────────────────────────────────────────────────
+
+    def generate_report(
+        self,
+        submissions: List[Dict],
+        progress_callback: Optional[Callable[[str], None]] = None,
+        batch_id: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Two-stage map-reduce report generation.
+
+        Stage 1: Organise each chunk of submissions by district and flag urgency
+                 (done locally when districts_verified()). Submissions the spam
+                 filter flags are left out and stay unprocessed until reviewed;
+                 if that is all of them the batch is released and None is returned.
+        Stage 2: Synthesise a final civil-defense briefing from the stage-1 output,
+                 injecting prior event context if available.
+
+        After a successful report the processed submissions are marked in the DB
+        and the report is returned; a new context summary for the next report
+        cycle is written in the background (see wait_for_context()).
+        When `batch_id` is given (rows from DatabaseManager.claim_pending) the
+        lease is renewed between Claude calls and completed at the end, and
+        the run is checkpointed under that id in report_runs, so a failed run
+        can be resumed through the async pipeline. If the run raises or
+        Claude returns nothing, the batch is released and the run marked
+        failed.
+        """
+        if not submissions:
+            return None
+
+        self.usage = dict.fromkeys(USAGE_FIELDS, 0)
+        self.scheduling = dict.fromkeys(SCHEDULE_FIELDS, 0)
+        self.calls = self.cached_calls = 0
+        self.timings = {}
+        self.last_report_id = None
+        run_started = time.perf_counter()
+        run_id = batch_id
+
+        def checkpoint(stage: str, **fields):
+            if run_id:
+                self.db.update_run(run_id, stage=stage, **fields)
+
+        def fail(error: str):
+            if batch_id:
+                self.db.release_batch(batch_id)
+                self.db.update_run(run_id, status="failed", error=error)
+
+        try:
+            if run_id:
+                self.db.create_run(run_id, [s["id"] for s in submissions])
+
+            # ── Stage 1: Organise by district ─────────────────────────────
+            stage_started = time.perf_counter()
+            screened = [s for s in self.db.rescreen(submissions) if s["mod_status"] not in SPAM_STATUSES]
+            if progress_callback and len(screened) < len(submissions):
+                progress_callback(self.spam_summary(len(submissions) - len(screened)))
+            if not screened:
+                if batch_id:
+                    self.db.release_batch(batch_id)
+                checkpoint("complete", status="complete")
+                return None
+
+            records = self.clusterer.collapse(screened)
+            self.timings["dedup"] = round(time.perf_counter() - stage_started, 3)
+            if progress_callback and len(records) < len(screened):
+                progress_callback(self.dedup_summary(len(screened), len(records)))
+
+            if self.districts_verified(screened):
+                if progress_callback:
+                    progress_callback("All districts verified against the gazetteer — organising locally…")
+                combined_text = self.organise_locally(records)
+            else:
+                organized_chunks = self.map_chunks(
+                    (self.map_prompt(chunk) for chunk in self.chunk_submissions(records)),
+                    progress_callback=progress_callback,
+                    batch_id=batch_id,
+                    system=self.MAP_SYSTEM,
+                )
+                combined_text = "\n\n".join(organized_chunks)
+                if progress_callback:
+                    progress_callback(self.cache_summary())
+                    progress_callback(self.response_cache_summary())
+            checkpoint("mapped", combined_text=combined_text)
+            self.timings["map"] = round(time.perf_counter() - stage_started, 3)
+
+            # ── Stage 2: Final report ─────────────────────────────────────
+            self.wait_for_context()
+            combine_prompt = self.combine_prompt(combined_text, self.db.get_latest_context())
+
+            if progress_callback:
+                progress_callback(f"Generating final emergency report…{self.queue_note()}")
+            if batch_id:
+                self.db.renew_lease(batch_id)
+
+            stage_started = time.perf_counter()
+            report = self.call_claude(combine_prompt, max_tokens=8000, system=self.COMBINE_SYSTEM)
+            if not report:
+                fail("Empty report from Claude")
+                return None
+            checkpoint("reported", report=report)
+            self.timings["reduce"] = round(time.perf_counter() - stage_started, 3)
+            if progress_callback:
+                progress_callback(self.scheduler_summary())
+            self.timings["total"] = round(time.perf_counter() - run_started, 3)
+
+            # ── Mark submissions as processed ─────────────────────────────
+            processed_ids = [s["id"] for s in screened]
+            if batch_id:
+                self.db.complete_batch(batch_id)
+            else:
+                self.db.mark_processed(processed_ids)
+
+            # ── Persist the report so the dashboard can reload it ─────────
+            self.last_report_id = self.db.save_report(
+                report, processed_ids, batch_id=batch_id, timings=self.timings, usage=self.usage,
+            )
+            checkpoint("stored", report_id=self.last_report_id)
+        except Exception as e:
+            fail(str(e))
+            raise
+
+        # ── Updated context summary, off the critical path ────────────────
+        if progress_callback:
+            progress_callback("Saving event context summary in the background…")
+        EmergencyReportGenerator.context_future = context_executor().submit(
+            self.summarise_context, report, run_id,
+        )
+
+        return report
+
+    def summarise_context(self, report: str, run_id: Optional[str] = None) -> Optional[str]:
+        """
+        Condense `report` into the event context for the next cycle and save
+        it, then checkpoint run `run_id` as complete (or failed at 'stored').
+        """
+        try:
+            context_summary = self.call_claude(self.context_prompt(report), max_tokens=512)
+            if context_summary:
+                self.db.save_context(context_summary)
+            if run_id:
+                self.db.update_run(run_id, stage="complete", status="complete", context_summary=context_summary)
+            return context_summary
+        except Exception as e:
+            log.exception("Context summary not saved")
+            if run_id:
+                self.db.update_run(run_id, status="failed", error=f"Context summary: {e}")
+            return None
+
+    def wait_for_context(self, timeout: float = CONTEXT_WAIT_SECONDS):
+        """Block until the previous cycle's context summary is saved, if it is still being written."""
+        future = EmergencyReportGenerator.context_future
+        if future is not None and not future.done():
+            try:
+                future.result(timeout)
+            except FutureTimeoutError:  # not the builtin TimeoutError before Python 3.11
+                log.warning("Context summary still running after %gs; using the last saved one", timeout)
+
+
+# ── Async Report Generator ────────────────────────────────────────────────────
+
+def prompt_hash(prompt: str, system: Optional[str] = None) -> str:
+    """Identity of one Claude request's input, for run checkpoints."""
+    return hashlib.sha256(f"{system or ''}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+def progress_event(message: str, level: str = "processing") -> Dict:
+    """A generation progress event, in the shape /api/generate streams as SSE."""
+    return {"type": "log", "message": message, "level": level}
+
+
+@functools.lru_cache(maxsize=None)
+def shared_async_client(api_key: str) -> "anthropic.AsyncAnthropic":
+    """One AsyncAnthropic client per process, so generations share its connection pool."""
+    return anthropic.AsyncAnthropic(api_key=api_key, max_retries=0)  # retries go through the scheduler
+
+
+class AsyncEmergencyReportGenerator(EmergencyReportGenerator):
+    """
+    Coroutine counterpart of EmergencyReportGenerator for the async API.
+
+    Claude calls go through anthropic.AsyncAnthropic and database work through
+    an AsyncDatabaseManager, so a generation holds no OS thread of its own and
+    any number can run on the event loop. generate_events() yields progress
+    as SSE-ready dicts rather than taking a callback. Prompts, formatting and
+    chunking are inherited unchanged.
+    """
+
+    # Context summaries this process is still writing (see start_context_summary)
+    context_tasks: Set[asyncio.Task] = set()
+
+    def __init__(
+        self,
+        adb: AsyncDatabaseManager,
+        map_concurrency: int = MAP_CONCURRENCY,
+        use_cache: bool = LLM_CACHE_ENABLED,
+        dedup_threshold: float = DEDUP_THRESHOLD,
+    ):
+        super().__init__(adb.db, map_concurrency, use_cache, dedup_threshold)
+        self.adb = adb
+
+    def _make_client(self, api_key: str):
+        return shared_async_client(api_key)
+
+    async def call_claude(self, prompt: str, max_tokens: int = 4096, system: Optional[str] = None) -> Optional[str]:
+        """Make a single call to Claude API, or answer it from the response cache."""
+        key = self.cache_key(prompt, max_tokens, system)
+        if key:
+            cached = await self.adb.run(self.cache.get, key)
+            if cached is not None:
+                self.record_cached_call()
+                return cached
+        params = self.request_params(prompt, max_tokens, system)
+        try:
+            admission, message = await self.scheduled(
+                estimate_tokens((system or "") + prompt), lambda: self.claude_client.messages.create(**params),
+            )
+            self.scheduler.release(admission, message=message)
+            self.record_usage(getattr(message, "usage", None))
+            text = message.content[0].text
+        except Exception as e:
+            raise Exception(f"Claude API error: {str(e)}")
+        if key and self.cacheable(message, text):
+            await self.adb.run(self.cache.put, key, CLAUDE_MODEL, text, self.message_tokens(message))
+        return text
+
+    async def stream_claude(
+        self,
+        prompt: str,
+        max_tokens: int = 4096,
+        system: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Call Claude with the streaming API, yielding text deltas as they
+        arrive. A response-cache hit is yielded as a single delta.
+        """
+        key = self.cache_key(prompt, max_tokens, system)
+        if key:
+            cached = await self.adb.run(self.cache.get, key)
+            if cached is not None:
+                self.record_cached_call()
+                yield cached
+                return
+        params = self.request_params(prompt, max_tokens, system)
+        parts: List[str] = []
+        try:
+            async with AsyncExitStack() as stack:
+                # Only opening the stream is retried; once text has been yielded it cannot be
+                admission, stream = await self.scheduled(
+                    estimate_tokens((system or "") + prompt),
+                    lambda: stack.enter_async_context(self.claude_client.messages.stream(**params)),
+                )
+                message = error = None
+                try:
+                    async for text in stream.text_stream:
+                        parts.append(text)
+                        yield text
+                    message = await stream.get_final_message()
+                except Exception as e:
+                    error = e
+                    raise
+                finally:
+                    self.scheduler.release(admission, message=message, error=error)
+        except Exception as e:
+            raise Exception(f"Claude API error: {str(e)}")
+        self.record_usage(getattr(message, "usage", None))
+        text = "".join(parts)
+        if key and self.cacheable(message, text):
+            await self.adb.run(self.cache.put, key, CLAUDE_MODEL, text, self.message_tokens(message))
+
+    async def scheduled(self, tokens: int, request: Callable):
+        """scheduled() for coroutines: `request()` returns an awaitable."""
+        for attempt in itertools.count():
+            admission = await self.scheduler.acquire_async(tokens)
+            self.record_admission(admission)
+            try:
+                return admission, await request()
+            except Exception as e:
+                self.scheduler.release(admission, error=e)
+                delay = self.scheduler.retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                self.record_retry()
+                await asyncio.sleep(delay)
+            except BaseException:
+                self.scheduler.release(admission)
+                raise
+
+    async def map_chunks(
+        self,
+        prompts: Iterable[str],
+        batch_id: Optional[str] = None,
+        system: Optional[str] = None,
+        checkpoints: Optional[Dict[str, str]] = None,
+    ) -> AsyncIterator[Dict]:
+        """
+        Run the stage-1 prompts with up to `self.map_concurrency` calls in
+        flight, yielding a log event as calls finish and finally
+        {"type": "mapped", "results": [...]} in prompt order. `prompts` is
+        consumed lazily: the next chunk is built only when a call slot frees
+        up, so a large batch never has more than map_concurrency chunks
+        built ahead of its calls. Leaving early (an error or a closed stream)
+        cancels the outstanding calls.
+
+        With `checkpoints` (a run's outputs by prompt_hash) chunks already
+        done are reused without a call, and each new output is checkpointed
+        under the run `batch_id` as soon as it arrives; a call holds its slot
+        until its checkpoint is saved.
+        """
+        async def organise(prompt: str) -> Optional[str]:
+            digest = prompt_hash(prompt, system)
+            if checkpoints and digest in checkpoints:
+                return checkpoints[digest]
+            result = await self.call_claude(prompt, system=system)
+            if result and checkpoints is not None and batch_id:
+                await self.adb.save_run_chunk(batch_id, digest, result)
+            return result
+
+        if batch_id:
+            await self.adb.renew_lease(batch_id)
+
+        queued = enumerate(prompts)
+        in_flight: Dict[asyncio.Task, int] = {}
+        results: Dict[int, Optional[str]] = {}
+
+        def start_calls():
+            for index, prompt in itertools.islice(queued, self.map_concurrency - len(in_flight)):
+                in_flight[asyncio.create_task(organise(prompt))] = index
+
+        yield progress_event(f"Processing chunks of submissions, up to {self.map_concurrency} at a time…")
+        try:
+            start_calls()
+            while in_flight:
+                finished, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    results[in_flight.pop(task)] = task.result()
+                start_calls()
+                if batch_id:
+                    await self.adb.renew_lease(batch_id)
+                yield progress_event(f"Analysed {len(results)} chunk(s)…{self.queue_note()}")
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+        yield {"type": "mapped", "results": [results[i] for i in sorted(results) if results[i]]}
+
+    async def generate_events(
+        self,
+        submissions: List[Dict],
+        batch_id: Optional[str] = None,
+        run: Optional[Dict] = None,
+    ) -> AsyncIterator[Dict]:
+        """
+        Same pipeline as EmergencyReportGenerator.generate_report(), as an
+        async generator of events:
+
+          {"type": "run", "run_id", "resumed_from"}    first, when checkpointing
+          {"type": "log", "message", "level"}          progress
+          {"type": "report_delta", "content"}          final report text as it streams
+          {"type": "report", "content", "report_id"}   once, when the report is stored
+          {"type": "skipped", "message"}               instead of a report, when every
+                                                       submission was flagged as spam
+
+        With a `batch_id` the run is checkpointed under that id in
+        report_runs (see RUN_STAGES) and marked failed if it raises or is
+        closed early. Pass the stored `run` (DatabaseManager.get_run, with
+        rows from claim_run) to resume it after its last completed stage.
+
+        Just before the report event the context summary for the next cycle
+        is started as a background task (start_context_summary), which
+        completes the run; the generator does not wait for it, and closing
+        the generator at the report event does not stop it. Yields no report
+        event if Claude returned nothing; the caller should release the batch
+        in that case, and on any exception before the report event.
+        """
+        if not submissions:
+            return
+
+        self.usage = dict.fromkeys(USAGE_FIELDS, 0)
+        self.scheduling = dict.fromkeys(SCHEDULE_FIELDS, 0)
+        self.calls = self.cached_calls = 0
+        self.timings = {}
+        self.last_report_id = None
+        run_started = time.perf_counter()
+
+        processed_ids = [s["id"] for s in submissions]
+        run_id = batch_id
+        done = -1  # index in RUN_STAGES of the last completed stage
+
+        def reached(stage: str) -> bool:
+            return done >= RUN_STAGES.index(stage)
+
+        async def checkpoint(stage: str, **fields):
+            if run_id:
+                await self.adb.update_run(run_id, stage=stage, **fields)
+
+        try:
+            # A client can go away as soon as it has the run event, so that
+            # yield is covered too: the run is marked failed, not left running
+            if run_id and run:
+                done = RUN_STAGES.index(run["stage"])
+                if done < RUN_STAGES.index("reported") and sorted(run["submission_ids"]) != sorted(processed_ids):
+                    # Some rows went to another run meanwhile: redo stage 1 for
+                    # the rest (unchanged chunks still come from checkpoints)
+                    done = RUN_STAGES.index("claimed")
+                yield {"type": "run", "run_id": run_id, "resumed_from": RUN_STAGES[done]}
+                yield progress_event(f"Resuming run {run_id[:8]} after stage '{RUN_STAGES[done]}'…", "info")
+            elif run_id:
+                await self.adb.create_run(run_id, processed_ids)
+                done = RUN_STAGES.index("claimed")
+                yield {"type": "run", "run_id": run_id, "resumed_from": None}
+
+            # ── Stage 1: Organise by district ─────────────────────────────
+            stage_started = time.perf_counter()
+            if reached("mapped"):
+                combined_text = run["combined_text"]
+                screened = [s for s in submissions if s["mod_status"] not in SPAM_STATUSES]
+            else:
+                screened = [s for s in await self.adb.rescreen(submissions) if s["mod_status"] not in SPAM_STATUSES]
+                if len(screened) < len(submissions):
+                    yield progress_event(self.spam_summary(len(submissions) - len(screened)), "info")
+                if not screened:
+                    if batch_id:
+                        await self.adb.release_batch(batch_id)
+                    await checkpoint("complete", status="complete")
+                    yield {
+                        "type": "skipped",
+                        "message": "Every submission in this batch was flagged as spam or a test — "
+                                   "no report needed. They wait for review under Submissions → Flagged.",
+                    }
+                    return
+
+                # CPU-bound for large batches, so off the event loop
+                records = await asyncio.to_thread(self.clusterer.collapse, screened)
+                self.timings["dedup"] = round(time.perf_counter() - stage_started, 3)
+                if len(records) < len(screened):
+                    yield progress_event(self.dedup_summary(len(screened), len(records)), "info")
+
+                if self.districts_verified(screened):
+                    yield progress_event("All districts verified against the gazetteer — organising locally…")
+                    combined_text = self.organise_locally(records)
+                else:
+                    checkpoints = await self.adb.get_run_chunks(run_id) if run_id else None
+                    organized_chunks: List[str] = []
+                    prompts = (self.map_prompt(chunk) for chunk in self.chunk_submissions(records))
+                    async for event in self.map_chunks(
+                        prompts, batch_id=batch_id, system=self.MAP_SYSTEM, checkpoints=checkpoints,
+                    ):
+                        if event["type"] == "mapped":
+                            organized_chunks = event["results"]
+                        else:
+                            yield event
+                    combined_text = "\n\n".join(organized_chunks)
+                    yield progress_event(self.cache_summary(), "info")
+                    yield progress_event(self.response_cache_summary(), "info")
+                await checkpoint("mapped", combined_text=combined_text)
+                self.timings["map"] = round(time.perf_counter() - stage_started, 3)
+
+            # ── Stage 2: Final report ─────────────────────────────────────
+            if reached("reported"):
+                report = run["report"]
+                yield {"type": "report_delta", "content": report}
+            else:
+                await self.wait_for_context(exclude=run_id)
+                combine_prompt = self.combine_prompt(combined_text, await self.adb.get_latest_context())
+
+                yield progress_event(f"Generating final emergency report…{self.queue_note()}")
+                if batch_id:
+                    await self.adb.renew_lease(batch_id)
+
+                # Streamed so coordinators can start reading within a second or so
+                stage_started = time.perf_counter()
+                parts: List[str] = []
+                async for delta in self.stream_claude(combine_prompt, max_tokens=8000, system=self.COMBINE_SYSTEM):
+                    if not parts:
+                        self.timings["first_token"] = round(time.perf_counter() - run_started, 3)
+                    parts.append(delta)
+                    yield {"type": "report_delta", "content": delta}
+                report = "".join(parts)
+                if not report:
+                    if run_id:
+                        await self.adb.update_run(run_id, status="failed", error="Empty report from Claude")
+                    return
+                await checkpoint("reported", report=report)
+                self.timings["reduce"] = round(time.perf_counter() - stage_started, 3)
+                yield progress_event(self.scheduler_summary(), "info")
+                self.timings["total"] = round(time.perf_counter() - run_started, 3)
+
+            # ── Mark submissions as processed and persist the report ──────
+            if reached("stored"):
+                self.last_report_id = run["report_id"]
+            else:
+                if batch_id:
+                    await self.adb.complete_batch(batch_id)
+                else:
+                    await self.adb.mark_processed(processed_ids)
+                self.last_report_id = await self.adb.save_report(
+                    report, [s["id"] for s in screened], batch_id=batch_id,
+                    timings=self.timings, usage=self.usage,
+                )
+                await checkpoint("stored", report_id=self.last_report_id)
+
+            # ── Updated context summary, off the critical path ─────────────
+            # Started before the report event: a client that disconnects as
+            # soon as it has the report must not cost the next cycle its context
+            self.start_context_summary(report, run_id)
+
+        except (Exception, asyncio.CancelledError, GeneratorExit) as e:
+            if run_id:
+                error = str(e) if isinstance(e, Exception) else "Interrupted before completion"
+                await asyncio.shield(self.adb.update_run(run_id, status="failed", error=error))
+            raise
+
+        # The summary task now owns the run's final checkpoint
+        yield {"type": "report", "content": report, "report_id": self.last_report_id}
+
+    def start_context_summary(self, report: str, run_id: Optional[str] = None) -> asyncio.Task:
+        """
+        Write the context summary of `report` in a background task tracked in
+        context_tasks. The task checkpoints run `run_id` as complete, or as
+        failed at stage 'stored'; claim_run lets such a run be resumed, which
+        redoes only the summary.
+        """
+        async def summarise():
+            try:
+                context_summary = await self.call_claude(self.context_prompt(report), max_tokens=512)
+                if context_summary:
+                    await self.adb.save_context(context_summary)
+                if run_id:
+                    await self.adb.update_run(
+                        run_id, stage="complete", status="complete", context_summary=context_summary,
+                    )
+            except (Exception, asyncio.CancelledError) as e:
+                log.warning("Context summary not saved: %s", e or "cancelled")
+                if run_id:
+                    error = (
+                        f"Context summary: {e}" if isinstance(e, Exception) else "Interrupted before completion"
+                    )
+                    await asyncio.shield(self.adb.update_run(run_id, status="failed", error=error))
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+
+        task = asyncio.create_task(summarise())
+        self.context_tasks.add(task)
+        task.add_done_callback(self.context_tasks.discard)
+        return task
+
+    async def wait_for_context(self, exclude: Optional[str] = None, timeout: float = CONTEXT_WAIT_SECONDS):
+        """
+        Wait, for at most `timeout` seconds, for context summaries still
+        being written: this process's tasks, then runs in other workers that
+        have stored their report but not completed (other than run
+        `exclude`). Returns at once when none are in flight.
+        """
+        deadline = time.monotonic() + timeout
+        loop = asyncio.get_running_loop()
+        pending = [t for t in self.context_tasks if not t.done() and t.get_loop() is loop]
+        if pending:
+            await asyncio.wait(pending, timeout=timeout)
+        while await self.adb.summaries_in_flight(timeout, exclude):
+            if time.monotonic() >= deadline:
+                log.warning("Context summary still running after %gs; using the last saved one", timeout)
+                return
+            await asyncio.sleep(0.5)
+
+    @classmethod
+    async def drain_context_tasks(cls, timeout: float = CONTEXT_WAIT_SECONDS):
+        """At shutdown: let summaries in flight finish, cancelling any still running after `timeout`."""
+        pending = [t for t in cls.context_tasks if not t.done()]
+        if not pending:
+            return
+        _, late = await asyncio.wait(pending, timeout=timeout)
+        for task in late:
+            task.cancel()
+        await asyncio.gather(*late, return_exceptions=True)
+
+    async def agenerate_report(
+        self,
+        submissions: List[Dict],
+        progress_callback: Optional[Callable[[str], None]] = None,
+        batch_id: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Coroutine form of generate_report(): run generate_events() to
+        completion, passing log messages to `progress_callback`, and return
+        the report (or None).
+        """
+        report = None
+        async for event in self.generate_events(submissions, batch_id=batch_id):
+            if event["type"] == "report":
+                report = event["content"]
+            elif event["type"] == "log" and progress_callback:
+                progress_callback(event["message"])
+        return report
+
+    def generate_report(
+        self,
+        submissions: List[Dict],
+        progress_callback: Optional[Callable[[str], None]] = None,
+        batch_id: Optional[str] = None,
+    ) -> Optional[str]:
+        """The blocking pipeline cannot run on async Claude calls; await agenerate_report() instead."""
+        raise TypeError("AsyncEmergencyReportGenerator.generate_report() is not available; await agenerate_report()")
@@ -0,0 +1,347 @@
+"""
+AlohaAI Emergency Watchtower - Claude Request Scheduler
+Host-wide rate limiting, admission and retry of Claude API calls.
+"""
+
+import os
+import mmap
+import itertools
+import struct
+import time
+import random
+import asyncio
+import threading
+import anthropic
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, List, Dict, Tuple, Iterator
+from dotenv import load_dotenv
+
+try:
+    import fcntl  # POSIX only; the server runs on Debian
+except ImportError:
+    fcntl = None
+
+load_dotenv()
+
+
+# ── Claude Request Scheduler ──────────────────────────────────────────────────
+# Every Claude call in a process is admitted by one ClaudeScheduler. Admission
+# draws on two token buckets, requests and input tokens per minute, kept in a
+# small memory-mapped file so every uvicorn worker spends the same account
+# budget. Set these to the account's rate-limit tier; 0 disables a bucket.
+CLAUDE_RPM       = float(os.getenv("CLAUDE_RPM", "50"))
+CLAUDE_INPUT_TPM = float(os.getenv("CLAUDE_INPUT_TPM", "30000"))
+
+# Calls in flight per process are capped by an AIMD limit: it grows by one per
+# limit's worth of successful calls and halves on a 429 (rate limited) or 529
+# (overloaded) response, staying between 1 and CLAUDE_MAX_CONCURRENCY.
+CLAUDE_MAX_CONCURRENCY = max(1, int(os.getenv("CLAUDE_MAX_CONCURRENCY", "8")))
+CLAUDE_OVERLOAD_STATUSES = (429, 529)
+
+# Calls that may succeed later (429, 529, other 5xx, connection errors) are
+# retried with jittered exponential backoff, honouring any retry-after header.
+# The SDK's own retries are turned off so every attempt passes admission.
+CLAUDE_MAX_RETRIES  = int(os.getenv("CLAUDE_MAX_RETRIES", "6"))
+CLAUDE_BACKOFF_BASE = 1.0   # seconds before the first retry; doubles each time
+CLAUDE_BACKOFF_MAX  = 60.0
+
+# Queueing counters kept per run (see EmergencyReportGenerator.scheduler_summary)
+SCHEDULE_FIELDS = ("queued", "queue_wait", "max_wait", "peak_queue", "retries")
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds from a failed response's retry-after header, if it sent one."""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class SharedTokenBuckets:
+    """
+    A request bucket and an input-token bucket, refilled continuously at
+    `rpm` and `tpm` per minute and each holding at most a minute's worth,
+    in a memory-mapped file shared by every process that opens the same
+    path (like SharedCounter). The file also holds a host-wide cool-down
+    set from 429 retry-after headers. Every update is made under an flock,
+    taken without waiting: the scheduler runs on the event loop, so a
+    process that finds the lock held retries take() shortly and defers a
+    settle() or cool_down() to its next update instead of blocking.
+    """
+
+    # requests, tokens, last refill, cool-down until (wall clock, shared by processes)
+    LAYOUT = struct.Struct("<dddd")
+    BUSY_SECONDS = 0.005  # take() result while another process holds the lock
+
+    def __init__(self, path: Path, rpm: float, tpm: float):
+        self.path = path
+        self.rates = (rpm, tpm)
+        fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o660)
+        try:
+            if os.fstat(fd).st_size < self.LAYOUT.size:
+                os.ftruncate(fd, self.LAYOUT.size)
+            self._mm = mmap.mmap(fd, self.LAYOUT.size)
+        finally:
+            os.close(fd)
+        self._file = open(path, "rb+")
+        self._lock = threading.Lock()
+        self._deferred_tokens = 0.0    # settle() amounts not yet written to the file
+        self._deferred_cooldown = 0.0  # cool_down() deadline not yet written to the file
+
+    @contextmanager
+    def _state(self) -> Iterator[Optional[List[float]]]:
+        """
+        The refilled [requests, tokens, refilled, cool-down] state, written
+        back on exit, or None if another process holds the file lock.
+        """
+        with self._lock:
+            if fcntl:
+                try:
+                    fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield None
+                    return
+            try:
+                requests, tokens, refilled, cooldown = self.LAYOUT.unpack_from(self._mm, 0)
+                now = time.time()
+                levels = [requests, tokens]
+                for i, rate in enumerate(self.rates):
+                    if rate <= 0:
+                        levels[i] = 0.0
+                    elif not refilled:  # new file: start full
+                        levels[i] = rate
+                    else:
+                        levels[i] = min(rate, levels[i] + max(0.0, now - refilled) * rate / 60)
+                if self._deferred_tokens:
+                    levels[1] = min(self.rates[1], levels[1] - self._deferred_tokens)
+                state = [*levels, now, max(cooldown, self._deferred_cooldown)]
+                self._deferred_tokens = self._deferred_cooldown = 0.0
+                yield state
+                self.LAYOUT.pack_into(self._mm, 0, *state)
+            finally:
+                if fcntl:
+                    fcntl.flock(self._file, fcntl.LOCK_UN)
+
+    def take(self, tokens: int) -> float:
+        """
+        Take one request and `tokens` input tokens if both buckets hold
+        enough and no cool-down is in force, and return 0. Otherwise take
+        nothing and return the seconds until they would (or until the lock
+        is worth trying again).
+        """
+        with self._state() as state:
+            if state is None:
+                return self.BUSY_SECONDS
+            wait = max(0.0, state[3] - state[2])
+            needs = (1.0, min(float(tokens), self.rates[1]))  # a huge prompt waits for a full bucket
+            for level, need, rate in zip(state, needs, self.rates):
+                if rate > 0 and level < need:
+                    wait = max(wait, (need - level) * 60 / rate)
+            if not wait:
+                state[0] -= needs[0]
+                state[1] -= needs[1]
+        return wait
+
+    def settle(self, tokens: float):
+        """Charge (or refund, if negative) the difference between estimated and actual tokens."""
+        if self.rates[1] > 0 and tokens:
+            with self._state() as state:
+                if state is None:
+                    self._deferred_tokens += tokens
+                else:
+                    state[1] = min(self.rates[1], state[1] - tokens)
+
+    def cool_down(self, seconds: float):
+        """Hold back every process's calls for `seconds`."""
+        with self._state() as state:
+            if state is None:
+                self._deferred_cooldown = max(self._deferred_cooldown, time.time() + seconds)
+            else:
+                state[3] = max(state[3], state[2] + seconds)
+
+    def close(self):
+        """Unmap the shared state and close the lock file."""
+        with self._lock:
+            if not self._file.closed:
+                self._mm.close()
+                self._file.close()
+
+
+class Admission:
+    """One Claude call let through by ClaudeScheduler, until it is released."""
+
+    def __init__(self, tokens: int, waited: float, depth: int):
+        self.tokens = tokens          # input tokens charged up front (estimated)
+        self.waited = waited          # seconds spent queued; 0 if admitted at once
+        self.depth = depth            # queue length when the call joined it
+        self.admitted_at = time.monotonic()
+
+
+class ClaudeScheduler:
+    """
+    Admits a process's Claude calls in arrival order, each when it is
+    within the shared token buckets (if any) and the AIMD concurrency
+    limit. acquire() / acquire_async() block until admitted; the caller
+    must release() the admission when its response is complete or failed.
+    Thread-safe, so the sync generator's map threads and the event loop
+    can share one instance.
+    """
+
+    POLL_SECONDS = 0.02  # re-check interval while waiting behind others or for a slot
+
+    def __init__(
+        self,
+        buckets: Optional[SharedTokenBuckets] = None,
+        max_concurrency: int = CLAUDE_MAX_CONCURRENCY,
+        max_retries: int = CLAUDE_MAX_RETRIES,
+    ):
+        self.buckets = buckets
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self._queue: deque = deque()  # tickets waiting, oldest first
+        self._tickets = itertools.count()
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def _join(self) -> Tuple[int, int, float]:
+        with self._lock:
+            ticket = next(self._tickets)
+            self._queue.append(ticket)
+            return ticket, len(self._queue), time.monotonic()
+
+    def _leave(self, ticket: int):
+        with self._lock:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+
+    def _admit(self, ticket: int, tokens: int) -> float:
+        """Admit `ticket` and return 0, or return the seconds to wait before asking again."""
+        with self._lock:
+            if self._queue[0] != ticket or self.in_flight >= int(self.limit):
+                return self.POLL_SECONDS
+            wait = self.buckets.take(tokens) if self.buckets else 0.0
+            if wait:
+                return max(wait, self.POLL_SECONDS)
+            self._queue.popleft()
+            self.in_flight += 1
+            return 0.0
+
+    def acquire(self, tokens: int) -> Admission:
+        """Block until a call estimated at `tokens` input tokens may be sent."""
+        ticket, depth, joined = self._join()
+        waited = 0.0
+        try:
+            while True:
+                wait = self._admit(ticket, tokens)
+                if not wait:
+                    break
+                time.sleep(wait)
+                waited = time.monotonic() - joined
+        except BaseException:
+            self._leave(ticket)
+            raise
+        return Admission(tokens, waited, depth)
+
+    async def acquire_async(self, tokens: int) -> Admission:
+        """acquire() for coroutines: waits with asyncio.sleep, so never holds up the event loop."""
+        ticket, depth, joined = self._join()
+        waited = 0.0
+        try:
+            while True:
+                wait = self._admit(ticket, tokens)
+                if not wait:
+                    break
+                await asyncio.sleep(wait)
+                waited = time.monotonic() - joined
+        except BaseException:
+            self._leave(ticket)
+            raise
+        return Admission(tokens, waited, depth)
+
+    def release(self, admission: Admission, message=None, error: Optional[BaseException] = None):
+        """
+        Free the admission's slot. A complete `message` grows the limit
+        additively and settles its token estimate against actual usage; a
+        429/529 `error` halves the limit (once per congestion event: not for
+        calls admitted before the last cut) and a retry-after on a 429 pauses
+        every process. With neither, the call was abandoned and the limit is
+        left alone.
+        """
+        status = getattr(error, "status_code", None)
+        with self._lock:
+            self.in_flight -= 1
+            if message is not None:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            elif status in CLAUDE_OVERLOAD_STATUSES and admission.admitted_at >= self._last_decrease:
+                self.limit = max(1.0, self.limit / 2)
+                self._last_decrease = time.monotonic()
+        if not self.buckets:
+            return
+        usage = getattr(message, "usage", None)
+        if usage is not None:
+            # Prompt-cache reads do not count towards the input-token limit
+            used = (getattr(usage, "input_tokens", None) or 0) + (getattr(usage, "cache_creation_input_tokens", None) or 0)
+            self.buckets.settle(used - admission.tokens)
+        if status == 429 and retry_after(error):
+            self.buckets.cool_down(retry_after(error))
+
+    def close(self):
+        """Release the shared token buckets' file handles."""
+        if self.buckets:
+            self.buckets.close()
+
+    @staticmethod
+    def retryable(error: BaseException) -> bool:
+        """Whether a failed call may succeed if sent again (the statuses the SDK itself retries)."""
+        status = getattr(error, "status_code", None)
+        if isinstance(status, int):
+            return status in (408, 409, 429) or status >= 500
+        return isinstance(error, anthropic.APIConnectionError)
+
+    def retry_delay(self, attempt: int, error: BaseException) -> Optional[float]:
+        """
+        Seconds to wait before retry number `attempt` + 1 of a call that
+        failed with `error`, or None if it should not be retried. The
+        backoff doubles per attempt and is jittered over its upper half so
+        calls that failed together do not retry together.
+        """
+        if attempt >= self.max_retries or not self.retryable(error):
+            return None
+        backoff = min(CLAUDE_BACKOFF_MAX, CLAUDE_BACKOFF_BASE * 2 ** attempt)
+        return max(retry_after(error) or 0.0, random.uniform(backoff / 2, backoff))
+
+
+_schedulers: Dict[Path, ClaudeScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def claude_scheduler(path: Path) -> ClaudeScheduler:
+    """This process's scheduler; its buckets are shared with every process using `path`."""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(path)
+        if scheduler is None:
+            buckets = (
+                SharedTokenBuckets(path, CLAUDE_RPM, CLAUDE_INPUT_TPM)
+                if CLAUDE_RPM > 0 or CLAUDE_INPUT_TPM > 0 else None
+            )
+            scheduler = _schedulers[path] = ClaudeScheduler(buckets)
+        return scheduler
+
+
+def close_claude_schedulers():
+    """At shutdown: close the schedulers' shared-bucket files. Later generators open new ones."""
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+        _schedulers.clear()
+    for scheduler in schedulers:
+        scheduler.close()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+AlohaAI Watchtower — SQLite connection benchmark
+Compares the old connect-per-call / rollback-journal DatabaseManager with the
+pooled WAL connections: concurrent writer threads call insert_submission()
+while reader threads poll get_counts() and get_pending(), as the admin panel
+does during a surge.
+
+Usage (from the Watchtower/ directory):
+  python benchmarks/bench_db_pool.py
+  python benchmarks/bench_db_pool.py --writers 8 --readers 4 --seconds 10
+"""
+
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.db import DatabaseManager
+
+
+class LegacyDatabaseManager(DatabaseManager):
+    """Pre-pool behaviour: a fresh rollback-journal connection on every call."""
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path))
+        conn.row_factory = sqlite3.Row
+        # Queries now name archive.* tables, so attach it as the pool does
+        conn.execute("ATTACH DATABASE ? AS archive", (str(self.archive_path),))
+        return conn
+
+
+def sample_submission(i: int) -> dict:
+    districts = ["Puna", "South Hilo", "Ka'u", "North Kona", "Hamakua"]
+    return {
+        "ref_code": f"HI-B{i:06d}",
+        "incident_type": "power",
+        "district": districts[i % len(districts)],
+        "location": "Hawaiian Acres Rd 8",
+        "description": "No power on our street since the last tremor.",
+        "severity": ("low", "medium", "high")[i % 3],
+    }
+
+
+def run(db: DatabaseManager, writers: int, readers: int, seconds: float) -> dict:
+    stop = threading.Event()
+    inserts = [0] * writers
+    reads = [0] * readers
+    errors = []
+
+    def writer(slot: int):
+        i = slot * 10_000_000
+        while not stop.is_set():
+            try:
+                db.insert_submission(sample_submission(i))
+                inserts[slot] += 1
+            except sqlite3.OperationalError as e:  # "database is locked"
+                errors.append(str(e))
+            i += 1
+
+    def reader(slot: int):
+        while not stop.is_set():
+            try:
+                db.get_counts()
+                db.get_pending()[:50]
+                reads[slot] += 1
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    threads += [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    return {
+        "inserts_per_sec": sum(inserts) / seconds,
+        "reads_per_sec": sum(reads) / seconds,
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Watchtower SQLite connection handling.")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"\n{args.writers} writer(s), {args.readers} reader(s), {args.seconds:.0f}s per run\n")
+    print(f"{'Mode':<22} {'Inserts/s':>12} {'Reads/s':>12} {'Lock errors':>12}")
+    print("-" * 62)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, cls in (("connect-per-call", LegacyDatabaseManager), ("pooled WAL", DatabaseManager)):
+            db = cls(Path(tmp) / f"{cls.__name__}.db")
+            result = run(db, args.writers, args.readers, args.seconds)
+            db.close()
+            print(f"{label:<22} {result['inserts_per_sec']:>12,.0f} "
+                  f"{result['reads_per_sec']:>12,.0f} {result['errors']:>12}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
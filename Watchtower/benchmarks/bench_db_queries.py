@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+AlohaAI Watchtower — admin query latency benchmark
+Fills a scratch database with a large event's worth of submissions (most of
+them already processed) and times the queries the admin panel runs, so index
+regressions show up as latency that grows with row count.
+
+Usage (from the Watchtower/ directory):
+  python benchmarks/bench_db_queries.py
+  python benchmarks/bench_db_queries.py --rows 1000000 --pending 2000
+"""
+
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.db import DatabaseManager
+
+DISTRICTS = ["North Kohala", "South Kohala", "Hamakua", "North Hilo", "South Hilo",
+             "Puna", "Ka'u", "South Kona", "North Kona"]
+SEVERITIES = ["low", "medium", "high"]
+
+
+def populate(db: DatabaseManager, rows: int, pending: int):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    conn = db._connect()
+    batch = []
+    for i in range(rows):
+        batch.append((
+            f"HI-{i:07d}", "power", random.choice(DISTRICTS), "Hwy 130",
+            "Power out along the highway.", random.choice(SEVERITIES),
+            (start + timedelta(seconds=i)).isoformat(),
+            0 if i >= rows - pending else 1,
+        ))
+        if len(batch) == 50_000:
+            conn.executemany(
+                """INSERT INTO submissions (ref_code, incident_type, district, location,
+                       description, severity, timestamp, processed)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", batch)
+            conn.commit()
+            batch = []
+    if batch:
+        conn.executemany(
+            """INSERT INTO submissions (ref_code, incident_type, district, location,
+                   description, severity, timestamp, processed)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", batch)
+        conn.commit()
+    conn.execute("ANALYZE")
+
+
+def timed(fn, repeat: int = 50) -> float:
+    """Median wall time of fn() in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Watchtower admin query latency.")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--pending", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(Path(tmp) / "bench.db")
+        print(f"\nPopulating {args.rows:,} rows ({args.pending:,} pending)…")
+        populate(db, args.rows, args.pending)
+        conn = db._connect()
+
+        queries = {
+            "pending count": lambda: conn.execute(
+                "SELECT COUNT(*) FROM submissions WHERE processed = 0").fetchone(),
+            "pending first 50": lambda: conn.execute(
+                "SELECT * FROM submissions WHERE processed = 0 "
+                "ORDER BY timestamp ASC LIMIT 50").fetchall(),
+            "newest 50": lambda: conn.execute(
+                "SELECT * FROM submissions ORDER BY timestamp DESC LIMIT 50").fetchall(),
+            "district+severity 50": lambda: conn.execute(
+                "SELECT * FROM submissions WHERE district = ? AND severity = ? "
+                "ORDER BY timestamp DESC LIMIT 50", ("Puna", "high")).fetchall(),
+            "ref_code lookup": lambda: conn.execute(
+                "SELECT * FROM submissions WHERE ref_code = ?", ("HI-0004242",)).fetchone(),
+            "get_counts()": db.get_counts,
+        }
+
+        print(f"\n{'Query':<24} {'Median ms':>10}")
+        print("-" * 36)
+        for label, fn in queries.items():
+            print(f"{label:<24} {timed(fn):>10.3f}")
+        print()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
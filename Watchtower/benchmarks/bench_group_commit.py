@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+AlohaAI Watchtower — submission write-path load benchmark
+Simulates a surge of concurrent /api/submit requests against one disk and
+reports sustained submissions/sec for direct per-row commits versus the
+SubmissionWriter group-commit path. Each simulated client waits for its row
+id before sending the next submission, exactly like the request handler.
+
+Usage (from the Watchtower/ directory):
+  python benchmarks/bench_group_commit.py
+  python benchmarks/bench_group_commit.py --clients 64 --seconds 10 --synchronous FULL
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.db import DatabaseManager, SubmissionWriter
+
+
+def sample_submission(i: int) -> dict:
+    return {
+        "ref_code": f"HI-G{i:07d}",
+        "incident_type": "lava",
+        "district": "Puna",
+        "location": "Leilani Estates",
+        "description": "Fissure opened near Pomaikai St, gas smell strong.",
+        "severity": "high",
+        "evacuation": "mandatory",
+    }
+
+
+def run(insert, clients: int, seconds: float) -> float:
+    stop = threading.Event()
+    done = [0] * clients
+
+    def client(slot: int):
+        i = slot * 10_000_000
+        while not stop.is_set():
+            insert(sample_submission(i))
+            done[slot] += 1
+            i += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return sum(done) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Watchtower group-commit inserts.")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--synchronous", default="FULL",
+                        help="SQLite synchronous level (FULL forces an fsync per commit)")
+    args = parser.parse_args()
+
+    print(f"\n{args.clients} concurrent clients, {args.seconds:.0f}s, synchronous={args.synchronous}\n")
+    print(f"{'Write path':<28} {'Submissions/s':>14} {'Avg batch':>10}")
+    print("-" * 54)
+
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        db = DatabaseManager(Path(tmp) / "direct.db", synchronous=args.synchronous)
+        rate = run(db.insert_submission, args.clients, args.seconds)
+        db.close()
+        print(f"{'direct insert_submission()':<28} {rate:>14,.0f} {1:>10.1f}")
+
+        db = DatabaseManager(Path(tmp) / "grouped.db", synchronous=args.synchronous)
+        writer = SubmissionWriter(db, window_ms=args.window_ms)
+        rate = run(writer.insert, args.clients, args.seconds)
+        writer.close()
+        db.close()
+        avg = writer.rows / writer.batches if writer.batches else 0
+        print(f"{'SubmissionWriter':<28} {rate:>14,.0f} {avg:>10.1f}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+AlohaAI Watchtower — report map-stage concurrency benchmark
+Runs EmergencyReportGenerator.map_chunks() against a stub Claude client that
+sleeps for a fixed latency (plus jitter) per call, and reports stage-1 wall
+time at several MAP_CONCURRENCY settings. No API key or network needed.
+
+Usage (from the Watchtower/ directory):
+  python benchmarks/bench_map_concurrency.py
+  python benchmarks/bench_map_concurrency.py --chunks 40 --latency 8 --levels 1 4 8 16
+"""
+
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.db import DatabaseManager
+from backend.reports import EmergencyReportGenerator
+from backend.scheduler import ClaudeScheduler
+
+
+class StubMessages:
+    """Stands in for anthropic.Anthropic().messages with injected latency."""
+
+    def __init__(self, latency: float, jitter: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def create(self, model, max_tokens, messages):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        prompt = messages[0]["content"]
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=f"organised: {prompt[:24]}")],
+            usage=SimpleNamespace(input_tokens=len(prompt) // 4, output_tokens=200),
+        )
+
+
+def run(generator: EmergencyReportGenerator, prompts, concurrency: int) -> float:
+    generator.map_concurrency = concurrency
+    t0 = time.perf_counter()
+    results = generator.map_chunks(prompts)
+    elapsed = time.perf_counter() - t0
+    assert results == [f"organised: {p[:24]}" for p in prompts], "chunk order not preserved"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Watchtower map-stage concurrency.")
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=2.0, help="seconds per stub Claude call")
+    parser.add_argument("--jitter", type=float, default=0.5, help="± seconds of random latency")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    prompts = [f"chunk {i:04d} of the backlog" for i in range(args.chunks)]
+
+    print(f"\n{args.chunks} chunks, {args.latency:g}s ± {args.jitter:g}s per call\n")
+    print(f"{'Concurrency':>11} {'Wall s':>9} {'Speed-up':>9} {'Peak in flight':>15}")
+    print("-" * 48)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generator = EmergencyReportGenerator(DatabaseManager(Path(tmp) / "bench.db"), use_cache=False)
+        # No rate-limit buckets, and a concurrency ceiling above every level measured
+        generator.scheduler = ClaudeScheduler(max_concurrency=max(args.levels))
+        baseline = None
+        for level in args.levels:
+            stub = StubMessages(args.latency, args.jitter)
+            generator.claude_client = SimpleNamespace(messages=stub)
+            elapsed = run(generator, prompts, level)
+            baseline = baseline or elapsed
+            print(f"{level:>11} {elapsed:>9.2f} {baseline / elapsed:>8.1f}x {stub.peak:>15}")
+        generator.db.close()
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 /**
  * AlohaAI Emergency Watchtower — Admin App
  * Connects to FastAPI backend via SSE for report generation.
- * Polls /api/submissions for citizen report moderation.
+ * Pages through /api/submissions (keyset cursor) for citizen report moderation.
  */
 
 // ── Auth-aware fetch wrapper ───────────────────────────────────────────────
@@ -18,6 +18,7 @@ window.fetch = async (...args) => {
 // ── DOM References ─────────────────────────────────────────────────────────
 const generateBtn     = document.getElementById('generate-btn');
 const saveBtn         = document.getElementById('save-btn');
+const resumeBtn       = document.getElementById('resume-btn');
 const clearBtn        = document.getElementById('clear-btn');
 const statusValue     = document.getElementById('status-value');
 const statusDot       = document.getElementById('status-dot');
@@ -34,7 +35,11 @@ const pendingBadge    = document.getElementById('pending-badge');
 const submissionsList = document.getElementById('submissions-list');
 const filterDistrict  = document.getElementById('filter-district');
 const filterSeverity  = document.getElementById('filter-severity');
+const filterProcessed = document.getElementById('filter-processed');
+const filterMod       = document.getElementById('filter-mod');
+const filterSearch    = document.getElementById('filter-search');
 const refreshBtn      = document.getElementById('refresh-btn');
+const exportBtn       = document.getElementById('export-btn');
 const modalOverlay    = document.getElementById('modal-overlay');
 const modalHeader     = document.getElementById('modal-header');
 const modalTitle      = document.getElementById('modal-title');
@@ -88,9 +93,17 @@ document.querySelectorAll('.tab-btn').forEach(btn => {
 // ── State ──────────────────────────────────────────────────────────────────
 let currentReport  = null;
 let sseController  = null;
+let currentRunId   = null;    // checkpointed run id from the 'run' event
+let streamedReport = '';      // report_delta text received so far
+let streamFrame    = null;    // pending requestAnimationFrame for the live render
 let startTime      = null;
 let elapsedTimer   = null;
-let allSubmissions = [];   // full cache for client-side filtering
+const PAGE_SIZE     = 50;
+let subsCursor     = null;   // next_cursor from the last page loaded
+let subsOffset     = 0;      // next_offset while showing search results
+let subsDone       = false;  // no more pages for the current filters
+let subsLoading    = false;
+let subsGeneration = 0;      // bumped on reload so stale pages are dropped
 
 // ── Helpers ────────────────────────────────────────────────────────────────
 function ts() {
@@ -150,19 +163,49 @@ function markdownToHtml(md) {
     return html;
 }
 
-function renderReport(markdown) {
+// Live render while the final report streams in — at most once per frame,
+// since each delta is only a few tokens
+function renderStreamingReport() {
+    streamFrame = null;
+    let body = reportContent.querySelector('.report-body.streaming');
+    if (!body) {
+        body = document.createElement('div');
+        body.className = 'report-body streaming';
+        reportContent.innerHTML = '';
+        reportContent.appendChild(body);
+    }
+    body.innerHTML = markdownToHtml(streamedReport);
+}
+
+function renderReport(markdown, createdAt = null) {
     const body = document.createElement('div');
     body.className = 'report-body';
     body.innerHTML = markdownToHtml(markdown);
     reportContent.innerHTML = '';
     reportContent.appendChild(body);
-    const now = new Date().toLocaleString('en-US', {
+    const now = (createdAt ? new Date(createdAt) : new Date()).toLocaleString('en-US', {
         timeZone: 'Pacific/Honolulu', dateStyle: 'medium', timeStyle: 'short'
     });
     reportTs.textContent = now + ' HST';
     lastReportTime.textContent = now;
 }
 
+// ── Latest stored report (shown on dashboard open) ─────────────────────────
+async function loadLatestReport() {
+    try {
+        const res = await fetch('/api/reports/latest');
+        if (!res.ok) return;   // 404 until the first report is generated
+        const report = await res.json();
+        if (currentReport) return;   // a generation finished first
+        currentReport = report.content;
+        renderReport(currentReport, report.created_at);
+        saveBtn.disabled = false;
+        addLog(`Loaded latest report (#${report.id}, ${report.submission_count} submissions).`, 'info');
+    } catch {
+        // Leave the placeholder in place
+    }
+}
+
 // ── Modal ──────────────────────────────────────────────────────────────────
 function showModal(title, message, type = 'info') {
     modalTitle.textContent = title;
@@ -197,56 +240,132 @@ async function refreshCounts() {
         } else {
             pendingBadge.classList.add('hidden');
         }
+
+        renderDistrictCounts(data.districts ?? {});
     } catch {
         // Endpoint not wired yet — silently ignore
     }
 }
 
+// Annotate the district filter with pending counts, e.g. "Puna (12 pending, 3 high)"
+function renderDistrictCounts(districts) {
+    for (const option of filterDistrict.options) {
+        if (!option.value) continue;
+        option.dataset.label ??= option.textContent;
+        const d = districts[option.value];
+        if (!d || d.pending === 0) {
+            option.textContent = option.dataset.label;
+            continue;
+        }
+        const high = d.severity?.high ?? 0;
+        option.textContent = `${option.dataset.label} (${d.pending} pending${high ? `, ${high} high` : ''})`;
+    }
+}
+
 // Poll counts every 30 seconds
+loadLatestReport();
 refreshCounts();
 setInterval(refreshCounts, 30000);
 
 // ── Load Submissions ───────────────────────────────────────────────────────
+function submissionsEmpty(message) {
+    submissionsList.innerHTML = `
+        <div class="submission-empty">
+            <div class="submission-empty-icon">📋</div>
+            <div>${message}</div>
+        </div>`;
+}
+
+function hasFilters() {
+    return Boolean(filterDistrict.value || filterSeverity.value || filterProcessed.value
+        || filterMod.value || filterSearch.value.trim());
+}
+
 async function loadSubmissions() {
+    subsGeneration++;
+    subsCursor  = null;
+    subsOffset  = 0;
+    subsDone    = false;
+    subsLoading = false;
+    submissionsList.scrollTop = 0;
     submissionsList.innerHTML = '<div class="submission-empty"><div class="submission-empty-icon">⏳</div><div>Loading…</div></div>';
 
+    await loadNextPage();
+    refreshCounts();
+}
+
+async function loadNextPage() {
+    if (subsLoading || subsDone) return;
+    subsLoading = true;
+    const generation = subsGeneration;
+    const query      = filterSearch.value.trim();
+    const firstPage  = query ? subsOffset === 0 : subsCursor === null;
+
+    // A search query switches to ranked results (offset paging); otherwise
+    // the newest-first list is paged by keyset cursor
+    const params = new URLSearchParams({ limit: PAGE_SIZE });
+    if (filterDistrict.value) params.set('district', filterDistrict.value);
+    if (filterSeverity.value) params.set('severity', filterSeverity.value);
+    if (query) {
+        params.set('q', query);
+        params.set('offset', subsOffset);
+        if (filterProcessed.value === 'archive') params.set('include_archive', 'true');
+    } else {
+        if (subsCursor)            params.set('cursor', subsCursor);
+        if (filterProcessed.value === 'archive') params.set('include_archive', 'true');
+        else if (filterProcessed.value) params.set('processed', filterProcessed.value);
+        if (filterMod.value)       params.set('mod_status', filterMod.value);
+    }
+    const url = query ? `/api/submissions/search?${params}` : `/api/submissions?${params}`;
+
+    let page;
     try {
-        const res = await fetch('/api/submissions');
+        const res = await fetch(url);
         if (!res.ok) throw new Error(`Server error ${res.status}`);
-        const data = await res.json();
-        allSubmissions = data.submissions ?? [];
+        page = await res.json();
     } catch (err) {
-        allSubmissions = [];
-        addLog('Could not load submissions — backend not yet connected.', 'info');
+        if (generation === subsGeneration) {
+            subsLoading = false;
+            if (firstPage) submissionsEmpty('Could not load submissions');
+            addLog('Could not load submissions — backend not yet connected.', 'info');
+        }
+        return;
     }
 
-    renderSubmissions();
-    refreshCounts();
-}
-
-function renderSubmissions() {
-    const district = filterDistrict.value;
-    const severity = filterSeverity.value;
+    // Filters changed while this page was in flight
+    if (generation !== subsGeneration) return;
 
-    const filtered = allSubmissions.filter(s => {
-        if (district && s.district !== district) return false;
-        if (severity && s.severity !== severity) return false;
-        return true;
-    });
+    const rows = page.submissions ?? [];
+    if (query) {
+        subsOffset = page.next_offset ?? 0;
+        subsDone   = page.next_offset == null;
+    } else {
+        subsCursor = page.next_cursor ?? null;
+        subsDone   = !subsCursor;
+    }
+    subsLoading = false;
 
-    if (filtered.length === 0) {
-        submissionsList.innerHTML = `
-            <div class="submission-empty">
-                <div class="submission-empty-icon">📋</div>
-                <div>${allSubmissions.length === 0 ? 'No submissions yet' : 'No results match the current filters'}</div>
-            </div>`;
-        return;
+    if (firstPage) {
+        if (rows.length === 0) {
+            submissionsEmpty(hasFilters() ? 'No results match the current filters' : 'No submissions yet');
+            return;
+        }
+        submissionsList.innerHTML = '';
     }
+    rows.forEach(sub => submissionsList.appendChild(buildSubCard(sub)));
 
-    submissionsList.innerHTML = '';
-    filtered.forEach(sub => submissionsList.appendChild(buildSubCard(sub)));
+    // Keep filling until the list can scroll, so the scroll handler can take over
+    if (!subsDone && submissionsList.scrollHeight <= submissionsList.clientHeight) {
+        loadNextPage();
+    }
 }
 
+submissionsList.addEventListener('scroll', () => {
+    const nearBottom = submissionsList.scrollTop + submissionsList.clientHeight
+        >= submissionsList.scrollHeight - 200;
+    if (nearBottom) loadNextPage();
+});
+
 function buildSubCard(sub) {
     const card = document.createElement('div');
     card.className = 'sub-card' + (sub.mod_status !== 'pending' ? ` ${sub.mod_status}` : '');
@@ -265,22 +384,39 @@ function buildSubCard(sub) {
 
     const timeAgo = formatTimeAgo(sub.timestamp);
 
+    // Spam-filter audit: why a report was left out, and the verdict buttons
+    const isSpam = sub.mod_status === 'flagged' || sub.mod_status === 'spam';
+    const spamLabel = sub.mod_status === 'spam' ? 'Marked spam'
+        : sub.mod_status === 'approved' ? 'Marked genuine'
+        : `Flagged: ${sub.spam_reason || 'spam filter'}`;
+    const spamBadge = isSpam || sub.mod_status === 'approved'
+        ? `<span class="sub-spam ${sub.mod_status}" title="Spam score ${sub.spam_score ?? '—'}">⚑ ${escHtml(spamLabel)}</span>`
+        : '';
+
     card.innerHTML = `
         <div class="sub-top">
             <span class="sub-type-badge">${typeLabels[sub.incident_type] || sub.incident_type}</span>
             <span class="sub-district">${sub.district}</span>
+            ${sub.reported_district ? `<span class="sub-corrected" title="Corrected from the place names in the report">(picked ${escHtml(sub.reported_district)})</span>` : ''}
             ${sub.location ? `<span class="sub-location">— ${sub.location}</span>` : ''}
             <span class="sub-spacer"></span>
             <span class="sub-sev ${sub.severity}">${sub.severity}</span>
             <span class="sub-time">${timeAgo}</span>
         </div>
-        <div class="sub-desc">${escHtml(sub.description)}</div>
+        <div class="sub-desc">${sub.highlight ? highlightHtml(sub.highlight) : escHtml(sub.description)}</div>
         <div class="sub-meta">
             ${sub.evacuation ? `<span class="sub-evac">⚠ ${evacLabels[sub.evacuation] || sub.evacuation}</span>` : ''}
             ${sub.reporter_name ? `<span class="sub-reporter">👤 ${escHtml(sub.reporter_name)}</span>` : ''}
+            ${spamBadge}
             <span class="sub-ref">${sub.ref_code}</span>
         </div>
         <div class="sub-actions">
+            ${isSpam
+                ? `<button class="mod-btn mod-approve" onclick="moderateSubmission(${sub.id}, false, this)">✓ Not spam</button>`
+                : ''}
+            ${sub.mod_status !== 'spam'
+                ? `<button class="mod-btn" onclick="moderateSubmission(${sub.id}, true, this)">⚑ Spam</button>`
+                : ''}
             <button class="mod-btn" onclick="removeSubmission(${sub.id}, this)">✕ Remove</button>
         </div>`;
 
@@ -300,22 +436,80 @@ async function removeSubmission(id, btn) {
     }
 
     setTimeout(() => {
-        allSubmissions = allSubmissions.filter(s => s.id !== id);
-        renderSubmissions();
+        if (card) card.remove();
+        if (!submissionsList.querySelector('.sub-card')) {
+            if (subsDone) submissionsEmpty(hasFilters() ? 'No results match the current filters' : 'No submissions yet');
+            else loadNextPage();
+        }
         refreshCounts();
     }, 350);
 }
 
+// ── Spam Verdict ───────────────────────────────────────────────────────────
+// Confirms or overturns the spam filter; the server retrains it on each verdict
+async function moderateSubmission(id, spam, btn) {
+    btn.disabled = true;
+    try {
+        const res = await fetch(`/api/submissions/${id}/moderation`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ spam }),
+        });
+        if (!res.ok) throw new Error(`Server error ${res.status}`);
+        const card = document.querySelector(`.sub-card[data-id="${id}"]`);
+        if (card) card.replaceWith(buildSubCard(await res.json()));
+        refreshCounts();
+    } catch (err) {
+        btn.disabled = false;
+        addLog(`Could not save verdict: ${err.message}`, 'error');
+    }
+}
+
 // ── Filters ────────────────────────────────────────────────────────────────
-filterDistrict.addEventListener('change', renderSubmissions);
-filterSeverity.addEventListener('change', renderSubmissions);
+filterDistrict.addEventListener('change', loadSubmissions);
+filterSeverity.addEventListener('change', loadSubmissions);
+filterProcessed.addEventListener('change', loadSubmissions);
+filterMod.addEventListener('change', loadSubmissions);
 refreshBtn.addEventListener('click', loadSubmissions);
 
+let searchTimer = null;
+filterSearch.addEventListener('input', () => {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(loadSubmissions, 250);
+});
+
+// ── Export ─────────────────────────────────────────────────────────────────
+// Exports what the Submissions tab shows: the same filters, or the same
+// search (which, like the list, ignores the processed and moderation filters)
+exportBtn.addEventListener('click', () => {
+    const query  = filterSearch.value.trim();
+    const params = new URLSearchParams({ format: 'csv' });
+    if (filterDistrict.value) params.set('district', filterDistrict.value);
+    if (filterSeverity.value) params.set('severity', filterSeverity.value);
+    params.set('include_archive', filterProcessed.value === 'archive' ? 'true' : 'false');
+    if (query) {
+        params.set('q', query);
+    } else {
+        if (filterProcessed.value && filterProcessed.value !== 'archive') params.set('processed', filterProcessed.value);
+        if (filterMod.value) params.set('mod_status', filterMod.value);
+    }
+    const a = document.createElement('a');
+    a.href = `/api/submissions/export?${params}`;
+    document.body.appendChild(a);
+    a.click();
+    document.body.removeChild(a);
+});
+
 // ── Generate Report ────────────────────────────────────────────────────────
-generateBtn.addEventListener('click', async () => {
+// resumeId continues a failed run from its last checkpoint instead of
+// claiming a new batch.
+async function runGeneration(resumeId = null) {
     clearLog();
     currentReport = null;
+    currentRunId = null;
+    streamedReport = '';
     saveBtn.disabled = true;
+    resumeBtn.classList.add('hidden');
     generateBtn.disabled = true;
     generateBtn.innerHTML = '<span class="btn-icon">⏳</span> Generating…';
     reportContent.innerHTML = '<div class="placeholder-text"><div class="placeholder-icon">⏳</div><div>Generating report…</div></div>';
@@ -334,7 +528,8 @@ generateBtn.addEventListener('click', async () => {
     document.getElementById('tab-report').classList.add('active');
 
     try {
-        const response = await fetch('/api/generate', {
+        const url = resumeId ? `/api/generate?resume=${encodeURIComponent(resumeId)}` : '/api/generate';
+        const response = await fetch(url, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({}),
@@ -368,13 +563,23 @@ generateBtn.addEventListener('click', async () => {
         if (err.name === 'AbortError') return;
         addLog(`Connection error: ${err.message}`, 'error');
         setStatus('Error', 'error');
+        if (currentRunId && !currentReport) offerResume(currentRunId);
         showModal('Connection Error', err.message, 'error');
     } finally {
         stopElapsed();
         generateBtn.disabled = false;
         generateBtn.innerHTML = '<span class="btn-icon">▶</span> Generate Report';
     }
-});
+}
+
+function offerResume(runId) {
+    resumeBtn.dataset.runId = runId;
+    resumeBtn.classList.remove('hidden');
+    addLog(`Run ${runId.slice(0, 8)} was checkpointed — use Resume Run to continue it.`, 'info');
+}
+
+generateBtn.addEventListener('click', () => runGeneration());
+resumeBtn.addEventListener('click', () => runGeneration(resumeBtn.dataset.runId));
 
 // ── SSE Event Handler ──────────────────────────────────────────────────────
 function handleEvent(event) {
@@ -390,7 +595,19 @@ function handleEvent(event) {
             if (event.total   != null) totalCount.textContent   = event.total.toLocaleString();
             break;
 
+        case 'run':
+            currentRunId = event.run_id;
+            break;
+
+        case 'report_delta':
+            if (!streamedReport) setStatus('Writing report', 'processing');
+            streamedReport += event.content;
+            if (!streamFrame) streamFrame = requestAnimationFrame(renderStreamingReport);
+            break;
+
         case 'report':
+            if (streamFrame) cancelAnimationFrame(streamFrame);
+            streamFrame = null;
             currentReport = event.content;
             renderReport(currentReport);
             saveBtn.disabled = false;
@@ -402,6 +619,7 @@ function handleEvent(event) {
         case 'error':
             addLog(event.message, 'error');
             setStatus('Error', 'error');
+            if (event.run_id) offerResume(event.run_id);
             showModal('Error', event.message, 'error');
             generateBtn.disabled = false;
             generateBtn.innerHTML = '<span class="btn-icon">▶</span> Generate Report';
@@ -473,6 +691,11 @@ function escHtml(str) {
         .replace(/>/g,'&gt;').replace(/"/g,'&quot;');
 }
 
+// Search results mark matches with \x02 … \x03 — escape first, then wrap in <mark>
+function highlightHtml(str) {
+    return escHtml(str).replace(/\x02/g, '<mark>').replace(/\x03/g, '</mark>');
+}
+
 function formatTimeAgo(isoString) {
     if (!isoString) return '—';
     const diff = Math.floor((Date.now() - new Date(isoString)) / 1000);
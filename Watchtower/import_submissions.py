@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+AlohaAI Watchtower — Bulk Submission Importer
+Loads archived comment dumps and exports into the submissions table for
+replaying past events and benchmarking. Files are stream-parsed, so size is
+limited by disk, not memory.
+
+Accepts a JSON array (Graph API comment dumps such as comments321.json),
+NDJSON (our own /api/submissions/export output) or prototype run outputs.
+
+Usage:
+  python import_submissions.py "../Scripts/Graph API/comments321.json"
+  python import_submissions.py event_2018.ndjson --processed
+  python import_submissions.py dump1.json dump2.ndjson --batch-size 100000
+"""
+
+import sys
+import time
+import argparse
+
+# Make sure we can import from the backend package
+sys.path.insert(0, "/var/www/HVERI-AlohaAI-Watchtower/watchtower")
+
+from backend.db import DatabaseManager
+from backend.import_export import iter_import_file
+
+db = DatabaseManager()
+
+
+def import_file(path: str, processed: bool, batch_size: int):
+    started = time.perf_counter()
+    skipped = [0]
+
+    def progress(done: int):
+        rate = done / max(time.perf_counter() - started, 1e-9)
+        print(f"\r   {done:>12,} rows  ({rate:,.0f}/s)", end="", flush=True)
+
+    with open(path, encoding="utf-8") as fp:
+        total = db.bulk_import(
+            iter_import_file(fp, skipped),
+            processed=processed,
+            batch_size=batch_size,
+            progress_callback=progress,
+        )
+
+    elapsed = time.perf_counter() - started
+    print(f"\n✅ {path}: imported {total:,} submission(s) in {elapsed:.1f}s", end="")
+    print(f", skipped {skipped[0]:,} unusable record(s)" if skipped[0] else "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-import archived submissions into AlohaAI Watchtower.")
+    parser.add_argument("files", nargs="+", help="JSON / NDJSON dump files")
+    parser.add_argument("--processed", action="store_true",
+                        help="import as already processed (history only, not sent to the next report)")
+    parser.add_argument("--batch-size", type=int, default=50_000,
+                        help="rows per transaction (default 50000)")
+    args = parser.parse_args()
+
+    print()
+    for path in args.files:
+        try:
+            import_file(path, args.processed, args.batch_size)
+        except (OSError, ValueError) as e:
+            print(f"\nERROR: {path}: {e}")
+            sys.exit(1)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -19,7 +19,7 @@ import string
 sys.path.insert(0, "/var/www/HVERI-AlohaAI-Watchtower/watchtower")
 
 from passlib.context import CryptContext
-from backend.watchtower import DatabaseManager
+from backend.db import DatabaseManager
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 db = DatabaseManager()
@@ -0,0 +1,119 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.db import AsyncDatabaseManager, DatabaseManager
+from backend.reports import EmergencyReportGenerator
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DatabaseManager(tmp_path / "watchtower.db")
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def adb(db):
+    manager = AsyncDatabaseManager(db)
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def api(db, adb, monkeypatch):
+    """A client for the FastAPI app on the test database, signed in as an admin."""
+    try:
+        from fastapi.testclient import TestClient
+        from backend import main
+    except (ImportError, OSError) as e:  # web stack, or WeasyPrint's system libraries, not installed
+        pytest.skip(f"backend.main unavailable: {e}")
+
+    async def admin(request):
+        return {"id": 1, "username": "test", "email": "test@example.com", "must_change_password": 0}
+
+    monkeypatch.setattr(main, "db", db)
+    monkeypatch.setattr(main, "adb", adb)
+    monkeypatch.setattr(main, "require_admin", admin)
+    return TestClient(main.app)
+
+
+def make_submission(i: int = 0, **fields) -> dict:
+    """A plausible citizen report; override any field by keyword."""
+    return {
+        "ref_code": f"HI-T{i:05d}",
+        "incident_type": "lava",
+        "district": "Puna",
+        "location": "Leilani Estates",
+        "description": f"Lava crossing Pohoiki Road near house {i}, smoke everywhere",
+        "severity": "medium",
+        **fields,
+    }
+
+
+class FakeClaude:
+    """
+    Stand-in for anthropic.Anthropic (or AsyncAnthropic with asynchronous=True).
+    Each request is recorded in `requests` as (kind, prompt), kind being
+    "map", "combine" or "context". While `fail[kind]` holds an exception,
+    requests of that kind raise it instead of answering; a list of
+    exceptions is raised one per request until it runs out.
+    """
+
+    REPLIES = {"map": "=== Puna ===\nLava on Pohoiki Road", "combine": "REPORT", "context": "CONTEXT"}
+
+    def __init__(self, asynchronous: bool = False):
+        self.requests = []
+        self.fail = {}
+        if asynchronous:
+            self.messages = SimpleNamespace(create=self._create_async, stream=self._stream_async)
+        else:
+            self.messages = SimpleNamespace(create=self._create, stream=None)
+
+    def count(self, kind: str) -> int:
+        return sum(1 for k, _ in self.requests if k == kind)
+
+    def _answer(self, params: dict) -> SimpleNamespace:
+        system = params.get("system", [{}])[0].get("text")
+        kind = {EmergencyReportGenerator.MAP_SYSTEM: "map"}.get(system, "combine" if system else "context")
+        self.requests.append((kind, params["messages"][0]["content"]))
+        failure = self.fail.get(kind)
+        if isinstance(failure, list):
+            failure = failure.pop(0) if failure else None
+        if failure:
+            raise failure
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=self.REPLIES[kind])],
+            usage=SimpleNamespace(input_tokens=100, output_tokens=20),
+            stop_reason="end_turn",
+        )
+
+    def _create(self, **params):
+        return self._answer(params)
+
+    async def _create_async(self, **params):
+        return self._answer(params)
+
+    def _stream_async(self, **params):
+        fake = self
+
+        class Stream:
+            async def __aenter__(self):
+                self.message = fake._answer(params)
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            @property
+            async def text_stream(self):
+                yield self.message.content[0].text
+
+            async def get_final_message(self):
+                return self.message
+
+        return Stream()
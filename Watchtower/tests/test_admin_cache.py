@@ -0,0 +1,53 @@
+from backend.db import DatabaseManager
+
+
+def counting_lookups(db, monkeypatch):
+    calls = []
+    lookup = db.get_admin_by_id
+    monkeypatch.setattr(db, "get_admin_by_id", lambda admin_id: calls.append(admin_id) or lookup(admin_id))
+    return calls
+
+
+def test_cached_admin_is_served_without_a_query(db, monkeypatch):
+    admin_id = db.create_admin("kainoa", "kainoa@example.com", "hash-1")
+    calls = counting_lookups(db, monkeypatch)
+    assert db.get_cached_admin(admin_id) is None
+    assert db.get_admin_by_id_cached(admin_id)["password_hash"] == "hash-1"
+    assert db.get_admin_by_id_cached(admin_id)["username"] == "kainoa"
+    assert calls == [admin_id]
+
+    db.get_cached_admin(admin_id)["username"] = "changed"  # callers get a copy
+    assert db.get_cached_admin(admin_id)["username"] == "kainoa"
+
+
+def test_entries_expire_after_their_ttl(db, monkeypatch):
+    admin_id = db.create_admin("kainoa", "kainoa@example.com", "hash-1")
+    calls = counting_lookups(db, monkeypatch)
+    db.get_admin_by_id_cached(admin_id, ttl=-1)
+    assert db.get_cached_admin(admin_id) is None
+    db.get_admin_by_id_cached(admin_id)
+    assert calls == [admin_id, admin_id]
+
+
+def test_a_password_change_in_another_process_invalidates_the_cache(db, tmp_path):
+    admin_id = db.create_admin("kainoa", "kainoa@example.com", "hash-1")
+    db.get_admin_by_id_cached(admin_id)
+    other = DatabaseManager(tmp_path / "watchtower.db")  # same files, as another worker would open them
+    try:
+        other.update_password(admin_id, "hash-2", must_change=1)
+    finally:
+        other.close()
+    assert db.get_cached_admin(admin_id) is None
+    admin = db.get_admin_by_id_cached(admin_id)
+    assert (admin["password_hash"], admin["must_change_password"]) == ("hash-2", 1)
+
+
+def test_deleted_admins_are_not_served_from_the_cache(db):
+    keep = db.create_admin("keep", "keep@example.com", "hash")
+    gone = db.create_admin("gone", "gone@example.com", "hash")
+    db.get_admin_by_id_cached(keep)
+    db.get_admin_by_id_cached(gone)
+    assert db.delete_admin(gone)
+    assert db.get_cached_admin(gone) is None and db.get_admin_by_id_cached(gone) is None
+    assert db.get_admin_by_id_cached(keep)["username"] == "keep"
+    assert not db.delete_admin(gone)
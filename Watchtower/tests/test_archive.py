@@ -0,0 +1,54 @@
+import sqlite3
+
+import pytest
+
+from conftest import make_submission
+
+
+def process(db, n):
+    db.insert_submissions([make_submission(i, timestamp=f"2018-05-03T10:00:{i:02d}Z") for i in range(n)])
+    batch_id, _ = db.claim_pending()
+    db.complete_batch(batch_id)
+
+
+def archive_index_size(db) -> int:
+    conn = db._connect()
+    # Raises if the index disagrees with archive.submissions
+    conn.execute("INSERT INTO archive.submissions_fts (submissions_fts) VALUES ('integrity-check')")
+    return conn.execute("SELECT COUNT(*) FROM archive.submissions_fts_docsize").fetchone()[0]
+
+
+def test_archived_rows_leave_the_hot_table_and_stay_searchable(db):
+    process(db, 3)
+    db.insert_submission(make_submission(9, timestamp="2018-05-03T11:00:00Z"))  # pending: stays
+
+    assert db.archive_processed(older_than_hours=0) == 3
+    assert db.get_counts() == {"pending": 1, "flagged": 0, "total": 4, "archived": 3}
+    assert archive_index_size(db) == 3
+    assert len(db.search("Pohoiki")["submissions"]) == 1
+    assert len(db.search("Pohoiki", include_archive=True)["submissions"]) == 4
+    assert db.archive_processed(older_than_hours=0) == 0
+
+
+def test_rerun_after_an_interrupted_move_keeps_the_archive_index_consistent(db):
+    process(db, 3)
+    conn = db._connect()
+    # Crash after the archive copy commits, before the hot rows are deleted
+    conn.execute("CREATE TRIGGER main.crash BEFORE DELETE ON submissions BEGIN SELECT RAISE(ABORT, 'crash'); END")
+    conn.commit()
+    with pytest.raises(sqlite3.DatabaseError):
+        db.archive_processed(older_than_hours=0)
+    conn.execute("DROP TRIGGER main.crash")
+    conn.commit()
+    assert conn.execute("SELECT COUNT(*) FROM archive.submissions").fetchone()[0] == 3
+    assert db.get_counts()["archived"] == 0
+    # The hot copy is corrected before the rerun; the archive must follow it
+    conn.execute("UPDATE main.submissions SET description = 'Lava crossing Kapoho Road' WHERE id = 1")
+    conn.commit()
+
+    assert db.archive_processed(older_than_hours=0) == 3
+    assert conn.execute("SELECT COUNT(*) FROM main.submissions").fetchone()[0] == 0
+    assert db.get_counts()["archived"] == 3
+    assert archive_index_size(db) == 3
+    assert len(db.search("Pohoiki", include_archive=True)["submissions"]) == 2
+    assert [r["id"] for r in db.search("Kapoho", include_archive=True)["submissions"]] == [1]
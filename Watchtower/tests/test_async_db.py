@@ -0,0 +1,44 @@
+import asyncio
+import threading
+
+from backend.db import DatabaseManager, ResponseCache
+from backend.local_filters import SpamFilter
+from conftest import make_submission
+
+
+def test_methods_run_on_the_db_pool(db, adb, monkeypatch):
+    threads = []
+    get_counts = DatabaseManager.get_counts
+    monkeypatch.setattr(
+        DatabaseManager, "get_counts",
+        lambda self: threads.append(threading.current_thread().name) or get_counts(self),
+    )
+    db.insert_submission(make_submission(1))
+
+    async def counts():
+        return await adb.get_counts()
+
+    assert asyncio.run(counts())["pending"] == 1
+    assert threads[0].startswith("db")
+
+
+def test_properties_are_resolved_on_the_db_pool(db, adb, monkeypatch):
+    threads = []
+    spam_filter = DatabaseManager.spam_filter
+    monkeypatch.setattr(
+        DatabaseManager, "spam_filter",
+        property(lambda self: threads.append(threading.current_thread().name) or spam_filter.fget(self)),
+    )
+
+    async def resolve():
+        return await adb.spam_filter, await adb.llm_cache, await adb.llm_cache
+
+    spam, cache, again = asyncio.run(resolve())
+    assert isinstance(spam, SpamFilter) and threads[0].startswith("db")
+    # Still an awaitable once the cached_property holds its value
+    assert isinstance(cache, ResponseCache) and again is cache
+
+
+def test_plain_attributes_pass_through(db, adb):
+    assert adb.db_path == db.db_path
+    assert adb.db is db
@@ -0,0 +1,115 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.reports import EmergencyReportGenerator
+from conftest import FakeClaude, make_submission
+
+
+def age_lease(db, batch_id, seconds):
+    """Pretend batch `batch_id` was claimed (or last renewed) `seconds` ago."""
+    then = (datetime.now(timezone.utc) - timedelta(seconds=seconds)).isoformat()
+    with db._connect() as conn:
+        conn.execute("UPDATE submissions SET claimed_at = ? WHERE batch_id = ?", (then, batch_id))
+        conn.commit()
+
+
+def test_claims_are_disjoint_and_oldest_first(db):
+    db.insert_submissions([make_submission(i, timestamp=f"2018-05-03T10:00:{i:02d}Z") for i in range(5)])
+    first, rows_a = db.claim_pending(limit=3)
+    second, rows_b = db.claim_pending(limit=3)
+    assert [r["ref_code"] for r in rows_a] == ["HI-T00000", "HI-T00001", "HI-T00002"]
+    assert [r["ref_code"] for r in rows_b] == ["HI-T00003", "HI-T00004"]
+    assert first != second
+    assert db.claim_pending() == (None, [])
+
+
+def test_expired_lease_is_reclaimed(db):
+    db.insert_submissions([make_submission(i) for i in range(3)])
+    stalled, rows = db.claim_pending(lease_seconds=60)
+    assert db.claim_pending(lease_seconds=60) == (None, [])
+
+    age_lease(db, stalled, 61)
+    taken_over, retaken = db.claim_pending(lease_seconds=60)
+    assert [r["id"] for r in retaken] == [r["id"] for r in rows]
+
+    # The stalled run finishing late must not mark the new run's rows
+    assert db.complete_batch(stalled) == 0
+    assert db.complete_batch(taken_over) == 3
+    assert db.get_counts()["pending"] == 0
+
+
+def test_renewed_lease_is_not_reclaimed(db):
+    db.insert_submissions([make_submission(i) for i in range(2)])
+    batch_id, _ = db.claim_pending(lease_seconds=60)
+    age_lease(db, batch_id, 61)
+    db.renew_lease(batch_id)
+    assert db.claim_pending(lease_seconds=60) == (None, [])
+
+
+def test_released_batch_returns_to_the_pool(db):
+    db.insert_submissions([make_submission(i) for i in range(2)])
+    batch_id, rows = db.claim_pending()
+    db.release_batch(batch_id)
+    _, again = db.claim_pending()
+    assert [r["id"] for r in again] == [r["id"] for r in rows]
+
+
+def test_concurrent_claims_never_overlap(db):
+    db.insert_submissions([make_submission(i) for i in range(200)])
+    claimed, lock = [], threading.Lock()
+
+    def worker():
+        while True:
+            _, rows = db.claim_pending(limit=7)
+            if not rows:
+                return
+            with lock:
+                claimed.extend(r["id"] for r in rows)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(claimed) == len(set(claimed)) == 200
+
+
+def sync_generator(db, client):
+    generator = EmergencyReportGenerator(db, use_cache=False)
+    generator.claude_client = client
+    return generator
+
+
+def test_report_completes_its_batch_and_run(db):
+    db.insert_submissions([make_submission(i) for i in range(3)])
+    batch_id, rows = db.claim_pending()
+    generator = sync_generator(db, FakeClaude())
+    assert generator.generate_report(rows, batch_id=batch_id) == "REPORT"
+    generator.wait_for_context()
+
+    run = db.get_run(batch_id)
+    assert (run["status"], run["stage"], run["report_id"]) == ("complete", "complete", generator.last_report_id)
+    assert db.get_counts()["pending"] == 0
+
+
+@pytest.mark.parametrize("failure", ["empty report", "error"])
+def test_failed_report_releases_its_batch_and_fails_the_run(db, failure):
+    db.insert_submissions([make_submission(i) for i in range(3)])
+    batch_id, rows = db.claim_pending()
+    client = FakeClaude()
+    generator = sync_generator(db, client)
+    if failure == "empty report":
+        client.REPLIES = {**FakeClaude.REPLIES, "combine": ""}
+        assert generator.generate_report(rows, batch_id=batch_id) is None
+    else:
+        client.fail["combine"] = RuntimeError("overloaded")
+        with pytest.raises(Exception, match="overloaded"):
+            generator.generate_report(rows, batch_id=batch_id)
+
+    run = db.get_run(batch_id)
+    assert (run["status"], run["stage"]) == ("failed", "mapped")
+    # The rows are back in the pool at once, not after the lease expires
+    _, again = db.claim_pending()
+    assert [r["id"] for r in again] == [r["id"] for r in rows]
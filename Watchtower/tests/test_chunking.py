@@ -0,0 +1,82 @@
+import math
+import random
+import re
+
+import pytest
+
+from backend.reports import EmergencyReportGenerator, estimate_tokens
+from conftest import make_submission
+
+DISTRICTS = ["Puna", "South Hilo", "Ka'u", "North Kona", "Hamakua"]
+
+
+@pytest.fixture
+def generator(db):
+    return EmergencyReportGenerator(db, use_cache=False)
+
+
+def reports(n, seed=3):
+    rng = random.Random(seed)
+    return [
+        make_submission(i, district=rng.choice(DISTRICTS), description="ash " * rng.randint(5, 120))
+        for i in range(n)
+    ]
+
+
+def records(chunk):
+    """(district, ref) for every whole record in a chunk, checking each sits under its header."""
+    found, district = [], None
+    for block in re.split(r"\n(?=\n=== |  REF: )", chunk):
+        header = re.match(r"\s*=== (.+) ===", block)
+        if header:
+            district = header.group(1)
+            block = block[header.end():]
+        if "REF:" in block:
+            assert district is not None
+            assert re.search(r"  REF: (\S+)\n(.*\n)*  Submitted: ", block), "record split across chunks"
+            found.append((district, re.search(r"REF: (\S+)", block).group(1)))
+    return found
+
+
+@pytest.mark.parametrize("budget", [300, 800, 4000])
+def test_chunks_fit_the_budget_and_keep_every_record_whole(generator, budget):
+    subs = reports(60)
+    chunks = list(generator.chunk_submissions(subs, max_tokens=budget))
+    assert all(estimate_tokens(c) <= budget for c in chunks)
+
+    placed = [r for c in chunks for r in records(c)]
+    assert sorted(ref for _, ref in placed) == sorted(s["ref_code"] for s in subs)
+    districts = {s["ref_code"]: s["district"] for s in subs}
+    assert all(districts[ref] == d for d, ref in placed)
+
+
+def test_chunks_are_packed_close_to_the_minimum(generator):
+    subs = reports(60)
+    budget = 800
+    whole = estimate_tokens(generator.format_submissions(subs))
+    chunks = list(generator.chunk_submissions(subs, max_tokens=budget))
+    assert len(chunks) <= math.ceil(whole / budget) + 1
+
+
+def test_a_district_that_fits_one_chunk_spans_at_most_two(generator):
+    subs = reports(60)
+    chunks = list(generator.chunk_submissions(subs, max_tokens=800))
+    spans = {}
+    for i, chunk in enumerate(chunks):
+        for district, _ in records(chunk):
+            spans.setdefault(district, set()).add(i)
+    sizes = {d: estimate_tokens(generator.format_submissions([s for s in subs if s["district"] == d])) for d in spans}
+    for district, chunk_ids in spans.items():
+        if sizes[district] <= 800:
+            assert len(chunk_ids) <= 2
+
+
+def test_an_oversized_record_is_trimmed_to_fit(generator):
+    huge = make_submission(1, description="lava " * 2000)
+    (chunk,) = generator.chunk_submissions([huge], max_tokens=300)
+    assert estimate_tokens(chunk) <= 300
+    assert "…[truncated]" in chunk and "HI-T00001" in chunk
+
+
+def test_no_submissions_means_no_chunks(generator):
+    assert list(generator.chunk_submissions([])) == []
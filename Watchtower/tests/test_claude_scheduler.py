@@ -0,0 +1,181 @@
+import asyncio
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import anthropic
+import httpx
+import pytest
+
+import backend.scheduler
+from backend.reports import AsyncEmergencyReportGenerator, EmergencyReportGenerator
+from backend.scheduler import CLAUDE_BACKOFF_MAX, ClaudeScheduler, SharedTokenBuckets
+from conftest import FakeClaude
+
+
+class StatusError(Exception):
+    """An API error with a status code and, optionally, a retry-after header."""
+
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers={"retry-after": retry_after} if retry_after else {})
+
+
+def connection_error():
+    return anthropic.APIConnectionError(request=httpx.Request("POST", "https://api.anthropic.com/v1/messages"))
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (StatusError(429), True),
+    (StatusError(529), True),
+    (StatusError(500), True),
+    (StatusError(408), True),
+    (StatusError(400), False),
+    (StatusError(401), False),
+    (connection_error(), True),
+    (ValueError("bad prompt"), False),
+])
+def test_retryable(error, retryable):
+    assert ClaudeScheduler.retryable(error) is retryable
+
+
+def test_backoff_doubles_with_jitter_and_is_capped():
+    random.seed(3)
+    scheduler = ClaudeScheduler(max_retries=20)
+    for attempt in range(12):
+        backoff = min(CLAUDE_BACKOFF_MAX, backend.scheduler.CLAUDE_BACKOFF_BASE * 2 ** attempt)
+        delays = [scheduler.retry_delay(attempt, StatusError(529)) for _ in range(50)]
+        assert all(backoff / 2 <= d <= backoff for d in delays)
+        assert len(set(delays)) > 1
+
+
+def test_retry_after_header_sets_the_minimum_delay():
+    scheduler = ClaudeScheduler()
+    assert scheduler.retry_delay(0, StatusError(429, retry_after="30")) == 30.0
+
+
+def test_gives_up_after_max_retries_or_on_permanent_errors():
+    scheduler = ClaudeScheduler(max_retries=2)
+    assert scheduler.retry_delay(1, StatusError(529)) is not None
+    assert scheduler.retry_delay(2, StatusError(529)) is None
+    assert scheduler.retry_delay(0, StatusError(400)) is None
+
+
+def test_overload_halves_the_limit_once_per_congestion_event():
+    scheduler = ClaudeScheduler(max_concurrency=8)
+    admissions = [scheduler.acquire(10) for _ in range(3)]
+    for admission in admissions:
+        scheduler.release(admission, error=StatusError(429))
+    assert scheduler.limit == 4.0  # the three calls were in flight together: one cut
+
+    scheduler.release(scheduler.acquire(10), error=StatusError(529))
+    assert scheduler.limit == 2.0
+    scheduler.release(scheduler.acquire(10), message=SimpleNamespace(usage=None))
+    assert scheduler.limit == 2.5
+    assert scheduler.in_flight == 0
+
+
+def test_acquire_waits_for_a_free_slot():
+    scheduler = ClaudeScheduler(max_concurrency=1)
+    first = scheduler.acquire(10)
+    admitted = threading.Event()
+    waiter = threading.Thread(target=lambda: admitted.set() if scheduler.acquire(10) else None)
+    waiter.start()
+    assert not admitted.wait(0.1)
+    scheduler.release(first, message=SimpleNamespace(usage=None))
+    assert admitted.wait(1)
+    waiter.join()
+
+
+def test_token_buckets_hold_back_calls_over_the_rate(tmp_path):
+    buckets = SharedTokenBuckets(tmp_path / "limits", rpm=60, tpm=1000)
+    assert buckets.take(600) == 0
+    assert buckets.take(600) == pytest.approx(12, abs=0.5)   # 200 tokens short at 1000/min
+    shared = SharedTokenBuckets(tmp_path / "limits", rpm=60, tpm=1000)
+    shared.cool_down(5)
+    assert buckets.take(1) >= 4.5
+
+
+@pytest.mark.skipif(backend.scheduler.fcntl is None, reason="flock is POSIX only")
+def test_a_held_lock_never_blocks_and_deferred_updates_land(tmp_path):
+    path = tmp_path / "limits"
+    buckets = SharedTokenBuckets(path, rpm=60, tpm=1000)
+    assert buckets.take(500) == 0
+    with open(path, "rb+") as other_process:
+        backend.scheduler.fcntl.flock(other_process, backend.scheduler.fcntl.LOCK_EX)
+        started = time.monotonic()
+        assert buckets.take(100) == SharedTokenBuckets.BUSY_SECONDS
+        buckets.settle(-400)  # the call used 400 fewer tokens than estimated
+        buckets.cool_down(5)
+        assert time.monotonic() - started < 0.1
+        backend.scheduler.fcntl.flock(other_process, backend.scheduler.fcntl.LOCK_UN)
+
+    assert buckets.take(1) >= 4.5  # the deferred cool-down
+    with buckets._state() as state:
+        assert state[1] == pytest.approx(900, abs=1)  # and the deferred refund
+
+    buckets.close()
+    buckets.close()
+    assert buckets._file.closed and buckets._mm.closed
+
+
+@pytest.fixture
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(backend.scheduler, "CLAUDE_BACKOFF_BASE", 0.001)
+
+
+def generator(cls, db, client):
+    gen = cls(db, use_cache=False)
+    gen.scheduler = ClaudeScheduler()  # not the process-wide one, so limits start fresh
+    gen.claude_client = client
+    return gen
+
+
+def test_call_is_retried_until_it_succeeds(db, fast_backoff):
+    client = FakeClaude()
+    client.fail["context"] = [StatusError(529), connection_error()]
+    gen = generator(EmergencyReportGenerator, db, client)
+    assert gen.call_claude("Summarise") == "CONTEXT"
+    assert client.count("context") == 3
+    assert gen.scheduling["retries"] == 2
+    assert gen.scheduler.in_flight == 0
+
+
+def test_permanent_error_is_not_retried(db, fast_backoff):
+    client = FakeClaude()
+    client.fail["context"] = StatusError(400)
+    gen = generator(EmergencyReportGenerator, db, client)
+    with pytest.raises(Exception, match="status 400"):
+        gen.call_claude("Summarise")
+    assert client.count("context") == 1
+    assert gen.scheduler.in_flight == 0
+
+
+def test_async_calls_and_streams_are_retried(adb, fast_backoff):
+    client = FakeClaude(asynchronous=True)
+    client.fail["context"] = [StatusError(529)]
+    client.fail["combine"] = [StatusError(500), StatusError(529)]
+    gen = generator(AsyncEmergencyReportGenerator, adb, client)
+
+    async def run():
+        summary = await gen.call_claude("Summarise")
+        report = "".join([d async for d in gen.stream_claude("Report", system=gen.COMBINE_SYSTEM)])
+        return summary, report
+
+    assert asyncio.run(run()) == ("CONTEXT", "REPORT")
+    assert (client.count("context"), client.count("combine")) == (2, 3)
+    assert gen.scheduling["retries"] == 3
+    assert gen.scheduler.in_flight == 0
+
+
+def test_schedulers_are_shared_per_path_and_closed_at_shutdown(tmp_path, monkeypatch):
+    monkeypatch.setattr(backend.scheduler, "CLAUDE_RPM", 60)
+    scheduler = backend.scheduler.claude_scheduler(tmp_path / "limits")
+    assert backend.scheduler.claude_scheduler(tmp_path / "limits") is scheduler
+
+    backend.scheduler.close_claude_schedulers()
+    assert scheduler.buckets._file.closed
+    assert backend.scheduler.claude_scheduler(tmp_path / "limits") is not scheduler
+    backend.scheduler.close_claude_schedulers()
@@ -0,0 +1,36 @@
+import threading
+
+import pytest
+
+from backend.db import ConnectionPool
+from conftest import make_submission
+
+
+def test_each_thread_reuses_its_own_wal_connection(tmp_path):
+    pool = ConnectionPool(tmp_path / "pool.db", synchronous="normal")
+    conn = pool.get()
+    assert pool.get() is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+    others = []
+    thread = threading.Thread(target=lambda: others.append(pool.get()))
+    thread.start()
+    thread.join()
+    assert others[0] is not conn
+    pool.close_all()
+    assert pool.get() is not conn
+
+
+def test_unknown_synchronous_level_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ConnectionPool(tmp_path / "pool.db", synchronous="sometimes")
+
+
+def test_writes_on_one_thread_are_visible_to_another(db):
+    db.insert_submission(make_submission(1))
+    counts = []
+    thread = threading.Thread(target=lambda: counts.append(db.get_counts()["total"]))
+    thread.start()
+    thread.join()
+    assert counts == [1]
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+
+from backend.reports import AsyncEmergencyReportGenerator, EmergencyReportGenerator
+from conftest import FakeClaude, make_submission
+
+
+def test_sync_wait_gives_up_after_timeout(monkeypatch):
+    release = threading.Event()
+    with ThreadPoolExecutor(1) as pool:
+        monkeypatch.setattr(EmergencyReportGenerator, "context_future", pool.submit(release.wait))
+        EmergencyReportGenerator.wait_for_context(None, timeout=0.05)
+        release.set()
+
+
+def new_generator(adb, client):
+    generator = AsyncEmergencyReportGenerator(adb, use_cache=False)
+    generator.claude_client = client
+    return generator
+
+
+def test_summary_survives_a_disconnect_at_the_report_event(db, adb):
+    for i in range(3):
+        db.insert_submission(make_submission(i))
+    client = FakeClaude(asynchronous=True)
+
+    async def generate():
+        batch_id, rows = await adb.claim_pending()
+        async with aclosing(new_generator(adb, client).generate_events(rows, batch_id=batch_id)) as events:
+            async for event in events:
+                if event["type"] == "report":
+                    break  # the client goes away as soon as it has the report
+        await AsyncEmergencyReportGenerator.drain_context_tasks()
+        return batch_id
+
+    run = db.get_run(asyncio.run(generate()))
+    assert (run["status"], run["stage"], run["context_summary"]) == ("complete", "complete", "CONTEXT")
+    assert db.get_latest_context() == "CONTEXT"
+
+
+def test_run_that_failed_at_its_summary_resumes_with_only_the_summary(db, adb):
+    for i in range(3):
+        db.insert_submission(make_submission(i))
+    client = FakeClaude(asynchronous=True)
+    client.fail["context"] = RuntimeError("overloaded")
+
+    async def generate(rows, batch_id, run=None):
+        events = [e async for e in new_generator(adb, client).generate_events(rows, batch_id=batch_id, run=run)]
+        await AsyncEmergencyReportGenerator.drain_context_tasks()
+        return events
+
+    batch_id, rows = db.claim_pending()
+    first = asyncio.run(generate(rows, batch_id))
+    run = db.get_run(batch_id)
+    assert (run["status"], run["stage"]) == ("failed", "stored")
+    assert db.get_counts()["pending"] == 0
+
+    # Its rows are processed, and may be archived, by the time it is resumed
+    assert db.archive_processed(older_than_hours=0) == 3
+    client.fail.clear()
+    calls_before = len(client.requests)
+    resumed_rows = db.claim_run(batch_id)
+    assert [r["id"] for r in resumed_rows] == [r["id"] for r in rows]
+    resumed = asyncio.run(generate(resumed_rows, batch_id, db.get_run(batch_id)))
+
+    assert [kind for kind, _ in client.requests[calls_before:]] == ["context"]
+    report_ids = [e["report_id"] for e in first + resumed if e["type"] == "report"]
+    assert len(report_ids) == 2 and report_ids[0] == report_ids[1]
+    run = db.get_run(batch_id)
+    assert (run["status"], run["stage"]) == ("complete", "complete")
+    assert db.get_latest_context() == "CONTEXT"
+    assert db.claim_run(batch_id) is None
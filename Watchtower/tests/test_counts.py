@@ -0,0 +1,62 @@
+from conftest import make_submission
+
+
+def recount(db):
+    """The counts get_counts() should report, computed from the rows themselves."""
+    conn = db._connect()
+    hot = conn.execute("""
+        SELECT COALESCE(SUM(processed = 0 AND mod_status NOT IN ('flagged', 'spam')), 0),
+               COALESCE(SUM(processed = 0 AND mod_status IN ('flagged', 'spam')), 0),
+               COUNT(*)
+        FROM main.submissions
+    """).fetchone()
+    archived = conn.execute("SELECT COUNT(*) FROM archive.submissions").fetchone()[0]
+    return {"pending": hot[0], "flagged": hot[1], "total": hot[2] + archived, "archived": archived}
+
+
+def test_counts_follow_inserts_and_deletes(db):
+    ids = db.insert_submissions([make_submission(i) for i in range(5)])
+    db.insert_submission(make_submission(
+        5, district="South Hilo", location="Keaukaha", description="Ash fall on cars", severity="high",
+    ))
+    assert db.get_counts() == recount(db) == {"pending": 6, "flagged": 0, "total": 6, "archived": 0}
+
+    assert db.delete_submission(ids[0])
+    assert not db.delete_submission(ids[0])
+    assert db.get_counts() == recount(db)
+    assert db.get_district_counts() == {
+        "Puna": {"pending": 4, "total": 4, "severity": {"medium": 4}},
+        "South Hilo": {"pending": 1, "total": 1, "severity": {"high": 1}},
+    }
+
+
+def test_counts_follow_moderation(db):
+    ids = db.insert_submissions([make_submission(i) for i in range(3)])
+    db.moderate_submission(ids[0], spam=True)
+    assert db.get_counts() == recount(db) == {"pending": 2, "flagged": 0, "total": 3, "archived": 0}
+    assert db.get_district_counts()["Puna"] == {"pending": 2, "total": 3, "severity": {"medium": 2}}
+
+    db.moderate_submission(ids[0], spam=False)
+    assert db.get_counts() == recount(db) == {"pending": 3, "flagged": 0, "total": 3, "archived": 0}
+
+
+def test_counts_follow_processing_archiving_and_archive_deletes(db):
+    ids = db.insert_submissions([make_submission(i, timestamp="2018-05-03T10:00:00Z") for i in range(4)])
+    batch_id, _ = db.claim_pending()
+    db.complete_batch(batch_id)
+    assert db.get_counts() == recount(db) == {"pending": 0, "flagged": 0, "total": 4, "archived": 0}
+
+    db.archive_processed(older_than_hours=0)
+    assert db.get_counts() == recount(db) == {"pending": 0, "flagged": 0, "total": 4, "archived": 4}
+    assert db.delete_submission(ids[1])
+    assert db.get_counts() == recount(db) == {"pending": 0, "flagged": 0, "total": 3, "archived": 3}
+    assert db.get_district_counts() == {"Puna": {"pending": 0, "total": 3, "severity": {}}}
+
+
+def test_rebuild_matches_the_trigger_counts(db):
+    ids = db.insert_submissions([make_submission(i, severity=s) for i, s in enumerate(["low", "high", "high"])])
+    db.moderate_submission(ids[1], spam=True)
+    before = db.get_district_counts()
+    db.rebuild_derived()
+    assert db.get_district_counts() == before
+    assert db.get_counts() == recount(db)
@@ -0,0 +1,81 @@
+import pytest
+
+from backend.local_filters import DuplicateClusterer, dedup_pool, shutdown_dedup_pools
+from conftest import make_submission
+
+
+def report(i, description, **fields):
+    return make_submission(i, description=description, timestamp=f"2018-05-03T10:{i:02d}:00Z", **fields)
+
+
+@pytest.fixture
+def clusterer():
+    return DuplicateClusterer(workers=1)
+
+
+def test_near_duplicates_collapse_into_one_record(clusterer):
+    subs = [
+        report(0, "Lava crossing Pohoiki Road near the school, smoke everywhere", severity="low"),
+        report(1, "Road closed at highway 130 due to fallen trees"),
+        report(2, "Lava crossing Pohoiki Road near the school smoke everywhere!!", severity="high"),
+        report(3, "lava crossing pohoiki road near the school, smoke everywhere, evacuating now",
+               evacuation="Leilani Estates"),
+    ]
+    records = clusterer.collapse(subs)
+
+    assert [r.get("report_count", 1) for r in records] == [3, 1]
+    merged = records[0]
+    assert merged["description"] == subs[3]["description"]  # the most detailed
+    assert merged["severity"] == "high"
+    assert merged["evacuation"] == "Leilani Estates"
+    assert (merged["timestamp"], merged["last_timestamp"]) == (subs[0]["timestamp"], subs[3]["timestamp"])
+    assert merged["member_refs"] == ["HI-T00000", "HI-T00002", "HI-T00003"]
+    assert records[1] is subs[1]
+
+
+def test_same_text_in_other_districts_or_types_is_kept(clusterer):
+    text = "Power lines down across the road, sparks in the grass"
+    subs = [
+        report(0, text, district="Puna"),
+        report(1, text, district="South Hilo"),
+        report(2, text, district="Puna", incident_type="power"),
+    ]
+    assert clusterer.collapse(subs) == subs
+
+
+def test_distinct_reports_are_untouched(clusterer):
+    subs = [
+        report(0, "Flooding on Kamehameha Ave, water over the road"),
+        report(1, "Brush fire spreading toward homes near the ridge"),
+        report(2, "Ash falling in Pahala, air quality very bad, kupuna need help"),
+    ]
+    assert clusterer.collapse(subs) == subs
+
+
+def test_disabled_by_a_zero_threshold():
+    subs = [report(0, "Same report"), report(1, "Same report")]
+    assert DuplicateClusterer(threshold=0).collapse(subs) == subs
+
+
+def test_process_pool_gives_the_same_clusters(monkeypatch):
+    monkeypatch.setattr("backend.local_filters.DEDUP_PARALLEL_MIN", 1)
+    subs = [
+        report(i, f"Smoke from the gulch behind house {i % 3}, flames visible", district=district)
+        for i, district in enumerate(["Puna", "South Hilo", "Ka'u"] * 4)
+    ]
+    serial = DuplicateClusterer(workers=1).cluster(subs)
+    parallel = DuplicateClusterer(workers=2).cluster(subs)
+    assert [[s["ref_code"] for s in c] for c in parallel] == [[s["ref_code"] for s in c] for c in serial]
+    shutdown_dedup_pools()
+
+
+def test_shutdown_stops_the_worker_processes():
+    pool = dedup_pool(2)
+    assert pool.submit(sum, [1, 2]).result() == 3
+    workers = list(pool._processes.values())
+    assert workers and all(p.is_alive() for p in workers)
+
+    shutdown_dedup_pools()
+    assert not any(p.is_alive() for p in workers)
+    assert dedup_pool(2) is not pool  # a later batch starts a fresh pool
+    shutdown_dedup_pools()
@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+
+import pytest
+
+from backend.import_export import EXPORT_COLUMNS, export_submissions
+from conftest import make_submission
+
+
+def seed(db):
+    db.insert_submissions([
+        make_submission(0, timestamp="2018-05-03T10:00:00Z", severity="high"),
+        make_submission(1, timestamp="2018-05-03T11:00:00Z", district="South Hilo", location="Hilo",
+                        description="Wailuku river over the bank"),
+        make_submission(2, timestamp="2018-05-03T12:00:00Z", description="testing 123"),  # flagged
+        make_submission(3, timestamp="2018-05-03T13:00:00Z"),
+    ])
+    batch_id, _ = db.claim_pending(limit=1)
+    db.complete_batch(batch_id)  # HI-T00000 processed
+    db.archive_processed(older_than_hours=0)
+
+
+def refs(rows):
+    return [r["ref_code"] for r in rows]
+
+
+def test_every_format_round_trips_awkward_text(db):
+    db.insert_submissions([
+        make_submission(0, description='Road "closed", lava\nover Pohoiki', reporter_name="Kealoha ʻOhana"),
+        make_submission(1, location=None),
+    ])
+    rows = list(db.iter_submissions())
+
+    exported = list(csv.DictReader(io.StringIO("".join(export_submissions(rows, "csv")))))
+    assert [r["description"] for r in exported] == [r["description"] for r in rows]
+    assert exported[1]["location"] == ""
+
+    lines = "".join(export_submissions(rows, "ndjson")).splitlines()
+    assert [json.loads(line) for line in lines] == rows
+
+    collection = json.loads("".join(export_submissions(rows, "geojson")))
+    assert collection["type"] == "FeatureCollection"
+    assert [f["id"] for f in collection["features"]] == [r["id"] for r in rows]
+    assert collection["features"][0]["geometry"] is None
+    assert collection["features"][0]["properties"]["reporter_name"] == "Kealoha ʻOhana"
+
+
+def test_export_yields_a_chunk_per_flush_and_handles_no_rows(db):
+    db.insert_submissions([make_submission(i) for i in range(5)])
+    chunks = list(export_submissions(db.iter_submissions(), "ndjson", flush_every=2))
+    assert [c.count("\n") for c in chunks] == [2, 2, 1]
+
+    assert "".join(export_submissions([], "csv")).strip() == ",".join(EXPORT_COLUMNS)
+    assert json.loads("".join(export_submissions([], "geojson")))["features"] == []
+    assert list(export_submissions([], "ndjson")) == []
+    with pytest.raises(ValueError):
+        list(export_submissions([], "xlsx"))
+
+
+def test_export_applies_the_submissions_tab_filters(db):
+    seed(db)
+    assert refs(db.iter_submissions()) == ["HI-T00001", "HI-T00002", "HI-T00003"]
+    assert refs(db.iter_submissions(include_archive=True)) == ["HI-T00000", "HI-T00001", "HI-T00002", "HI-T00003"]
+    assert refs(db.iter_submissions(district="Puna", mod_status="pending")) == ["HI-T00003"]
+    assert refs(db.iter_submissions(severity="high", include_archive=True)) == ["HI-T00000"]
+    # Archived rows are processed, so a pending export leaves the archive alone
+    assert refs(db.iter_submissions(processed=0, include_archive=True)) == ["HI-T00001", "HI-T00002", "HI-T00003"]
+    assert refs(db.iter_submissions(processed=1, include_archive=True)) == ["HI-T00000"]
+
+
+def test_export_applies_the_search_query(db):
+    seed(db)
+    assert refs(db.iter_submissions(text="Pohoiki", include_archive=True)) == ["HI-T00000", "HI-T00003"]
+    assert refs(db.iter_submissions(text="wailu")) == ["HI-T00001"]  # prefix, as in search()
+    assert refs(db.iter_submissions(text="Pohoiki", severity="high")) == []
+    assert refs(db.iter_submissions(text="!!")) == []
+
+
+def test_export_endpoint_forwards_query_and_moderation_filter(api, db):
+    seed(db)
+    response = api.get("/api/submissions/export", params={"q": "Pohoiki", "include_archive": "false"})
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [r["ref_code"] for r in rows] == ["HI-T00003"]
+    assert list(rows[0]) == EXPORT_COLUMNS
+
+    response = api.get("/api/submissions/export", params={"mod_status": "flagged"})
+    assert [r["ref_code"] for r in csv.DictReader(io.StringIO(response.text))] == ["HI-T00002"]
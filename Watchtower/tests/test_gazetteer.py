@@ -0,0 +1,52 @@
+import pytest
+
+from backend.local_filters import GAZETTEER_INDEX, fold_place_name
+from conftest import make_submission
+
+
+@pytest.mark.parametrize("text, folded", [
+    ("Kaʻū", "kau"),
+    ("Ka'u", "kau"),
+    ("KAU", "kau"),
+    ("Kailua-Kona!!", "kailua kona"),
+    ("Hawaiʻi’s  big   island", "hawaiis big island"),
+    ("Pāhoa_town", "pahoa town"),
+    ("", ""),
+])
+def test_fold_place_name(text, folded):
+    assert fold_place_name(text) == folded
+
+
+@pytest.mark.parametrize("district, location, description, expected", [
+    ("Puna", "Leilani Estates", "Lava on the road", ("Puna", "confirmed")),
+    ("South Hilo", "Leilani Estates", "Lava crossing Pohoiki Road", ("Puna", "corrected")),
+    ("Puna", "Leilani Estaets", "", ("Puna", "confirmed")),
+    ("Puna", "", "Smoke behind the house", ("Puna", "unmatched")),
+    ("Puna", "Volcano", "", ("Puna", "confirmed")),
+    ("South Hilo", "", "The volcano is loud tonight", ("South Hilo", "unmatched")),
+])
+def test_resolve(district, location, description, expected):
+    assert GAZETTEER_INDEX.resolve(district, location, description) == expected
+
+
+def test_batch_memo_gives_the_same_answers():
+    rows = [
+        ("South Hilo", "Leilani Estates", "Lava crossing Pohoiki Road"),
+        ("Puna", "Leilani Estates", "Smoke"),
+        ("Puna", "Kaumana", "Hilo side"),
+        ("South Hilo", "Kaumana", "Flooding"),
+    ] * 3
+    memo = {}
+    assert [GAZETTEER_INDEX.resolve(*r, memo) for r in rows] == [GAZETTEER_INDEX.resolve(*r) for r in rows]
+    assert set(memo) == {"Leilani Estates", "Kaumana"}
+
+
+def test_inserts_store_the_resolved_district(db):
+    db.insert_submissions([
+        make_submission(1, district="South Hilo"),
+        make_submission(2, location="", description="Smoke behind the house"),
+    ])
+    rows = {r["ref_code"]: r for r in db.get_page()["submissions"]}
+    assert (rows["HI-T00001"]["district"], rows["HI-T00001"]["district_match"],
+            rows["HI-T00001"]["reported_district"]) == ("Puna", "corrected", "South Hilo")
+    assert (rows["HI-T00002"]["district"], rows["HI-T00002"]["district_match"]) == ("Puna", "unmatched")
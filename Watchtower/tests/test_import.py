@@ -0,0 +1,82 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+from backend.import_export import iter_import_file, iter_json_records, map_import_record
+from conftest import make_submission
+
+COMMENTS = [
+    {"created_time": "2018-05-03T22:41:00+0000", "message": "Cracks opening on Mohala Street", "from": {"name": "Kainoa"}},
+    {"created_time": "2018-05-03T22:45:00+0000", "message": ""},
+    {"timestamp": "2018-05-03 12:50:00", "comment": "Smoke over Leilani Estates"},
+    {"created_time": "yesterday", "message": "Unparseable time"},
+]
+
+
+def test_records_stream_across_read_boundaries():
+    text = json.dumps(COMMENTS, indent=2)
+    for read_size in (1, 7, 1 << 20):
+        assert list(iter_json_records(io.StringIO(text), read_size=read_size)) == COMMENTS
+
+
+def test_ndjson_and_single_objects_are_read():
+    ndjson = "\n".join(json.dumps(c) for c in COMMENTS) + "\n"
+    assert list(iter_json_records(io.StringIO(ndjson), read_size=5)) == COMMENTS
+    assert list(iter_json_records(io.StringIO(json.dumps(COMMENTS[0])))) == COMMENTS[:1]
+    assert list(iter_json_records(io.StringIO("[]"))) == []
+
+
+def test_truncated_file_raises():
+    with pytest.raises(ValueError):
+        list(iter_json_records(io.StringIO(json.dumps(COMMENTS)[:-20]), read_size=8))
+
+
+def test_comments_map_to_other_reports():
+    (row,) = map_import_record(COMMENTS[0])
+    assert row["incident_type"] == "other" and row["district"] == "Unknown"
+    assert (row["description"], row["reporter_name"]) == ("Cracks opening on Mohala Street", "Kainoa")
+    assert row["timestamp"] == "2018-05-03T22:41:00+00:00"
+    assert row["ref_code"].startswith("IM-")
+    assert map_import_record(COMMENTS[0]) == [row]  # replays get the same ref code
+
+    # Naive times are HST
+    (row,) = map_import_record(COMMENTS[2])
+    assert row["timestamp"] == "2018-05-03T22:50:00+00:00"
+
+
+def test_exported_rows_pass_through_and_run_outputs_split_by_district():
+    (row,) = map_import_record(make_submission(1, timestamp="2018-05-03T22:41:00Z", district=""))
+    assert (row["ref_code"], row["district"], row["incident_type"]) == ("HI-T00001", "Unknown", "lava")
+
+    rows = map_import_record({
+        "timestamp": "2018-05-04T08:00:00",
+        "by_district": {"Puna": "Fissure 8 active", "Kau": "Vog advisory", "Hilo": ""},
+    })
+    assert [(r["district"], r["description"]) for r in rows] == [("Puna", "Fissure 8 active"), ("Ka'u", "Vog advisory")]
+    assert map_import_record({"id": 3}) == []
+
+
+def test_unusable_records_are_counted_as_skipped():
+    skipped = [0]
+    rows = list(iter_import_file(io.StringIO(json.dumps(COMMENTS)), skipped))
+    assert [r["description"] for r in rows] == ["Cracks opening on Mohala Street", "Smoke over Leilani Estates"]
+    assert skipped == [2]
+
+
+def test_bulk_import_loads_rows_and_rebuilds_counts(db):
+    skipped = [0]
+    assert db.bulk_import(iter_import_file(io.StringIO(json.dumps(COMMENTS)), skipped), batch_size=1) == 2
+    assert db.get_counts()["total"] == 2
+    assert len(db.search("Mohala")["submissions"]) == 1
+
+
+def test_import_endpoint_reports_rows_and_skips(api, adb):
+    response = api.post("/api/submissions/import", content=json.dumps(COMMENTS).encode())
+    assert response.status_code == 200
+    assert response.json() == {"imported": 2, "skipped": 2}
+    assert asyncio.run(adb.get_counts())["pending"] == 2
+
+    response = api.post("/api/submissions/import", content=b'[{"message": ')
+    assert response.status_code == 400
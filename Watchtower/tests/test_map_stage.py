@@ -0,0 +1,57 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from backend.reports import AsyncEmergencyReportGenerator, EmergencyReportGenerator
+from conftest import FakeClaude
+
+
+def async_generator(adb, client, concurrency):
+    generator = AsyncEmergencyReportGenerator(adb, map_concurrency=concurrency, use_cache=False)
+    generator.claude_client = client
+    return generator
+
+
+async def run_map(generator, prompts):
+    events = []
+    async for event in generator.map_chunks(prompts, system=EmergencyReportGenerator.MAP_SYSTEM):
+        events.append(event)
+    return events
+
+
+def test_prompts_are_built_only_as_call_slots_free_up(adb):
+    client = FakeClaude(asynchronous=True)
+    started_when_built = []
+
+    def prompts():
+        for i in range(10):
+            started_when_built.append(len(client.requests))
+            yield f"chunk {i}"
+
+    events = asyncio.run(run_map(async_generator(adb, client, concurrency=2), prompts()))
+    assert events[-1] == {"type": "mapped", "results": [FakeClaude.REPLIES["map"]] * 10}
+    # Chunk i is built only once the call for chunk i - 2 has been made
+    assert started_when_built[:2] == [0, 0]
+    assert all(started >= i - 1 for i, started in enumerate(started_when_built))
+
+
+def test_results_keep_prompt_order_whatever_finishes_first(adb):
+    client = FakeClaude(asynchronous=True)
+
+    async def create(**params):
+        prompt = params["messages"][0]["content"]
+        await asyncio.sleep(0.01 * (5 - int(prompt[-1])))  # later chunks answer first
+        return SimpleNamespace(content=[SimpleNamespace(text=prompt)], usage=None, stop_reason="end_turn")
+
+    client.messages.create = create
+    events = asyncio.run(run_map(async_generator(adb, client, concurrency=5), (f"chunk {i}" for i in range(5))))
+    assert events[-1]["results"] == [f"chunk {i}" for i in range(5)]
+
+
+def test_a_failed_call_stops_the_map_and_starts_no_more_calls(adb):
+    client = FakeClaude(asynchronous=True)
+    client.fail["map"] = [None, RuntimeError("bad request")]
+    with pytest.raises(Exception, match="bad request"):
+        asyncio.run(run_map(async_generator(adb, client, concurrency=1), (f"chunk {i}" for i in range(10))))
+    assert client.count("map") == 2
@@ -0,0 +1,96 @@
+import sqlite3
+
+from backend.db import DatabaseManager
+from backend.migrations import MIGRATIONS
+
+# The schema before the migration runner: three tables, no indexes
+BASELINE_SCHEMA = """
+CREATE TABLE submissions (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    ref_code      TEXT    NOT NULL,
+    incident_type TEXT    NOT NULL,
+    district      TEXT    NOT NULL,
+    location      TEXT,
+    description   TEXT    NOT NULL,
+    severity      TEXT    NOT NULL DEFAULT 'low',
+    evacuation    TEXT,
+    reporter_name TEXT,
+    timestamp     TEXT    NOT NULL,
+    processed     INTEGER NOT NULL DEFAULT 0,
+    mod_status    TEXT    NOT NULL DEFAULT 'pending'
+);
+CREATE TABLE event_context (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    summary    TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE admins (
+    id                   INTEGER PRIMARY KEY AUTOINCREMENT,
+    username             TEXT    NOT NULL UNIQUE,
+    email                TEXT    NOT NULL UNIQUE,
+    password_hash        TEXT    NOT NULL,
+    must_change_password INTEGER NOT NULL DEFAULT 1,
+    created_at           TEXT    NOT NULL,
+    last_login           TEXT
+);
+"""
+
+
+def baseline_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.executemany(
+        "INSERT INTO submissions (ref_code, incident_type, district, location, description, severity, "
+        "timestamp, processed) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            ("HI-A1", "lava", "Puna", "Leilani Estates", "Lava on Pohoiki Road", "high", "2018-05-03T10:00:00Z", 1),
+            ("HI-A2", "flooding", "South Hilo", "Kaumana", "Water over the road", "medium", "2018-05-03T11:00:00Z", 0),
+            ("HI-A3", "fire", "Puna", None, "Smoke behind the house", "low", "2018-05-03T12:00:00Z", 0),
+        ],
+    )
+    conn.execute("INSERT INTO event_context (summary, created_at) VALUES ('Earlier context', '2018-05-03')")
+    conn.commit()
+    conn.close()
+
+
+def test_baseline_database_is_migrated_in_place(tmp_path):
+    path = tmp_path / "watchtower.db"
+    baseline_db(path)
+
+    db = DatabaseManager(path)
+    try:
+        applied = [r[0] for r in db._connect().execute("SELECT version FROM schema_migrations ORDER BY version")]
+        assert applied == [version for version, _, _ in MIGRATIONS]
+
+        assert db.get_counts() == {"pending": 2, "flagged": 0, "total": 3, "archived": 0}
+        assert db.get_district_counts()["Puna"]["pending"] == 1
+        assert {s["ref_code"] for s in db.search("road")["submissions"]} == {"HI-A1", "HI-A2"}
+        assert db.get_latest_context() == "Earlier context"
+
+        batch_id, rows = db.claim_pending()
+        assert [r["ref_code"] for r in rows] == ["HI-A2", "HI-A3"]
+        assert all(r["mod_status"] == "pending" and r["district_match"] is None for r in rows)
+
+        db.insert_submission({
+            "ref_code": "HI-A4", "incident_type": "road", "district": "South Hilo",
+            "location": "Leilani Estates", "description": "Crack across the road",
+        })
+        new = db.get_page(limit=1)["submissions"][0]
+        assert (new["district"], new["district_match"], new["reported_district"]) == ("Puna", "corrected", "South Hilo")
+        assert db.get_counts()["total"] == 4
+    finally:
+        db.close()
+
+
+def test_migrations_run_once(tmp_path):
+    path = tmp_path / "watchtower.db"
+    baseline_db(path)
+    DatabaseManager(path).close()
+
+    db = DatabaseManager(path)
+    try:
+        rows = db._connect().execute("SELECT version, COUNT(*) FROM schema_migrations GROUP BY version").fetchall()
+        assert all(n == 1 for _, n in rows) and len(rows) == len(MIGRATIONS)
+        assert db.get_counts()["total"] == 3
+    finally:
+        db.close()
@@ -0,0 +1,69 @@
+import pytest
+
+from backend.db import decode_cursor, encode_cursor
+from conftest import make_submission
+
+
+def insert(db, n, **fields):
+    # Pairs of rows share a timestamp so pages must break ties on id
+    return db.insert_submissions([
+        make_submission(i, timestamp=f"2018-05-03T10:00:{i // 2:02d}Z", **fields) for i in range(n)
+    ])
+
+
+def pages(db, limit, **filters):
+    cursor, out = None, []
+    while True:
+        page = db.get_page(limit=limit, cursor=cursor, **filters)
+        out.append([r["id"] for r in page["submissions"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return out
+
+
+def test_cursor_round_trips():
+    cursor = encode_cursor("2018-05-03T10:00:00Z", 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("2018-05-03T10:00:00Z", 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", encode_cursor("x", 1)[:-3] + "!!"])
+def test_malformed_cursor_raises_value_error(db, cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+    if cursor:
+        with pytest.raises(ValueError):
+            db.get_page(cursor=cursor)
+
+
+def test_pages_cover_every_row_once_newest_first(db):
+    ids = insert(db, 7)
+    assert pages(db, limit=3) == [ids[::-1][0:3], ids[::-1][3:6], ids[::-1][6:]]
+
+
+def test_last_full_page_has_no_next_cursor(db):
+    insert(db, 4)
+    page = db.get_page(limit=2)
+    page = db.get_page(limit=2, cursor=page["next_cursor"])
+    assert len(page["submissions"]) == 2 and page["next_cursor"] is None
+
+
+def test_filters_apply_on_every_page(db):
+    insert(db, 3, district="Puna")
+    hilo = insert(db, 5, district="South Hilo", location="Keaukaha", description="Ash fall")
+    got = pages(db, limit=2, district="South Hilo")
+    assert [i for page in got for i in page] == hilo[::-1]
+    assert db.get_page(severity="high")["submissions"] == []
+
+
+def test_archived_rows_merge_into_the_same_order(db):
+    old = insert(db, 4)
+    batch_id, _ = db.claim_pending()
+    db.complete_batch(batch_id)
+    db.archive_processed(older_than_hours=0)
+    new = db.insert_submissions([make_submission(9, timestamp="2018-05-04T00:00:00Z")])
+
+    assert pages(db, limit=2) == [new]
+    merged = pages(db, limit=2, include_archive=True)
+    assert [i for page in merged for i in page] == new + old[::-1]
+    assert pages(db, limit=2, include_archive=True, processed=0) == [new]
@@ -0,0 +1,71 @@
+import asyncio
+import functools
+import random
+from types import SimpleNamespace
+
+from backend.local_filters import GAZETTEER_PROMPT
+from backend.reports import AsyncEmergencyReportGenerator, EmergencyReportGenerator
+from conftest import FakeClaude, make_submission
+
+
+def test_system_prompts_are_sent_as_one_cached_block(db):
+    generator = EmergencyReportGenerator(db, use_cache=False)
+    params = generator.request_params("<input_data>x</input_data>", 4096, system=generator.MAP_SYSTEM)
+    assert params["system"] == [
+        {"type": "text", "text": generator.MAP_SYSTEM, "cache_control": {"type": "ephemeral"}}
+    ]
+    assert params["messages"] == [{"role": "user", "content": "<input_data>x</input_data>"}]
+    assert "system" not in generator.request_params("hello", 512)
+
+
+def test_the_gazetteer_and_instructions_stay_in_the_static_prefix(db):
+    generator = EmergencyReportGenerator(db, use_cache=False)
+    assert GAZETTEER_PROMPT in generator.MAP_SYSTEM
+    prompt = generator.map_prompt("=== Puna ===\n  REF: HI-T00001\n")
+    assert prompt.startswith("<input_data>") and GAZETTEER_PROMPT not in prompt
+
+
+def test_every_map_call_of_a_run_shares_the_same_cached_prefix(db, adb):
+    rng = random.Random(5)
+    words = "smoke ash water road power lines down roof tree flooding shelter stream rain wind gas cracks".split()
+    db.insert_submissions([  # no place names, so the map stage runs; no near-duplicates
+        make_submission(i, location="", description=" ".join(rng.sample(words, 12)) + f" report {i}")
+        for i in range(30)
+    ])
+    client = FakeClaude(asynchronous=True)
+    sent = []
+    answer = client.messages.create
+
+    async def create(**params):
+        sent.append(params)
+        response = await answer(**params)
+        if params.get("system", [{}])[0].get("text") != EmergencyReportGenerator.MAP_SYSTEM:
+            return response
+        cached = len(sent) > 1
+        response.usage = SimpleNamespace(
+            input_tokens=50, output_tokens=20,
+            cache_creation_input_tokens=0 if cached else 900, cache_read_input_tokens=900 if cached else 0,
+        )
+        return response
+
+    client.messages.create = create
+    generator = AsyncEmergencyReportGenerator(adb, use_cache=False)
+    generator.claude_client = client
+    generator.chunk_submissions = functools.partial(type(generator).chunk_submissions, generator, max_tokens=300)
+    batch_id, rows = db.claim_pending()
+
+    async def run():
+        try:
+            return [e async for e in generator.generate_events(rows, batch_id=batch_id)]
+        finally:
+            await AsyncEmergencyReportGenerator.drain_context_tasks()
+
+    messages = [e["message"] for e in asyncio.run(run()) if e["type"] == "log"]
+    maps = [p for p in sent if p.get("system", [{}])[0].get("text") == generator.MAP_SYSTEM]
+    assert len(maps) > 2
+    assert all(p["system"] == maps[0]["system"] for p in maps)
+    assert len({p["messages"][0]["content"] for p in maps}) == len(maps)
+
+    n = len(maps)
+    summary = f"{900 * (n - 1):,} input tokens read from cache, 900 written, {50 * n:,} uncached"
+    assert any(summary in m for m in messages)
@@ -0,0 +1,128 @@
+import asyncio
+import functools
+import random
+
+import pytest
+
+from backend.reports import AsyncEmergencyReportGenerator
+from conftest import FakeClaude, make_submission
+
+WORDS = (
+    "smoke ash water road power lines down house roof car tree flooding shelter family kupuna "
+    "neighbor street bridge gulch stream rain wind fire lava gas leak cracks steam school church"
+).split()
+
+
+class Interrupted(Exception):
+    pass
+
+
+def insert_reports(db, n=40):
+    """Reports with no place names, so the map stage runs, and no near-duplicates."""
+    rng = random.Random(7)
+    db.insert_submissions([
+        make_submission(i, location="", description=" ".join(rng.sample(WORDS, 12)) + f" report {i}")
+        for i in range(n)
+    ])
+
+
+def new_generator(adb, client):
+    generator = AsyncEmergencyReportGenerator(adb, map_concurrency=1, use_cache=False)
+    generator.claude_client = client
+    # Small chunks, so a run makes several map calls
+    generator.chunk_submissions = functools.partial(type(generator).chunk_submissions, generator, max_tokens=300)
+    return generator
+
+
+async def run_to_end(adb, client, rows, batch_id, run=None):
+    events = []
+    try:
+        async for event in new_generator(adb, client).generate_events(rows, batch_id=batch_id, run=run):
+            events.append(event)
+    finally:
+        await AsyncEmergencyReportGenerator.drain_context_tasks()
+    return events
+
+
+@pytest.mark.parametrize("stage", ["claimed", "mid-map", "mapped", "reported", "stored"])
+def test_failed_run_resumes_without_repeating_work(db, adb, monkeypatch, stage):
+    insert_reports(db)
+    client = FakeClaude(asynchronous=True)
+
+    # Fail once, just after the run checkpoints `stage` (mid-map: after one chunk)
+    armed = [True]
+
+    def failing(method, matches):
+        def wrapper(*args, **fields):
+            result = method(*args, **fields)
+            if armed[0] and matches(fields):
+                armed[0] = False
+                raise Interrupted(stage)
+            return result
+        return wrapper
+
+    if stage == "claimed":
+        monkeypatch.setattr(db, "create_run", failing(db.create_run, lambda fields: True))
+    elif stage == "mid-map":
+        monkeypatch.setattr(db, "save_run_chunk", failing(db.save_run_chunk, lambda fields: True))
+    else:
+        monkeypatch.setattr(db, "update_run", failing(db.update_run, lambda fields: fields.get("stage") == stage))
+
+    batch_id, rows = db.claim_pending()
+    with pytest.raises(Interrupted):
+        asyncio.run(run_to_end(adb, client, rows, batch_id))
+    run = db.get_run(batch_id)
+    assert run["status"] == "failed"
+    assert run["stage"] == ("claimed" if stage == "mid-map" else stage)
+
+    resumed_rows = db.claim_run(batch_id)
+    assert sorted(r["id"] for r in resumed_rows) == sorted(r["id"] for r in rows)
+    events = asyncio.run(run_to_end(adb, client, resumed_rows, batch_id, db.get_run(batch_id)))
+    assert events[0] == {"type": "run", "run_id": batch_id, "resumed_from": run["stage"]}
+
+    run = db.get_run(batch_id)
+    assert (run["status"], run["stage"]) == ("complete", "complete")
+    assert db.claim_run(batch_id) is None
+    # Every row made it into exactly one report, and nothing is left pending
+    reports = db.list_reports()
+    assert len(reports) == 1
+    assert sorted(db.get_report(reports[0]["id"])["submission_ids"]) == sorted(r["id"] for r in rows)
+    assert db.get_counts()["pending"] == 0
+
+    # Across both attempts, no stage asked Claude twice for the same thing
+    maps = [prompt for kind, prompt in client.requests if kind == "map"]
+    assert len(maps) == len(set(maps)) > 1
+    assert (client.count("combine"), client.count("context")) == (1, 1)
+
+
+
+def test_agenerate_report_returns_the_report_and_reports_progress(db, adb):
+    insert_reports(db, n=5)
+    batch_id, rows = db.claim_pending()
+    client = FakeClaude(asynchronous=True)
+    generator = new_generator(adb, client)
+    messages = []
+
+    async def generate():
+        try:
+            return await generator.agenerate_report(rows, messages.append, batch_id=batch_id)
+        finally:
+            await AsyncEmergencyReportGenerator.drain_context_tasks()
+
+    assert asyncio.run(generate()) == "REPORT"
+    assert any(m.startswith("Analysed") for m in messages)
+    assert db.get_run(batch_id)["status"] == "complete"
+
+    # The blocking entry point of the base class fails loudly rather than returning a coroutine
+    with pytest.raises(TypeError, match="agenerate_report"):
+        generator.generate_report(rows, batch_id=batch_id)
+
+
+def test_health_reuses_one_generator(api, monkeypatch):
+    created = []
+    monkeypatch.setattr(AsyncEmergencyReportGenerator, "__init__", lambda self, *a, **kw: created.append(a))
+    for _ in range(3):
+        response = api.get("/api/health")
+        assert response.status_code == 200
+        assert response.json()["pending_submissions"] == 0
+    assert created == []
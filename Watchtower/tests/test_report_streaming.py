@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from backend.reports import AsyncEmergencyReportGenerator
+from conftest import FakeClaude, make_submission
+
+PIECES = ["# Situation", " Report\n\n", "## Puna\n", "Lava on Pohoiki Road."]
+
+
+class StreamingClaude(FakeClaude):
+    """Streams the combine reply in PIECES, waiting on `resume` after the first piece."""
+
+    def __init__(self):
+        super().__init__(asynchronous=True)
+        self.resume = asyncio.Event()
+        self.break_after = None
+        self.messages.stream = self._pieces
+
+    def _pieces(self, **params):
+        fake = self
+        stream = self._stream_async(**params)
+
+        class Pieces(type(stream)):
+            @property
+            async def text_stream(self):
+                if self.message.content[0].text != FakeClaude.REPLIES["combine"]:
+                    yield self.message.content[0].text
+                    return
+                for n, piece in enumerate(PIECES):
+                    if n == fake.break_after:
+                        raise ConnectionError("stream dropped")
+                    yield piece
+                    if n == 0:
+                        await fake.resume.wait()
+
+        return Pieces()
+
+
+def generate(db, adb, client):
+    db.insert_submissions([make_submission(i, location="", description=f"Smoke and ash report {i}") for i in range(3)])
+    batch_id, rows = db.claim_pending()
+    generator = AsyncEmergencyReportGenerator(adb, use_cache=False)
+    generator.claude_client = client
+
+    async def collect():
+        events = []
+        try:
+            async for event in generator.generate_events(rows, batch_id=batch_id):
+                events.append(event)
+                if event["type"] == "report_delta":
+                    client.resume.set()  # the rest of the stream waits on this first delta
+        finally:
+            await AsyncEmergencyReportGenerator.drain_context_tasks()
+        return events
+
+    return generator, batch_id, asyncio.run(asyncio.wait_for(collect(), timeout=5))
+
+
+def test_report_deltas_arrive_before_the_stream_ends_then_the_full_report(db, adb):
+    client = StreamingClaude()
+    generator, batch_id, events = generate(db, adb, client)
+
+    deltas = [e["content"] for e in events if e["type"] == "report_delta"]
+    assert deltas == PIECES
+    report = events[-1]
+    assert report["type"] == "report" and report["content"] == "".join(PIECES)
+    assert events.index(report) > max(i for i, e in enumerate(events) if e["type"] == "report_delta")
+    assert db.get_report(report["report_id"])["content"] == "".join(PIECES)
+    assert 0 < generator.timings["first_token"] <= generator.timings["total"]
+
+
+def test_a_dropped_stream_fails_the_run_and_stores_nothing(db, adb):
+    client = StreamingClaude()
+    client.break_after = 2
+    with pytest.raises(Exception, match="stream dropped"):
+        generate(db, adb, client)
+    assert db.list_reports() == []
+    run = db.get_run(db._connect().execute("SELECT id FROM report_runs").fetchone()[0])
+    assert run["status"] == "failed" and run["stage"] == "mapped"
@@ -0,0 +1,40 @@
+import pytest
+
+REPORT = "# Situation Report\n\n## Puna\nLava crossing Pohoiki Road. Kaʻū on vog watch.\n" * 40
+
+
+def test_saved_reports_round_trip_compressed(db):
+    report_id = db.save_report(
+        REPORT, [3, 1, 2], batch_id="b1", timings={"map": 1.5},
+        usage={"input_tokens": 900, "output_tokens": 120, "cache_read_input_tokens": 800},
+    )
+    stored = db._connect().execute("SELECT content FROM reports WHERE id = ?", (report_id,)).fetchone()[0]
+    assert len(stored) < len(REPORT.encode()) // 4
+
+    report = db.get_report(report_id)
+    assert report["content"] == REPORT
+    assert report["submission_ids"] == [3, 1, 2] and report["submission_count"] == 3
+    assert report["content_length"] == len(REPORT.encode())
+    assert (report["timings"], report["input_tokens"], report["cache_read_tokens"], report["cache_write_tokens"]) == (
+        {"map": 1.5}, 900, 800, 0,
+    )
+    assert db.get_report(report_id + 1) is None
+
+
+def test_reports_list_newest_first_without_content(db):
+    ids = [db.save_report(f"Report {i}", [i]) for i in range(5)]
+    listed = db.list_reports(limit=3)
+    assert [r["id"] for r in listed] == ids[:1:-1]
+    assert "content" not in listed[0] and "submission_ids" not in listed[0]
+    assert [r["id"] for r in db.list_reports(limit=3, before_id=listed[-1]["id"])] == ids[1::-1]
+    assert db.get_latest_report()["content"] == "Report 4"
+
+
+def test_unknown_codec_is_refused(db):
+    report_id = db.save_report("x", [])
+    conn = db._connect()
+    conn.execute("UPDATE reports SET codec = 'zstd' WHERE id = ?", (report_id,))
+    conn.commit()
+    with pytest.raises(ValueError):
+        db.get_report(report_id)
+    assert db.list_reports()[0]["id"] == report_id
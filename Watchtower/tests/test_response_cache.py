@@ -0,0 +1,79 @@
+import itertools
+import os
+import time
+
+import pytest
+
+from backend.db import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.time() that advances one second per call."""
+    ticks = itertools.count(1_000_000)
+    monkeypatch.setattr(time, "time", lambda: float(next(ticks)))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(tmp_path / "llm_cache.db", max_bytes=10_000, max_age_hours=1)
+    yield cache
+    cache.close()
+
+
+def test_keys_cover_the_whole_request():
+    key = ResponseCache.key("model", "prompt", 4096, "system")
+    assert key == ResponseCache.key("model", "prompt", 4096, "system")
+    assert len({
+        key,
+        ResponseCache.key("model", "prompt", 4096),
+        ResponseCache.key("model", "prompt", 512, "system"),
+        ResponseCache.key("other", "prompt", 4096, "system"),
+        ResponseCache.key("model", "prompt!", 4096, "system"),
+    }) == 5
+
+
+def test_round_trip_and_hit_accounting(cache):
+    assert cache.get("k") is None
+    cache.put("k", "model", "Lava on Pohoiki Road ʻokina" * 50, tokens=300)
+    assert cache.get("k") == "Lava on Pohoiki Road ʻokina" * 50
+    assert cache.get("k") is not None
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["lifetime_hits"], stats["tokens_saved"]) == (1, 2, 600)
+    assert (stats["process_hits"], stats["process_misses"], stats["hit_rate"]) == (2, 1, 0.667)
+    assert 0 < stats["bytes"] < len("Lava on Pohoiki Road ʻokina" * 50)
+
+
+def test_expired_entries_miss_and_are_evicted(cache, clock, monkeypatch):
+    cache.put("old", "model", "stale")
+    later = time.time() + 2 * 3600
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert cache.get("old") is None
+    cache.put("new", "model", "fresh")
+    assert cache.evict() == 1
+    assert cache.stats()["entries"] == 1 and cache.get("new") == "fresh"
+
+
+def test_least_recently_used_entries_go_first_when_over_budget(cache, clock):
+    for i in range(8):
+        cache.put(f"k{i}", "model", os.urandom(2000).hex())  # ~2 KB each once compressed
+    assert cache.stats()["bytes"] > cache.max_bytes
+    cache.get("k0")  # recently used again, so kept
+    removed = cache.evict()
+    assert removed > 0 and cache.stats()["bytes"] <= cache.max_bytes
+    assert cache.get("k0") is not None and cache.get("k1") is None and cache.get("k7") is not None
+
+
+def test_eviction_runs_every_evict_every_writes(cache, monkeypatch):
+    runs = []
+    monkeypatch.setattr(cache, "evict", lambda: runs.append(1) or 0)
+    for i in range(ResponseCache.EVICT_EVERY * 2 + 1):
+        cache.put(f"k{i}", "model", "x")
+    assert len(runs) == 2
+
+
+def test_clear_empties_the_cache(cache):
+    cache.put("k", "model", "x")
+    cache.clear()
+    assert cache.stats()["entries"] == 0 and cache.get("k") is None
@@ -0,0 +1,60 @@
+import pytest
+
+from backend.db import fts_query
+from conftest import make_submission
+
+
+def found(db, text, **kwargs):
+    return [r["ref_code"] for r in db.search(text, **kwargs)["submissions"]]
+
+
+@pytest.mark.parametrize("text, query", [
+    ("lava", '"lava"*'),
+    ("Pohoiki road", '"Pohoiki" "road"*'),
+    ('lava" OR ash NEAR(', '"lava" "OR" "ash" "NEAR"*'),
+    ("  -- ", None),
+])
+def test_fts_query_quotes_every_term_and_prefixes_the_last(text, query):
+    assert fts_query(text) == query
+
+
+def test_search_finds_inserted_rows_by_prefix_and_highlights_matches(db):
+    db.insert_submissions([
+        make_submission(1),
+        make_submission(2, location="Keaukaha", district="South Hilo", description="Ash fall on cars"),
+    ])
+    assert found(db, "Pohoi") == ["HI-T00001"]
+    assert found(db, "ash fal") == ["HI-T00002"]
+    assert found(db, "Pohoiki ash") == []
+    (row,) = db.search("smoke")["submissions"]
+    assert "\x02smoke\x03" in row["highlight"]
+
+
+def test_search_follows_updates_and_deletes(db):
+    (row_id,) = db.insert_submissions([make_submission(1)])
+    conn = db._connect()
+    conn.execute("UPDATE submissions SET description = 'Steam vents on Highway 132' WHERE id = ?", (row_id,))
+    conn.commit()
+    assert found(db, "Pohoiki") == []
+    assert found(db, "steam vents") == ["HI-T00001"]
+
+    db.delete_submission(row_id)
+    assert found(db, "steam") == []
+
+
+def test_location_matches_rank_first_and_filters_apply(db):
+    db.insert_submissions([
+        make_submission(1, location="Kalapana", description="Lava near Kalapana"),
+        make_submission(2, location="Kapoho", description="Kalapana road closed", severity="high"),
+        make_submission(3, location="Kalapana", description="Smoke visible"),
+    ])
+    assert found(db, "Kalapana")[-1] == "HI-T00002"
+    assert found(db, "Kalapana", severity="high") == ["HI-T00002"]
+
+
+def test_search_pages_by_offset(db):
+    db.insert_submissions([make_submission(i) for i in range(5)])
+    first = db.search("lava", limit=3)
+    second = db.search("lava", limit=3, offset=first["next_offset"])
+    assert first["next_offset"] == 3 and second["next_offset"] is None
+    assert len({r["id"] for r in first["submissions"] + second["submissions"]}) == 5
@@ -0,0 +1,170 @@
+from types import SimpleNamespace
+
+import pytest
+
+from backend.local_filters import SPAM_SEED, SpamClassifier, SpamFilter, np
+from backend.reports import EmergencyReportGenerator
+from conftest import make_submission
+
+# Plausible reports written apart from SPAM_SEED; none may be flagged
+GENUINE = [
+    ("other", "Pahoa", "Evacuation center at the Pahoa community center is full, families are being turned away"),
+    ("fire", "", "Lots of smoke coming from the hill behind our house"),
+    ("other", "Pahoa", "The store in Pahoa is out of water"),
+    ("lava", "Leilani Estates", "Lava flow is moving down Makamae Street and we can hear explosions"),
+    ("other", "Volcano", "Ashfall started about twenty minutes ago, the cars are gray"),
+    ("power", "Keaau", "Power has been out for two days, our fridge food is spoiling"),
+    ("road", "Highway 11", "Rockfall at the turnoff near the park entrance, one lane open"),
+    ("flooding", "Hilo", "Wailuku river is very high and brown, near the top of the bank"),
+    ("other", "Naalehu", "We need drinking water for about 30 people at the church"),
+    ("accident", "Kona", "Motorcycle crash near the airport, ambulance needed"),
+    ("other", "Ocean View", "My grandmother needs her medication refilled and the pharmacy is closed"),
+    ("tsunami", "Hilo", "Tsunami warning sirens but no one told us where to go"),
+    ("other", "Kalapana", "Several horses loose on the road after the fence burned"),
+    ("other", "Mountain View", "Roof collapsed from the weight of ash on the carport"),
+    ("other", "Puna", "Our well water smells like sulfur since the eruption started"),
+    ("other", "Pahala", "Kids at the shelter are coughing a lot, is there a doctor"),
+    ("other", "Hawaiian Paradise Park", "We have room for two families to stay with us if anyone needs it"),
+    ("other", "", "My neighbor is diabetic and out of insulin, can someone help"),
+    ("other", "Kona", "Line at the gas station is two hours long"),
+    ("other", "", "Looters seen going into evacuated homes on our street"),
+]
+
+# Numbers with long runs of one digit: phone numbers, coordinates, amounts
+NUMERIC = [
+    ("other", "Pahoa", "Need a ride out, call 808-000-0000"),
+    ("lava", "", "Fissure at 19.4000000, -154.9000000 is spattering"),
+    ("other", "", "000000"),
+    ("power", "Hilo", "Meter 1111111 sparking on the pole outside"),
+]
+
+SPAM = [
+    ("other", "", "test"),
+    ("other", "", "testing 123"),
+    ("other", "", "asdfasdf"),
+    ("other", "", "Follow me for daily island photos www.example.com"),
+    ("other", "", "Anyone selling tickets for the luau tonight?"),
+    ("other", "Kona", "Beautiful sunset in Kona tonight, so pretty"),
+    ("other", "", "happy birthday to my best friend"),
+    ("other", "", "hello just testing the app"),
+]
+
+
+def as_submissions(examples, severity="low"):
+    return [
+        {"incident_type": t, "location": loc, "description": text, "severity": severity}
+        for t, loc, text in examples
+    ]
+
+
+@pytest.fixture(params=["numpy", "python"])
+def spam_filter(request):
+    classifier = SpamClassifier.train(SPAM_SEED)
+    if request.param == "numpy":
+        if np is None:
+            pytest.skip("numpy not installed")
+    else:
+        classifier.vector = None
+    return SpamFilter(classifier)
+
+
+def test_genuine_reports_are_not_flagged(spam_filter):
+    verdicts = spam_filter.verdicts(as_submissions(GENUINE))
+    flagged = [text for (_, _, text), (status, _, _) in zip(GENUINE, verdicts) if status != "pending"]
+    assert flagged == []
+
+
+def test_digit_runs_are_not_keyboard_mash(spam_filter):
+    verdicts = spam_filter.verdicts(as_submissions(NUMERIC))
+    assert [status for status, _, _ in verdicts] == ["pending"] * len(NUMERIC)
+    assert SpamFilter.rule({"description": "aaaaaaaaaa help"}) == "keyboard mash"
+
+
+def test_test_and_spam_posts_are_flagged(spam_filter):
+    verdicts = spam_filter.verdicts(as_submissions(SPAM))
+    missed = [text for (_, _, text), (status, _, _) in zip(SPAM, verdicts) if status != "flagged"]
+    assert missed == []
+
+
+def test_unseen_words_are_no_evidence():
+    classifier = SpamClassifier.train(SPAM_SEED)
+    prior = classifier.probabilities([[0]])[0]
+    unseen = classifier.probabilities([[0, 123_457, 98_765, 55_555]])[0]
+    assert unseen == pytest.approx(prior)
+    assert prior < 0.5
+
+
+def test_model_round_trips_through_json():
+    classifier = SpamClassifier.train(SPAM_SEED)
+    loaded = SpamClassifier.from_json(classifier.to_json())
+    docs = [[0, 5, 17], [0, 999]]
+    assert loaded.probabilities(docs) == pytest.approx(classifier.probabilities(docs), abs=1e-6)
+
+
+def test_high_severity_is_never_flagged_by_the_classifier_alone():
+    spam_filter = SpamFilter(SpamClassifier.train(SPAM_SEED))
+    status, score, _ = spam_filter.verdicts(as_submissions(SPAM[5:6], severity="high"))[0]
+    assert score >= spam_filter.threshold and status == "pending"
+
+
+def test_flagged_rows_wait_for_review(db):
+    db.insert_submission(make_submission(1))
+    db.insert_submission(make_submission(2, incident_type="other", description="testing 123"))
+    flagged_id = db.get_pending()[1]["id"]
+
+    batch_id, rows = db.claim_pending()
+    assert [r["ref_code"] for r in rows] == ["HI-T00001"]
+    db.complete_batch(batch_id)
+
+    row = db.get_page(mod_status="flagged")["submissions"][0]
+    assert (row["id"], row["processed"], row["batch_id"]) == (flagged_id, 0, None)
+    assert db.get_counts()["pending"] == 0 and db.get_counts()["flagged"] == 1
+    assert db.claim_pending() == (None, [])
+
+    assert db.moderate_submission(flagged_id, spam=True)["processed"] == 1
+    assert db.get_counts()["flagged"] == 0
+
+
+def test_approved_rows_return_to_the_pending_pool(db):
+    db.insert_submission(make_submission(1, incident_type="other", description="Beautiful sunset in Kona tonight"))
+    flagged_id = db.get_pending()[0]["id"]
+    assert db.moderate_submission(flagged_id, spam=False)["mod_status"] == "approved"
+    _, rows = db.claim_pending()
+    assert [r["id"] for r in rows] == [flagged_id]
+
+
+def test_report_run_leaves_rows_flagged_mid_run_unprocessed(db):
+    db.insert_submission(make_submission(1))
+    db.insert_submission(make_submission(2))
+    batch_id, rows = db.claim_pending()
+    # A coordinator-trained rule or model flags one row after it was claimed
+    db._connect().execute(
+        "UPDATE submissions SET description = 'test' WHERE id = ?", (rows[1]["id"],)
+    ).connection.commit()
+    rows[1]["description"] = "test"
+
+    generator = EmergencyReportGenerator(db, use_cache=False)
+    reply = SimpleNamespace(
+        content=[SimpleNamespace(text="REPORT")],
+        usage=SimpleNamespace(input_tokens=10, output_tokens=10),
+    )
+    generator.claude_client = SimpleNamespace(messages=SimpleNamespace(create=lambda **kw: reply))
+    assert generator.generate_report(rows, batch_id=batch_id) == "REPORT"
+
+    processed = {r["id"]: r["processed"] for r in db.get_page(limit=10)["submissions"]}
+    assert processed == {rows[0]["id"]: 1, rows[1]["id"]: 0}
+    assert db.get_report(generator.last_report_id)["submission_ids"] == [rows[0]["id"]]
+
+
+def test_imports_score_each_batch_in_one_call(db, monkeypatch):
+    calls = []
+    verdicts = SpamFilter.verdicts
+    monkeypatch.setattr(SpamFilter, "verdicts", lambda self, rows: calls.append(len(rows)) or verdicts(self, rows))
+    records = [make_submission(i) for i in range(5)] + [make_submission(5, description="testing 123")]
+
+    db.insert_submissions(records[:3])
+    db.bulk_import(iter(records[3:]), batch_size=2)
+    assert calls == [3, 2, 1]
+
+    rows = db.get_page(limit=10)["submissions"]
+    assert [r["mod_status"] for r in rows] == ["flagged"] + ["pending"] * 5
@@ -0,0 +1,72 @@
+import sqlite3
+import threading
+
+import pytest
+
+from backend.db import SubmissionWriter
+from conftest import make_submission
+
+
+def test_concurrent_submissions_share_a_commit(db):
+    writer = SubmissionWriter(db, window_ms=200, max_batch=100)
+    try:
+        futures = [writer.submit(make_submission(i)) for i in range(20)]
+        ids = [f.result(timeout=5) for f in futures]
+    finally:
+        writer.close()
+    assert sorted(ids) == ids and len(set(ids)) == 20
+    assert writer.rows == 20 and writer.batches < 20
+    assert db.get_counts()["total"] == 20
+
+
+def test_batches_are_capped_at_max_batch(db):
+    writer = SubmissionWriter(db, window_ms=200, max_batch=4)
+    try:
+        for future in [writer.submit(make_submission(i)) for i in range(10)]:
+            future.result(timeout=5)
+    finally:
+        writer.close()
+    assert writer.batches >= 3
+
+
+def test_a_bad_row_fails_alone(db):
+    writer = SubmissionWriter(db, window_ms=200)
+    try:
+        good = writer.submit(make_submission(1))
+        bad = writer.submit(make_submission(2, incident_type=None))
+        other = writer.submit(make_submission(3))
+        assert good.result(timeout=5) and other.result(timeout=5)
+        with pytest.raises(sqlite3.IntegrityError):
+            bad.result(timeout=5)
+    finally:
+        writer.close()
+    assert db.get_counts()["total"] == 2
+
+
+def test_close_flushes_queued_rows_and_refuses_more(db):
+    writer = SubmissionWriter(db, window_ms=1000)
+    future = writer.submit(make_submission(1))
+    writer.close()
+    assert future.done() and future.result() > 0
+    with pytest.raises(RuntimeError):
+        writer.submit(make_submission(2))
+
+
+def test_callers_on_many_threads_each_get_their_own_id(db):
+    writer = SubmissionWriter(db, window_ms=20)
+    ids = []
+    lock = threading.Lock()
+
+    def submit(i):
+        row_id = writer.insert(make_submission(i), timeout=5)
+        with lock:
+            ids.append(row_id)
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    writer.close()
+    assert len(set(ids)) == 8
+    assert db.get_counts()["total"] == 8